@@ -0,0 +1,90 @@
+"""
+Measure memory allocated while processing hook events with tracemalloc, plus throughput, using a null connector.
+    - message bytes: memory retained by one Message object
+    - peak bytes/event: memory transiently allocated (peak) while processing one event and publishing it
+
+Usage:
+    python benchmarks/bench_alloc.py [--events 20000]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wormhole.hooking.modules.base import Message  # noqa: E402
+from wormhole.hooking.modules_manager import ModulesManager  # noqa: E402
+from wormhole.hooking.connector_manager import ConnectorManager  # noqa: E402
+
+
+def synthetic_messages(count):
+    calls = (
+        ("gestalt", "MGCopyAnswer", ["UniqueDeviceID"], "a1b2c3"),
+        ("syscall", "sysctlbyname", ["kern.osversion", "0x16fdfe3a0", "0x16fdfe398"], "0x0"),
+        ("syscall", "__mac_syscall", ["Sandbox", "0x2", "0x16fdfe3a0"], "0x0"),
+        ("dyld", "dlsym", ["0x1", "objc_msgSend"], "0x1a2b3c"),
+    )
+    messages = list()
+    for i in range(count):
+        module, symbol, args, ret = calls[i % len(calls)]
+        # Fresh strings for every event, as if decoded from JSON by Frida
+        messages.append({'type': 'send', 'payload': {
+            "timestamp": 1700000000000 + i // 8,
+            "tid": 1000 + i % 4,
+            "type": module.encode().decode(),
+            "symbol": symbol.encode().decode(),
+            "data": {"args": list(args), "ret": ret}
+        }})
+    return messages
+
+
+def message_size(messages):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [Message(message, None) for message in messages]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(kept)
+
+
+def peak_per_event(manager, messages):
+    tracemalloc.start()
+    total = 0
+    for message in messages:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        manager.process_message(message, None)
+        total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return total / len(messages)
+
+
+def throughput(manager, messages):
+    start = time.perf_counter()
+    for message in messages:
+        manager.process_message(message, None)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    manager = ModulesManager("bench", tempfile.mkdtemp(prefix="wormhole-bench-"))
+    manager.init_modules(["gestalt", "syscall", "dyld"], [], ConnectorManager([]))
+    messages = synthetic_messages(args.events)
+
+    # Warm up caches
+    throughput(manager, messages[:1000])
+
+    print(f"message bytes:\t\t{message_size(messages):.0f}")
+    print(f"peak bytes/event:\t{peak_per_event(manager, messages):.0f}")
+    print(f"events/sec:\t\t{throughput(manager, messages):,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Compare the host-side cost of receiving hooked calls one message at a time against receiving them in batches.
+
+Usage:
+    python benchmarks/bench_batch.py [--events 50000] [--batch-size 64]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wormhole.core import Core  # noqa: E402
+from wormhole.hooking.batch import build_batch  # noqa: E402
+from wormhole.hooking.connector_manager import ConnectorManager  # noqa: E402
+
+
+class StandInDevice:
+    type = 'local'
+
+    def query_system_parameters(self):
+        return {'os': {'id': 'ios'}}
+
+    def on(self, *args):
+        pass
+
+
+def synthetic_events(count):
+    symbols = ("open", "read", "write", "close")
+    events = list()
+    for i in range(count):
+        symbol = symbols[i % len(symbols)]
+        payload = {
+            "timestamp": 1700000000000 + i,
+            "tid": 1000 + i % 8,
+            "type": "gestalt",
+            "symbol": symbol,
+            "data": {"args": [f"/var/mobile/file_{i % 32}", "0x0"], "ret": "0x3"}
+        }
+        data = os.urandom(64) if symbol in ("read", "write") else None
+        events.append((payload, data))
+    return events
+
+
+def run(core, messages, events_count):
+    core._ingestion.start()
+    start = time.perf_counter()
+    for message, data in messages:
+        core._on_message(message, data)
+    core._ingestion.stop()
+    elapsed = time.perf_counter() - start
+    return events_count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="wormhole-bench-"))
+    core = Core(StandInDevice(), "bench", None, queue_capacity=args.events)
+    core._modules_manager.init_modules(["gestalt"], [], ConnectorManager([]))
+
+    events = synthetic_events(args.events)
+    single = [({'type': 'send', 'payload': payload}, data) for payload, data in events]
+    batches = [build_batch(events[i:i + args.batch_size]) for i in range(0, len(events), args.batch_size)]
+
+    single_rate = run(core, single, args.events)
+    batch_rate = run(core, batches, args.events)
+
+    print(f"single messages:\t{single_rate:,.0f} events/sec")
+    print(f"batches of {args.batch_size}:\t{batch_rate:,.0f} events/sec ({batch_rate / single_rate:.2f}x)")
+    print(f"ingestion: {core.ingestion_stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+End-to-end load test of Core on a fake Frida device (see fake_frida.py): the target is spawned and attached,
+the modules hooked and the fake agent sends the corpora of bench_modules at a fixed total rate, then a file is
+downloaded and the session detached. Events go to a null connector plus the connectors given with --connectors.
+For every rate it reports the events delivered (and per second until drained), the messages dropped by the
+ingestion queue, the max queue depth and the download throughput.
+
+Usage:
+    python benchmarks/bench_core.py [--rates 1000 10000 50000] [--seconds 3] [--modules io sqlite syscall]
+                                    [--batch-size 1] [--connectors file]
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wormhole.core import Core  # noqa: E402
+from wormhole.hooking.connectors.null import Null  # noqa: E402
+
+from bench_modules import CORPORA  # noqa: E402
+from fake_frida import DOWNLOAD_METHOD, CorpusStream, FakeDevice  # noqa: E402
+
+TARGET = "com.example.fake"
+CORPUS_EVENTS = 5000
+DOWNLOAD_PATH = "/var/mobile/Containers/Data/Application/fake/Documents/test.db"
+DOWNLOAD_BYTES = 8 * 1024 * 1024
+DRAIN_TIMEOUT = 30.0
+
+
+def run(modules, rate, seconds, batch_size, connectors, download):
+    count = int(rate * seconds / len(modules))
+    streams = [CorpusStream(module, CORPORA[module](CORPUS_EVENTS), rate=rate / len(modules), count=count,
+                            batch_size=batch_size) for module in modules]
+    device = FakeDevice(streams=streams, files={DOWNLOAD_PATH: download})
+    core = Core(device, TARGET, None, data_root=tempfile.mkdtemp(prefix="wormhole-bench-"))
+    null = Null()
+    core.add_connector(null)
+
+    if not core.run(js_source="") or not core.operations(modules, [], connectors):
+        raise RuntimeError("Unable to start the fake session")
+
+    start = time.perf_counter()
+    script = device.sessions[0].scripts[0]
+    while any(stream.sent < count for stream in streams):
+        time.sleep(0.01)
+    deadline = time.perf_counter() + DRAIN_TIMEOUT
+    while time.perf_counter() < deadline:
+        stats = core.ingestion_stats()
+        if stats["processed"] + stats["dropped"] >= script.sent:
+            break
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    stats = core.ingestion_stats()
+
+    download_start = time.perf_counter()
+    session, err = core.execute_method(DOWNLOAD_METHOD, DOWNLOAD_PATH)
+    download_seconds = time.perf_counter() - download_start
+    with open(os.path.join(core._data_dir, session), "rb") as downloaded:
+        if err or hashlib.sha256(downloaded.read()).digest() != hashlib.sha256(download).digest():
+            raise RuntimeError(f"Corrupted download: {err}")
+
+    core.detach_session()
+    return null.count / elapsed, null.count, stats["dropped"], stats["max_depth"], \
+        len(download) / download_seconds / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rates", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--modules", nargs="+", default=["io", "sqlite", "syscall", "dyld"], choices=list(CORPORA))
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--connectors", nargs="+", default=[])
+    args = parser.parse_args()
+
+    download = os.urandom(DOWNLOAD_BYTES)
+    print(f"{'RATE':>8}{'EVENTS/S':>12}{'EVENTS':>10}{'DROPPED':>10}{'MAX DEPTH':>11}{'DOWNLOAD MB/S':>15}")
+    for rate in args.rates:
+        event_rate, events, dropped, max_depth, download_rate = \
+            run(args.modules, rate, args.seconds, args.batch_size, args.connectors, download)
+        print(f"{rate:>8}{event_rate:>12,.0f}{events:>10}{dropped:>10}{max_depth:>11}{download_rate:>15,.1f}")
+
+
+if __name__ == '__main__':
+    main()
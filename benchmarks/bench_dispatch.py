@@ -0,0 +1,117 @@
+"""
+Compare symbol dispatch through the cached BaseModule tables against the substring if-chains modules used before.
+The symbol mix reproduces the distribution of a capture of an app hooking io and sqlite.
+
+Usage:
+    python benchmarks/bench_dispatch.py [--events 500000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wormhole.hooking.modules.io import Io  # noqa: E402
+from wormhole.hooking.modules.sqlite import Sqlite  # noqa: E402
+
+SYMBOL_MIX = {
+    Sqlite: (
+        ("sqlite3_column_text", 22), ("sqlite3_column_int64", 18), ("sqlite3_column_int", 10),
+        ("sqlite3_step", 14), ("sqlite3_bind_text", 8), ("sqlite3_bind_int64", 7), ("sqlite3_reset", 6),
+        ("sqlite3_prepare_v2", 4), ("sqlite3_finalize", 4), ("sqlite3_column_blob", 3),
+        ("sqlite3_column_count", 2), ("sqlite3_bind_blob", 1), ("sqlite3_exec", 1), ("sqlite3_open_v2", 0.1),
+    ),
+    Io: (
+        ("read", 45), ("write", 25), ("open", 12), ("close", 12), ("fopen", 2), ("fclose", 2), ("fwrite", 2),
+    ),
+}
+
+
+def legacy_sqlite_chain(symbol):
+    if "open" in symbol:
+        return "open"
+    elif "exec" in symbol:
+        return "exec"
+    elif "prepare" in symbol:
+        return "prepare"
+    elif "bind_text" in symbol:
+        return "bind_text"
+    elif "bind_int" in symbol:
+        return "bind_int"
+    elif "bind_double" in symbol:
+        return "bind_double"
+    elif "bind_null" in symbol:
+        return "bind_null"
+    elif "bind_blob" in symbol:
+        return "bind_blob"
+    elif "step" in symbol:
+        return "step"
+    elif "finalize" in symbol:
+        return "finalize"
+    elif "reset" in symbol:
+        return "reset"
+    elif "column_count" in symbol:
+        return "column_count"
+    elif "column_int" in symbol or "column_dobule" in symbol:
+        return "column_int"
+    elif "column_text" in symbol:
+        return "column_text"
+    elif "column_blob" in symbol:
+        return "column_blob"
+    return None
+
+
+def legacy_io_chain(symbol):
+    if 'open' in symbol:
+        return "open"
+    elif 'read' in symbol:
+        return "read"
+    elif "write" in symbol:
+        return "write"
+    elif "close" in symbol:
+        return "close"
+    return None
+
+
+LEGACY = {Sqlite: legacy_sqlite_chain, Io: legacy_io_chain}
+
+
+def cached_dispatch(module_class):
+    resolved = module_class._resolved_handlers
+    resolve = module_class._resolve_handler
+    missing = object()
+
+    def dispatch(symbol):
+        handler = resolved.get(symbol, missing)
+        if handler is missing:
+            handler = resolve(symbol)
+        return handler
+
+    return dispatch
+
+
+def measure(dispatch, symbols):
+    start = time.perf_counter()
+    for symbol in symbols:
+        dispatch(symbol)
+    return len(symbols) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=500000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for module_class, mix in SYMBOL_MIX.items():
+        symbols = rng.choices([s for s, _ in mix], weights=[w for _, w in mix], k=args.events)
+        legacy_rate = measure(LEGACY[module_class], symbols)
+        table_rate = measure(cached_dispatch(module_class), symbols)
+        print(f"{module_class.__name__}:\tif-chain {legacy_rate:,.0f} lookups/sec\t"
+              f"dispatch table {table_rate:,.0f} lookups/sec ({table_rate / legacy_rate:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
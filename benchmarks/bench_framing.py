@@ -0,0 +1,85 @@
+"""
+Check that JSON payloads and binary frames decode to the same messages and compare their decoding throughput.
+
+Usage:
+    python benchmarks/bench_framing.py [--events 100000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wormhole.hooking.modules.base import Message  # noqa: E402
+from wormhole.hooking.framing import SymbolRegistry, FrameDecoder, encode_frame  # noqa: E402
+
+FIELDS = ("timestamp", "tid", "module", "symbol", "args", "ret", "data")
+
+
+def synthetic_events(count):
+    calls = (
+        ("io", "open", ["/var/mobile/Library/Preferences/com.apple.test.plist", "0x1000201"], "0x3", None),
+        ("io", "read", ["0x3", 512], 512, b"\x00" * 512),
+        ("sqlite", "sqlite3_bind_text", ["0x1", "user@example.com"], "0x0", None),
+        ("mach", "mach_msg", [0x3, 0, 64, 0x1a03, 0, 0], 0, b"CPX@" * 16),
+        ("syscall", "sysctl", ["0x16fdfe3a0", 2, "0x0", "0x0"], 0, None),
+    )
+    events = list()
+    for i in range(count):
+        module, symbol, args, ret, data = calls[i % len(calls)]
+        payload = {
+            "timestamp": 1700000000000 + i,
+            "tid": 1000 + i % 8,
+            "type": module,
+            "symbol": symbol,
+            "data": {"args": args, "ret": ret}
+        }
+        events.append((payload, data))
+    return events
+
+
+def check_round_trip(events, registry):
+    frames = b"".join(encode_frame(registry, payload, data) for payload, data in events)
+    decoder = FrameDecoder(SymbolRegistry.from_payload(registry.to_payload()))
+    decoded = list(decoder.decode(frames))
+    assert len(decoded) == len(events)
+    for (payload, data), binary in zip(events, decoded):
+        expected = Message({'payload': payload}, data)
+        for field in FIELDS:
+            assert getattr(expected, field) == getattr(binary, field), \
+                f"{field}: {getattr(expected, field)!r} != {getattr(binary, field)!r}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=100000)
+    args = parser.parse_args()
+
+    events = synthetic_events(args.events)
+    registry = SymbolRegistry()
+    check_round_trip(events, registry)
+    print(f"round trip OK ({args.events} events, {len(registry.symbols)} symbols)")
+
+    json_messages = [(json.dumps({'type': 'send', 'payload': payload}), data) for payload, data in events]
+    start = time.perf_counter()
+    for raw, data in json_messages:
+        Message(json.loads(raw), data)
+    json_rate = args.events / (time.perf_counter() - start)
+
+    frames = b"".join(encode_frame(registry, payload, data) for payload, data in events)
+    decoder = FrameDecoder(registry)
+    start = time.perf_counter()
+    for _ in decoder.decode(frames):
+        pass
+    binary_rate = args.events / (time.perf_counter() - start)
+
+    json_size = sum(len(raw) + len(data or b"") for raw, data in json_messages)
+    print(f"json:\t{json_rate:,.0f} events/sec\t{json_size / args.events:.0f} bytes/event")
+    print(f"binary:\t{binary_rate:,.0f} events/sec\t{len(frames) / args.events:.0f} bytes/event "
+          f"({binary_rate / json_rate:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+"""
+Per-module microbenchmarks on synthetic message corpora shaped like the agent output:
+    - io: open/read/write/close cycles
+    - xpc: messages (and sync replies) with bplist17 roots
+    - sqlite: open, prepare/bind/step/column/reset/finalize lifecycles
+    - encryption: CCCryptor sessions (create, updates, final, release)
+    - network: NSURLSession request/response/body triples
+    - gestalt, syscall, dyld, notifications: single calls
+Every module runs alone, behind a ModulesManager publishing to a null connector, and is measured for:
+    - events/sec over the whole corpus
+    - p50/p99 latency of a single event (ModulesManager.process_message)
+    - peak bytes allocated while processing one event (tracemalloc)
+Results are saved as JSON (with the current commit), to compare them across commits with --compare.
+
+Usage:
+    python benchmarks/bench_modules.py [--events 20000] [--modules io xpc] [--output results.json]
+                                       [--compare previous.json]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import struct
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wormhole.hooking.connectors.null import Null  # noqa: E402
+from wormhole.hooking.modules_manager import ModulesManager  # noqa: E402
+from wormhole.hooking.connector_manager import ConnectorManager  # noqa: E402
+
+TIDS = 4
+WARMUP_EVENTS = 1000
+
+
+def _message(i, module, symbol, args, ret="0x0", data=None):
+    return {'type': 'send', 'payload': {
+        "timestamp": 1700000000000 + i,
+        "tid": 1000 + i % TIDS,
+        "type": module,
+        "symbol": symbol,
+        "data": {"args": args, "ret": ret}
+    }}, data
+
+
+# bplist17 encoding (the subset read by wormhole.utils.bplist17parser): objects are written in place,
+# containers store the absolute address of their last byte
+
+def _bplist17_object(buffer: bytearray, value) -> None:
+    if isinstance(value, bool):
+        buffer.append(0xB0 if value else 0xC0)
+    elif isinstance(value, int):
+        buffer.append(0x18)
+        buffer += struct.pack('<q', value)
+    elif isinstance(value, str):
+        encoded = value.encode('ascii')
+        if len(encoded) < 0xF:
+            buffer.append(0x70 | len(encoded))
+        else:
+            buffer += bytes((0x7F, 0x14)) + struct.pack('<I', len(encoded))
+        buffer += encoded
+    elif isinstance(value, (list, dict)):
+        buffer.append(0xA0 if isinstance(value, list) else 0xD0)
+        end_position = len(buffer)
+        buffer += bytes(8)
+        for item in (value if isinstance(value, list) else [part for pair in value.items() for part in pair]):
+            _bplist17_object(buffer, item)
+        struct.pack_into('<Q', buffer, end_position, len(buffer) - 1)
+    else:
+        buffer.append(0xE0)
+
+
+def bplist17(value) -> bytes:
+    buffer = bytearray(b"bplist17")
+    _bplist17_object(buffer, value)
+    return bytes(buffer)
+
+
+def ns_dictionary(values: dict) -> dict:
+    return {"$class": "NSDictionary", "NS.keys": list(values.keys()), "NS.objects": list(values.values())}
+
+
+def io_corpus(count):
+    messages = list()
+    i = 0
+    while len(messages) < count:
+        fd = hex(3 + i % 64)
+        path = f"/var/mobile/Containers/Data/Application/0A1B/Library/Caches/cache_{i % 200}.db"
+        messages.append(_message(i, "io", "open", [path, "0x601"], fd))
+        messages.append(_message(i, "io", "read", [fd, "0x16f5e3a40", "0x1000"], "0x1000", os.urandom(4096)))
+        messages.append(_message(i, "io", "write", [fd, "0x16f5e3a40", "0x200"], "0x200", os.urandom(512)))
+        messages.append(_message(i, "io", "close", [fd], "0x0"))
+        i += 1
+    return messages[:count]
+
+
+def xpc_corpus(count):
+    messages = list()
+    for i in range(count):
+        root = base64.b64encode(bplist17(ns_dictionary({
+            "request": "fetchConfiguration", "identifier": f"com.apple.test.{i % 50}", "version": i,
+            "options": ns_dictionary({"cached": True, "priority": 3}),
+        }))).decode()
+        message = json.dumps({"type": "dictionary", "root": root, "count": 4})
+        if i % 2:
+            reply = json.dumps({"type": "dictionary", "root": base64.b64encode(bplist17(ns_dictionary(
+                {"status": 0, "configuration": "x" * 64}))).decode()})
+            messages.append(_message(i, "xpc", "xpc_connection_send_message_with_reply_sync",
+                                     ["com.apple.securityd", message], reply))
+        else:
+            messages.append(_message(i, "xpc", "xpc_connection_send_message", ["com.apple.locationd", message]))
+    return messages
+
+
+def sqlite_corpus(count):
+    messages = [_message(0, "sqlite", "sqlite3_open_v2", ["/var/mobile/Library/test.sqlite"], "0x0")]
+    i = 0
+    while len(messages) < count:
+        if i % 2:
+            messages.append(_message(i, "sqlite", "sqlite3_prepare_v2",
+                                     ["SELECT id, name FROM contacts WHERE name = ? AND age > ?"]))
+            messages.append(_message(i, "sqlite", "sqlite3_bind_text", ["0x1", f"user{i}"]))
+            messages.append(_message(i, "sqlite", "sqlite3_bind_int", ["0x2", hex(18 + i % 50)]))
+            messages.append(_message(i, "sqlite", "sqlite3_column_count", [], "0x2"))
+            for row in range(3):
+                messages.append(_message(i, "sqlite", "sqlite3_step", [], "0x64"))
+                messages.append(_message(i, "sqlite", "sqlite3_column_int", ["0x0"], hex(row)))
+                messages.append(_message(i, "sqlite", "sqlite3_column_text", ["0x1"], f"name{row}"))
+            messages.append(_message(i, "sqlite", "sqlite3_step", [], "0x65"))
+            messages.append(_message(i, "sqlite", "sqlite3_reset", []))
+        else:
+            messages.append(_message(i, "sqlite", "sqlite3_prepare_v2",
+                                     ["INSERT INTO events (kind, payload) VALUES (?, ?)"]))
+            messages.append(_message(i, "sqlite", "sqlite3_bind_text", ["0x1", "launch"]))
+            messages.append(_message(i, "sqlite", "sqlite3_bind_double", ["0x2", hex(i)]))
+            messages.append(_message(i, "sqlite", "sqlite3_step", [], "0x65"))
+        messages.append(_message(i, "sqlite", "sqlite3_finalize", []))
+        i += 1
+    return messages[:count]
+
+
+def encryption_corpus(count):
+    messages = list()
+    i = 0
+    while len(messages) < count:
+        decrypt = i % 2
+        key, iv = os.urandom(32), os.urandom(16)
+        messages.append(_message(i, "encryption", "CCCryptorCreateWithMode",
+                                 [hex(decrypt), "0x2", "0x0", "0x1", True, 32], "0x0", key + iv))
+        for _ in range(4):
+            messages.append(_message(i, "encryption", "CCCryptorUpdate", [256], "0x0", os.urandom(512)))
+        messages.append(_message(i, "encryption", "CCCryptorFinal", [], "0x0", os.urandom(16)))
+        messages.append(_message(i, "encryption", "CCCryptorRelease", [], "0x0"))
+        i += 1
+    return messages[:count]
+
+
+def network_corpus(count):
+    messages = list()
+    i = 0
+    while len(messages) < count:
+        url = f"https://api.example.com/v1/items/{i}?lang=en"
+        headers = json.dumps({"Accept": "application/json", "User-Agent": "App/1.0 CFNetwork", "X-Request": str(i)})
+        messages.append(_message(i, "network", "-[NSURLSession dataTaskWithRequest:completionHandler:]",
+                                 [url, "POST", headers, ""], "0x0", b'{"query": "items"}'))
+        messages.append(_message(i, "network", "-[NSURLResponse _initWithCFURLResponse:]",
+                                 [url, 200, json.dumps({"Content-Type": "application/json"})]))
+        messages.append(_message(i, "network", "-[NSURLSession dataTaskWithRequest:completionHandler:]-callback",
+                                 [url], "0x0", b'{"items": []}' * 20))
+        i += 1
+    return messages[:count]
+
+
+def calls_corpus(module, calls):
+    def corpus(count):
+        return [_message(i, module, *calls[i % len(calls)]) for i in range(count)]
+    return corpus
+
+
+CORPORA = {
+    "io": io_corpus,
+    "xpc": xpc_corpus,
+    "sqlite": sqlite_corpus,
+    "encryption": encryption_corpus,
+    "network": network_corpus,
+    "gestalt": calls_corpus("gestalt", [("MGCopyAnswer", ["UniqueDeviceID"], "a1b2c3"),
+                                        ("MGGetBoolAnswer", ["InternalBuild"], "0x0")]),
+    "syscall": calls_corpus("syscall", [("sysctlbyname", ["kern.osversion", "0x16fdfe3a0", "0x16fdfe398"], "0x0"),
+                                        ("__mac_syscall", ["Sandbox", "0x2", "0x16fdfe3a0"], "0x0")]),
+    "dyld": calls_corpus("dyld", [("dlopen", ["/usr/lib/libz.dylib", "0x1"], "0x1a2b3c"),
+                                  ("dlsym", ["0x1a2b3c", "inflate"], "0x1b2c3d")]),
+    "notifications": calls_corpus("notifications", [("notify_register_dispatch", ["com.apple.test", "0x5"]),
+                                                    ("notify_post", ["com.apple.test"])]),
+}
+
+
+def new_manager(module):
+    connector = Null()
+    connector_manager = ConnectorManager([])
+    connector_manager.add_connector(connector)
+    manager = ModulesManager("bench", tempfile.mkdtemp(prefix="wormhole-bench-"))
+    manager.init_modules([module], [], connector_manager)
+    return manager, connector
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def bench_module(module, events):
+    corpus = CORPORA[module](events)
+
+    # Every measure on a fresh manager, so module state (open files, pending queries...) starts empty
+    manager, _ = new_manager(module)
+    for message, data in corpus[:WARMUP_EVENTS]:
+        manager.process_message(message, data)
+
+    manager, connector = new_manager(module)
+    start = time.perf_counter()
+    for message, data in corpus:
+        manager.process_message(message, data)
+    rate = len(corpus) / (time.perf_counter() - start)
+
+    manager, _ = new_manager(module)
+    latencies = list()
+    for message, data in corpus:
+        started = time.perf_counter_ns()
+        manager.process_message(message, data)
+        latencies.append(time.perf_counter_ns() - started)
+    latencies.sort()
+
+    manager, _ = new_manager(module)
+    tracemalloc.start()
+    peak = 0
+    for message, data in corpus:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        manager.process_message(message, data)
+        peak += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    return {
+        "events": len(corpus),
+        "published": connector.count,
+        "events_per_sec": rate,
+        "p50_us": percentile(latencies, 0.50) / 1000,
+        "p99_us": percentile(latencies, 0.99) / 1000,
+        "peak_bytes_per_event": peak / len(corpus),
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--modules", nargs="+", choices=sorted(CORPORA), default=sorted(CORPORA))
+    parser.add_argument("--output", default=None, help="JSON results file (default: bench_modules-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="JSON results of a previous run")
+    args = parser.parse_args()
+
+    results = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "events": args.events,
+        "modules": {module: bench_module(module, args.events) for module in args.modules},
+    }
+    previous = dict()
+    if args.compare:
+        with open(args.compare) as previous_file:
+            previous = json.load(previous_file).get("modules", {})
+
+    print(f"{'MODULE':<16}{'EV/S':>12}{'P50 (us)':>10}{'P99 (us)':>10}{'PEAK B/EV':>11}{'PUBLISHED':>11}"
+          f"{'VS PREVIOUS':>13}")
+    for module, stats in results["modules"].items():
+        change = ""
+        if module in previous:
+            change = f"{(stats['events_per_sec'] / previous[module]['events_per_sec'] - 1) * 100:+.1f}%"
+        print(f"{module:<16}{stats['events_per_sec']:>12,.0f}{stats['p50_us']:>10.1f}{stats['p99_us']:>10.1f}"
+              f"{stats['peak_bytes_per_event']:>11,.0f}{stats['published']:>11}{change:>13}")
+
+    output = args.output or f"bench_modules-{results['commit'] or 'unknown'}.json"
+    with open(output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
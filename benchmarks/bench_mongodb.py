@@ -0,0 +1,80 @@
+"""
+Throughput of the Mongodb connector fed at a fixed event rate, with per-event writes (batch size 1) and with
+bulk insert_many buffers. Events go through a ConnectorManager, like during a capture.
+Without --port, a local stand-in server implementing the MongoDB wire protocol is started in another process.
+
+Usage:
+    python benchmarks/bench_mongodb.py [--rates 1000 10000 50000] [--seconds 3] [--host 127.0.0.1 --port 27017]
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wormhole.hooking.event import HookEvent  # noqa: E402
+from wormhole.hooking.connectors.mongodb import Mongodb  # noqa: E402
+from wormhole.hooking.connector_manager import ConnectorManager  # noqa: E402
+
+MODULES = ("io", "sqlite", "syscall", "xpc")
+TICK = 0.005
+
+
+def synthetic_event(i):
+    return HookEvent(1700000000000 + i, 1000 + i % 8, MODULES[i % len(MODULES)], "open",
+                     args=["/var/mobile/Library/Preferences/com.apple.test.plist", "0x1000201"], ret="0x3",
+                     template="{args[0]} -> {ret}")
+
+
+def run(host, port, rate, seconds, batch_size):
+    connector = Mongodb(host, port, database="wormhole_bench", batch_size=batch_size)
+    manager = ConnectorManager([], policies={"mongodb": "drop_newest"})
+    manager.add_connector(connector)
+
+    total = int(rate * seconds)
+    start = time.perf_counter()
+    published, max_lag = 0, 0.0
+    while published < total:
+        due = min(total, int((time.perf_counter() - start) * rate) + 1)
+        while published < due:
+            manager.forward(synthetic_event(published))
+            published += 1
+        max_lag = max(max_lag, manager.stats()["mongodb"]["lag"])
+        time.sleep(TICK)
+
+    stats = manager.stats()["mongodb"]
+    manager.clean_connectors()
+    elapsed = time.perf_counter() - start
+    return connector.inserted / elapsed, max_lag, stats["dropped"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rates", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args()
+
+    server = None
+    if args.port is None:
+        server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "standins.py"),
+                                   "mongo"], stdout=subprocess.PIPE, text=True)
+        args.port = int(server.stdout.readline())
+        print(f"Stand-in MongoDB server on port {args.port}")
+
+    print(f"{'RATE':>8}{'BATCH':>8}{'STORED EV/S':>14}{'MAX LAG (s)':>14}{'DROPPED':>10}")
+    for rate in args.rates:
+        for batch_size in (1, 1000):
+            stored_rate, max_lag, dropped = run(args.host, args.port, rate, args.seconds, batch_size)
+            print(f"{rate:>8}{batch_size:>8}{stored_rate:>14,.0f}{max_lag:>14.3f}{dropped:>10}")
+
+    if server:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
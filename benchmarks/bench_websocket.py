@@ -0,0 +1,81 @@
+"""
+End to end throughput of the Websocket connector: events go through a ConnectorManager to a Flask-SocketIO
+namespace and are counted on a connected test client, emitting one 'message' event per event (legacy) and
+coalescing them into 'messages' frames.
+
+Usage:
+    python benchmarks/bench_websocket.py [--events 20000] [--frame-sizes 1 500]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask_socketio import SocketIO, Namespace  # noqa: E402
+
+from wormhole.hooking.event import HookEvent  # noqa: E402
+from wormhole.hooking.connectors.websocket import Websocket  # noqa: E402
+from wormhole.hooking.connector_manager import ConnectorManager  # noqa: E402
+
+NAMESPACE = "/wormhole"
+MODULES = ("io", "sqlite", "syscall", "xpc")
+
+
+def synthetic_event(i):
+    return HookEvent(1700000000000 + i, 1000 + i % 8, MODULES[i % len(MODULES)], "read",
+                     args=["0x3", "0x16f5e3a40", "0x200"], ret="0x200", template="{args[0]} -> {ret}",
+                     data=bytes(range(256)) * 2 if i % 10 == 0 else None)
+
+
+def received_events(client) -> (int, int):
+    frames, events = 0, 0
+    for packet in client.get_received(NAMESPACE):
+        frames += 1
+        events += len(packet["args"][0]["data"]) if packet["name"] == "messages" else 1
+    return frames, events
+
+
+def run(events, frame_size):
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode="threading")
+    namespace = Namespace(NAMESPACE)
+    socketio.on_namespace(namespace)
+    client = socketio.test_client(app, namespace=NAMESPACE)
+
+    manager = ConnectorManager([], policies={"websocket": "block"})
+    manager.add_connector(Websocket(namespace, frame_size=frame_size, legacy=frame_size == 1))
+
+    start = time.perf_counter()
+    for i in range(events):
+        manager.forward(synthetic_event(i))
+    published = time.perf_counter() - start
+
+    frames, received = 0, 0
+    while received < events:
+        new_frames, new_events = received_events(client)
+        frames, received = frames + new_frames, received + new_events
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    manager.clean_connectors()
+    client.disconnect(namespace=NAMESPACE)
+    return events / published, events / elapsed, frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--frame-sizes", type=int, nargs="+", default=[1, 500])
+    args = parser.parse_args()
+
+    print(f"{'FRAME':>8}{'PUBLISH EV/S':>16}{'RECEIVED EV/S':>16}{'FRAMES':>10}")
+    for frame_size in args.frame_sizes:
+        publish_rate, receive_rate, frames = run(args.events, frame_size)
+        print(f"{frame_size:>8}{publish_rate:>16,.0f}{receive_rate:>16,.0f}{frames:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""
+Stand-in for the subset of the Frida API used by Core, to load test run()/operations()/detach, downloads and
+connectors without a device (i.e. in CI on Linux):
+
+    device = FakeDevice(streams=[EventStream("io", "open", ["/tmp/a", "0x0"], "0x3", rate=5000)],
+                        files={"/var/mobile/test.db": b"..."})
+    core = Core(device, "com.example.app", None)
+    core.run(js_source="")
+    core.operations(["io"], [], ["null"])
+
+    - FakeDevice: query_system_parameters, enumerate_processes, spawn, resume, kill, attach, on
+    - FakeSession: create_script, on('detached'), detach
+    - FakeScript: on('message'/'destroyed'), load, unload, post, exports.hook/unhook/invoke
+
+Once hooked, the script sends the messages of the streams of the hooked modules from its own thread (as Frida
+does), each stream at its own target rate, optionally grouped into batches. exports.invoke(DOWNLOAD_METHOD, [path])
+sends a file of the device in chunks, waiting for the {"type": "ack"} posted by the host after each one.
+"""
+import time
+import itertools
+import threading
+
+from typing import Callable, Dict, List, NamedTuple, Union
+
+TICK = 0.002
+DOWNLOAD_METHOD = "download"
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+ACK_TIMEOUT = 10.0
+
+
+class FakeProcess(NamedTuple):
+    pid: int
+    name: str
+
+
+class EventStream:
+    """
+    Hooked calls of a module sent at a target rate
+    """
+
+    def __init__(self,
+                 module: str,
+                 symbol: str,
+                 args: Union[list, Callable[[int], list]],
+                 ret: Union[str, Callable[[int], str]] = "0x0",
+                 data: Union[bytes, Callable[[int], Union[bytes, None]], None] = None,
+                 rate: float = 1000.0,
+                 count: Union[int, None] = None,
+                 batch_size: int = 1,
+                 tids: int = 4):
+        """
+        :param module: module of the calls (payload type)
+        :param symbol: hooked function
+        :param args: arguments of the calls, or function of the call index returning them
+        :param ret: return value of the calls, or function of the call index returning it
+        :param data: raw bytes sent with the calls, or function of the call index returning them
+        :param rate: calls per second
+        :param count: calls to send (None: until unhook)
+        :param batch_size: calls grouped into a single "batch" message
+        :param tids: calls are spread over this number of thread ids
+        """
+        self.module: str = module
+        self.symbol: str = symbol
+        self._args = args
+        self._ret = ret
+        self._data = data
+        self.rate: float = rate
+        self.count: Union[int, None] = count
+        self.batch_size: int = batch_size
+        self._tids: int = tids
+        self.sent: int = 0
+
+    def call(self, i: int) -> tuple:
+        """
+        :return: payload and data of the i-th call
+        """
+        data = self._data(i) if callable(self._data) else self._data
+        return {
+            "timestamp": int(time.time() * 1000),
+            "tid": 1000 + i % self._tids,
+            "type": self.module,
+            "symbol": self.symbol,
+            "data": {
+                "args": self._args(i) if callable(self._args) else list(self._args),
+                "ret": self._ret(i) if callable(self._ret) else self._ret,
+            }
+        }, data
+
+    def message(self, first: int, calls: int) -> tuple:
+        """
+        :return: message and data carrying calls [first, first + calls), batched if more than one
+        """
+        if calls == 1:
+            payload, data = self.call(first)
+            return {"type": "send", "payload": payload}, data
+
+        events, blob = list(), bytearray()
+        for i in range(first, first + calls):
+            payload, data = self.call(i)
+            if data is not None:
+                payload["offset"], payload["length"] = len(blob), len(data)
+                blob += data
+            events.append(payload)
+        return {"type": "send", "payload": {"type": "batch", "events": events}}, bytes(blob) if blob else None
+
+
+class CorpusStream(EventStream):
+    """
+    Calls of a module taken in turn from a corpus of (message, data) (i.e. the corpora of bench_modules),
+    with fresh timestamps
+    """
+
+    def __init__(self, module: str, corpus: List[tuple], **kwargs):
+        """
+        :param module: module of the calls
+        :param corpus: messages of the calls, as sent by the agent
+        :param kwargs: rate, count and batch_size (see EventStream)
+        """
+        super(CorpusStream, self).__init__(module, "", [], **kwargs)
+        self._corpus: List[tuple] = corpus
+
+    def call(self, i: int) -> tuple:
+        message, data = self._corpus[i % len(self._corpus)]
+        return dict(message['payload'], timestamp=int(time.time() * 1000)), data
+
+
+class _Exports:
+
+    def __init__(self, script: 'FakeScript'):
+        self._script = script
+
+    def hook(self, modules: List[str], custom_modules: List[str]) -> bool:
+        return self._script.hook(modules + custom_modules)
+
+    def unhook(self) -> bool:
+        return self._script.unhook()
+
+    def invoke(self, method: str, args):
+        return self._script.invoke(method, args)
+
+
+class FakeScript:
+
+    def __init__(self, session: 'FakeSession', source: str):
+        self.session: 'FakeSession' = session
+        self.source: str = source
+        self.exports: _Exports = _Exports(self)
+        self.loaded: bool = False
+        self.posted: List[dict] = list()
+        self.sent: int = 0
+        self._callbacks: Dict[str, List[Callable]] = dict()
+        self._streams: List[EventStream] = list()
+        self._stop = threading.Event()
+        self._emitter: Union[threading.Thread, None] = None
+        self._ack = threading.Semaphore(0)
+        self._downloads = itertools.count(1)
+        self._send_lock = threading.Lock()
+
+    def on(self, signal: str, callback: Callable) -> None:
+        self._callbacks.setdefault(signal, list()).append(callback)
+
+    def off(self, signal: str, callback: Callable) -> None:
+        self._callbacks.get(signal, []).remove(callback)
+
+    def _emit(self, signal: str, *args) -> None:
+        for callback in list(self._callbacks.get(signal, [])):
+            callback(*args)
+
+    def _send(self, message: dict, data: Union[bytes, None]) -> None:
+        with self._send_lock:
+            self.sent += 1
+            self._emit('message', message, data)
+
+    def load(self) -> None:
+        self.loaded = True
+
+    def unload(self) -> None:
+        self.unhook()
+        if self.loaded:
+            self.loaded = False
+            self._emit('destroyed')
+
+    def post(self, message: dict, data: Union[bytes, None] = None) -> None:
+        if message.get("type") == "ack":
+            self._ack.release()
+        else:
+            self.posted.append(message)
+
+    def hook(self, modules: List[str]) -> bool:
+        if self._emitter:
+            return False
+        self._streams = [stream for stream in self.session.device.streams if stream.module in modules]
+        self._stop.clear()
+        self._emitter = threading.Thread(target=self._run, name="fake-frida-script", daemon=True)
+        self._emitter.start()
+        return True
+
+    def unhook(self) -> bool:
+        if not self._emitter:
+            return False
+        self._stop.set()
+        self._emitter.join()
+        self._emitter = None
+        return True
+
+    def _run(self) -> None:
+        sent = [0] * len(self._streams)
+        started = time.perf_counter()
+        while not self._stop.is_set():
+            elapsed = time.perf_counter() - started
+            pending = False
+            for n, stream in enumerate(self._streams):
+                due = int(elapsed * stream.rate) + 1
+                if stream.count is not None:
+                    due = min(due, stream.count)
+                # Full batches only, but the last one
+                while due - sent[n] >= stream.batch_size or (due == stream.count and due > sent[n]):
+                    calls = min(stream.batch_size, due - sent[n])
+                    self._send(*stream.message(sent[n], calls))
+                    sent[n] += calls
+                    stream.sent += calls
+                pending = pending or stream.count is None or sent[n] < stream.count
+            if not pending:
+                return
+            self._stop.wait(TICK)
+
+    def invoke(self, method: str, args):
+        if method == DOWNLOAD_METHOD:
+            return self._download(args[0])
+        result = self.session.device.invocations.get(method, None)
+        if result is None:
+            raise Exception(f"unable to find method '{method}'")
+        return result(*args) if callable(result) else result
+
+    def _download(self, path: str) -> str:
+        """
+        Send a file of the device in chunks, each one acknowledged by the host
+        """
+        content = self.session.device.files.get(path, None)
+        if content is None:
+            raise Exception(f"No such file: {path}")
+
+        session = f"download_{next(self._downloads)}"
+        self._send({"type": "send", "payload": {"type": "download", "event": "start", "session": session,
+                                                "path": path, "size": len(content)}}, None)
+        for start in range(0, len(content), DOWNLOAD_CHUNK_SIZE):
+            self._send({"type": "send", "payload": {"type": "download", "event": "data", "session": session}},
+                       content[start:start + DOWNLOAD_CHUNK_SIZE])
+            if not self._ack.acquire(timeout=ACK_TIMEOUT):
+                raise Exception(f"Download of {path} not acknowledged")
+        self._send({"type": "send", "payload": {"type": "download", "event": "end", "session": session}}, None)
+        return session
+
+
+class FakeSession:
+
+    def __init__(self, device: 'FakeDevice', pid: int):
+        self.device: 'FakeDevice' = device
+        self.pid: int = pid
+        self.scripts: List[FakeScript] = list()
+        self.detached: bool = False
+        self._callbacks: Dict[str, List[Callable]] = dict()
+
+    def on(self, signal: str, callback: Callable) -> None:
+        self._callbacks.setdefault(signal, list()).append(callback)
+
+    def off(self, signal: str, callback: Callable) -> None:
+        self._callbacks.get(signal, []).remove(callback)
+
+    def create_script(self, source: str, **kwargs) -> FakeScript:
+        script = FakeScript(self, source)
+        self.scripts.append(script)
+        return script
+
+    def detach(self, reason: str = "application-requested") -> None:
+        if self.detached:
+            return
+        self.detached = True
+        for script in self.scripts:
+            script.unload()
+        for callback in list(self._callbacks.get('detached', [])):
+            callback(reason, None)
+
+
+class FakeDevice:
+
+    def __init__(self,
+                 streams: Union[List[EventStream], None] = None,
+                 processes: Union[List[FakeProcess], None] = None,
+                 files: Union[Dict[str, bytes], None] = None,
+                 invocations: Union[Dict[str, object], None] = None,
+                 os_id: str = "ios",
+                 device_type: str = "local"):
+        """
+        :param streams: hooked calls sent by every script once its modules are hooked
+        :param processes: processes already running
+        :param files: path -> content of the files that can be downloaded
+        :param invocations: method -> result (or function of the args) of exports.invoke
+        :param os_id: 'ios' or 'macos'
+        :param device_type: 'local', 'usb' or 'remote'
+        """
+        self.streams: List[EventStream] = streams or []
+        self.files: Dict[str, bytes] = files or {}
+        self.invocations: Dict[str, object] = invocations or {}
+        self.type: str = device_type
+        self._os_id: str = os_id
+        self._processes: Dict[int, FakeProcess] = {process.pid: process for process in processes or []}
+        self._pids = itertools.count(max(self._processes, default=1000) + 1)
+        self._callbacks: Dict[str, List[Callable]] = dict()
+        self.sessions: List[FakeSession] = list()
+        self.resumed: List[int] = list()
+
+    def on(self, signal: str, callback: Callable) -> None:
+        self._callbacks.setdefault(signal, list()).append(callback)
+
+    def off(self, signal: str, callback: Callable) -> None:
+        self._callbacks.get(signal, []).remove(callback)
+
+    def query_system_parameters(self) -> dict:
+        return {"os": {"id": self._os_id}}
+
+    def enumerate_processes(self, scope: Union[str, None] = None) -> List[FakeProcess]:
+        return list(self._processes.values())
+
+    def spawn(self, program: str, **kwargs) -> int:
+        pid = next(self._pids)
+        self._processes[pid] = FakeProcess(pid, program)
+        return pid
+
+    def resume(self, pid: int) -> None:
+        self.resumed.append(pid)
+
+    def kill(self, pid: int) -> None:
+        self._processes.pop(pid, None)
+        for session in self.sessions:
+            if session.pid == pid:
+                session.detach("process-terminated")
+
+    def attach(self, pid: int, **kwargs) -> FakeSession:
+        if pid not in self._processes:
+            raise Exception(f"unable to find process with pid {pid}")
+        session = FakeSession(self, pid)
+        self.sessions.append(session)
+        return session
@@ -0,0 +1,237 @@
+"""
+Local stand-in servers speaking the wire protocol of the output sources, to benchmark connectors (and check their
+behaviour when the server goes down and comes back) without a real deployment. They can be stopped and started again
+on the same port. Run one in its own process (so it does not compete with the benchmark for the GIL) with:
+    python benchmarks/standins.py mongo --port 27017
+
+    - StandInMongo: OP_MSG/OP_QUERY handshake, insert (duplicate _id refused with code 11000), any other command is ok
+    - StandInRedis: RESP2 only (HELLO refused), XADD (entries kept per stream, MAXLEN honoured), PUBLISH, XLEN,
+      any other command is ok
+"""
+import time
+import struct
+import socket
+import argparse
+import threading
+import itertools
+
+from datetime import datetime
+
+import bson
+
+_HEADER = struct.Struct('<iiii')
+OP_REPLY = 1
+OP_QUERY = 2004
+OP_MSG = 2013
+
+
+class StandInServer:
+
+    def __init__(self, port: int = 0, host: str = '127.0.0.1'):
+        self.host = host
+        self.port = port
+        self._socket = None
+        self._connections = list()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        self._socket = socket.socket()
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self.port = self._socket.getsockname()[1]
+        self._socket.listen(64)
+        threading.Thread(target=self._accept, args=(self._socket,), daemon=True).start()
+
+    def stop(self) -> None:
+        """
+        Close the listening socket and every client connection
+        """
+        for sock in [self._socket] + self._connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        self._connections = list()
+
+    def _accept(self, listening) -> None:
+        while True:
+            try:
+                connection, _ = listening.accept()
+            except OSError:
+                return
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._connections.append(connection)
+            threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+
+    def _serve_connection(self, connection) -> None:
+        try:
+            self.serve(connection)
+        except (OSError, ValueError, struct.error):
+            pass
+
+    def serve(self, connection) -> None:
+        raise NotImplementedError()
+
+
+def _recv_exactly(connection, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise OSError("connection closed")
+        data += chunk
+    return bytes(data)
+
+
+class StandInMongo(StandInServer):
+
+    def __init__(self, port: int = 0, host: str = '127.0.0.1'):
+        super(StandInMongo, self).__init__(port, host)
+        self.collections = dict()
+        self.insert_commands = 0
+        self._ids = itertools.count(1)
+
+    @property
+    def documents(self) -> int:
+        return sum(len(documents) for documents in self.collections.values())
+
+    def _hello(self) -> dict:
+        return {
+            "helloOk": True, "ismaster": True, "isWritablePrimary": True,
+            "maxBsonObjectSize": 16 * 1024 * 1024, "maxMessageSizeBytes": 48000000, "maxWriteBatchSize": 100000,
+            "localTime": datetime.now(), "logicalSessionTimeoutMinutes": 30, "connectionId": next(self._ids),
+            "minWireVersion": 0, "maxWireVersion": 21, "readOnly": False, "ok": 1.0,
+        }
+
+    def _command(self, body: dict, documents: list) -> dict:
+        name = next(iter(body))
+        if name.lower() in ("hello", "ismaster"):
+            return self._hello()
+        if name == "insert":
+            documents = documents or body.get("documents", [])
+            with self._lock:
+                self.insert_commands += 1
+                collection = self.collections.setdefault(body["insert"], dict())
+                errors = list()
+                for index, document in enumerate(documents):
+                    if document.get("_id") in collection:
+                        errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key error"})
+                    else:
+                        collection[document.get("_id")] = document
+            reply = {"n": len(documents) - len(errors), "ok": 1.0}
+            if errors:
+                reply["writeErrors"] = errors
+            return reply
+        return {"ok": 1.0}
+
+    def serve(self, connection) -> None:
+        while True:
+            length, request_id, _, opcode = _HEADER.unpack(_recv_exactly(connection, _HEADER.size))
+            message = _recv_exactly(connection, length - _HEADER.size)
+
+            if opcode == OP_QUERY:
+                # flags, full collection name, skip, limit, query
+                name_end = message.index(b"\x00", 4)
+                query_start = name_end + 1 + 8
+                query_length, = struct.unpack_from('<i', message, query_start)
+                body = bson.decode(message[query_start:query_start + query_length])
+                reply = bson.encode(self._command(body, []))
+                payload = struct.pack('<iqii', 0, 0, 0, 1) + reply
+                connection.sendall(_HEADER.pack(_HEADER.size + len(payload), 0, request_id, OP_REPLY) + payload)
+                continue
+
+            flags, = struct.unpack_from('<I', message, 0)
+            end = len(message) - (4 if flags & 1 else 0)
+            position, body, documents = 4, dict(), list()
+            while position < end:
+                kind = message[position]
+                position += 1
+                size, = struct.unpack_from('<i', message, position)
+                if kind == 0:
+                    body = bson.decode(message[position:position + size])
+                else:
+                    identifier_end = message.index(b"\x00", position + 4)
+                    documents.extend(bson.decode_all(message[identifier_end + 1:position + size]))
+                position += size
+
+            reply = bson.encode(self._command(body, documents))
+            payload = struct.pack('<IB', 0, 0) + reply
+            connection.sendall(_HEADER.pack(_HEADER.size + len(payload), 0, request_id, OP_MSG) + payload)
+
+
+class StandInRedis(StandInServer):
+
+    def __init__(self, port: int = 0, host: str = '127.0.0.1'):
+        super(StandInRedis, self).__init__(port, host)
+        self.streams = dict()
+        self.published = list()
+        self.commands = 0
+        self._ids = itertools.count(1)
+
+    @property
+    def entries(self) -> int:
+        return sum(len(entries) for entries in self.streams.values())
+
+    def _command(self, parts: list) -> bytes:
+        name = parts[0].upper()
+        if name == b"XADD":
+            stream, position, maxlen = parts[1], 2, None
+            if parts[position].upper() == b"MAXLEN":
+                position += 1
+                if parts[position] in (b"~", b"="):
+                    position += 1
+                maxlen = int(parts[position])
+                position += 1
+            entry_id = f"{next(self._ids)}-0".encode()
+            fields = dict(zip(parts[position + 1::2], parts[position + 2::2]))
+            with self._lock:
+                entries = self.streams.setdefault(stream, list())
+                entries.append((entry_id, fields))
+                if maxlen is not None and len(entries) > maxlen:
+                    del entries[:len(entries) - maxlen]
+            return b"$%d\r\n%s\r\n" % (len(entry_id), entry_id)
+        if name == b"XLEN":
+            return b":%d\r\n" % len(self.streams.get(parts[1], []))
+        if name == b"PUBLISH":
+            self.published.append((parts[1], parts[2]))
+            return b":0\r\n"
+        if name == b"HELLO":
+            return b"-ERR unknown command 'HELLO'\r\n"
+        return b"+OK\r\n"
+
+    def serve(self, connection) -> None:
+        reader = connection.makefile("rb")
+        while True:
+            line = reader.readline()
+            if not line:
+                return
+            parts = list()
+            for _ in range(int(line[1:])):
+                size = int(reader.readline()[1:])
+                parts.append(reader.read(size + 2)[:-2])
+            self.commands += 1
+            connection.sendall(self._command(parts))
+
+
+STAND_INS = {"mongo": StandInMongo, "redis": StandInRedis}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("server", choices=sorted(STAND_INS))
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    server = STAND_INS[args.server](args.port)
+    server.start()
+    print(server.port, flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+AsyncCore on the fake Frida device: events reach the async iterators, that stop when the session detaches
+"""
+import asyncio
+import threading
+
+from wormhole.async_core import AsyncCore
+
+from fake_frida import EventStream, FakeDevice
+
+EVENTS = 200
+TIMEOUT = 10.0
+
+
+def fake_device() -> FakeDevice:
+    return FakeDevice(streams=[EventStream("io", "open", lambda i: [f"/tmp/{i}", "0x0"], "0x3", rate=20000,
+                                           count=EVENTS)])
+
+
+async def collect(stream) -> list:
+    return [event async for event in stream]
+
+
+async def run_session(data_root: str, end) -> tuple:
+    """
+    Hook io, wait for its calls, then end the session
+    :param end: coroutine function ending the session of the given AsyncCore
+    :return: events received by two streams opened before, events of a stream opened after the end
+    """
+    async_core = await AsyncCore.create(fake_device(), "com.example.fake", data_root=data_root)
+    consumers = [asyncio.ensure_future(collect(async_core.events())) for _ in range(2)]
+    assert await async_core.run(js_source="")
+    assert await async_core.operations(["io"], [], [])
+
+    script = async_core.core._session.scripts[0]
+    while script.sent < EVENTS:
+        await asyncio.sleep(0.01)
+    await end(async_core)
+
+    received = await asyncio.wait_for(asyncio.gather(*consumers), TIMEOUT)
+    late = await asyncio.wait_for(collect(async_core.events()), TIMEOUT)
+    await async_core.close()
+    return received, late
+
+
+def check(received: list, late: list) -> None:
+    for events in received:
+        assert [event.args[0] for event in events] == [f"/tmp/{i}" for i in range(EVENTS)]
+    assert late == []
+
+
+def test_streams_end_on_detach_session(tmp_path):
+    async def end(async_core):
+        await async_core.detach_session()
+    check(*asyncio.run(run_session(str(tmp_path), end)))
+
+
+def test_streams_end_when_the_target_dies(tmp_path):
+    async def end(async_core):
+        # Reported by Frida, not requested by the user
+        async_core.core._session.detach("process-terminated")
+    check(*asyncio.run(run_session(str(tmp_path), end)))
+
+
+def test_create_releases_its_executor_on_error(tmp_path):
+    async def create():
+        # No process with this pid
+        await AsyncCore.create(fake_device(), 4242, data_root=str(tmp_path))
+
+    try:
+        asyncio.run(create())
+        assert False, "Core created for a missing process"
+    except IndexError:
+        pass
+    for thread in threading.enumerate():
+        if thread.name.startswith("wormhole-core"):
+            thread.join(TIMEOUT)
+            assert not thread.is_alive()
@@ -0,0 +1,90 @@
+"""
+Batches built by build_batch fanned out by the MessageDispatcher, as if their events came one by one
+"""
+from wormhole.hooking.batch import build_batch
+from wormhole.hooking.connector_manager import ConnectorManager
+from wormhole.hooking.connectors.base import BaseConnector
+from wormhole.hooking.dispatch import MessageDispatcher
+from wormhole.hooking.metrics import PipelineMetrics
+from wormhole.hooking.modules_manager import ModulesManager
+
+
+class Recorder:
+    """
+    Modules manager recording what the dispatcher hands over
+    """
+
+    def __init__(self):
+        self.messages: list = list()
+
+    def process_message(self, message: dict, data: bytes) -> None:
+        self.messages.append((message, data))
+
+    def process_decoded(self, message) -> None:
+        self.messages.append((message, None))
+
+
+class Collector(BaseConnector):
+    inline = True
+
+    def __init__(self):
+        super(Collector, self).__init__()
+        self.events: list = list()
+
+    def forward(self, event):
+        self.events.append(event)
+
+
+def call(i: int, symbol: str = "open", args: list = None) -> dict:
+    return {"timestamp": 1700000000000 + i, "tid": 259, "type": "io", "symbol": symbol,
+            "data": {"args": args if args is not None else [f"/tmp/{i}", "0x0"], "ret": "0x3"}}
+
+
+def test_round_trip():
+    events = [(call(0), b"first"), (call(1), None), (call(2), b""), (call(3), b"\x00\xff" * 10)]
+    recorder = Recorder()
+    MessageDispatcher(recorder).dispatch(*build_batch(events))
+
+    assert len(recorder.messages) == len(events)
+    for (message, data), (payload, sent_data) in zip(recorder.messages, events):
+        assert message["type"] == "send"
+        assert {key: value for key, value in message["payload"].items() if key not in ("offset", "length")} == payload
+        assert data == sent_data
+    # Slices of the shared blob
+    assert [message["payload"].get("offset") for message, _ in recorder.messages] == [0, None, 5, 5]
+
+
+def test_empty_batch():
+    recorder = Recorder()
+    message, blob = build_batch([])
+    assert blob == b""
+    MessageDispatcher(recorder).dispatch(message, blob)
+    assert recorder.messages == []
+
+
+def test_order_is_kept():
+    events = [(call(i), bytes([i % 256]) * (i % 7) or None) for i in range(500)]
+    recorder = Recorder()
+    dispatcher = MessageDispatcher(recorder)
+    for start in range(0, len(events), 100):
+        dispatcher.dispatch(*build_batch(events[start:start + 100]))
+
+    assert [message["payload"]["timestamp"] for message, _ in recorder.messages] == \
+        [payload["timestamp"] for payload, _ in events]
+    assert [data for _, data in recorder.messages] == [data for _, data in events]
+
+
+def test_malformed_event_does_not_stop_the_batch(tmp_path):
+    metrics = PipelineMetrics()
+    collector = Collector()
+    connector_manager = ConnectorManager([])
+    connector_manager.add_connector(collector)
+    modules_manager = ModulesManager("test", str(tmp_path), metrics=metrics)
+    modules_manager.init_modules(["io"], [], connector_manager)
+
+    events = [(call(0), None), (call(1, args=[]), None), ({"tid": 259}, None), (call(3), b"data")]
+    MessageDispatcher(modules_manager, metrics).dispatch(*build_batch(events))
+
+    assert [event.args[0] for event in collector.events] == ["/tmp/0", "/tmp/3"]
+    assert metrics.module("io").errors == 1
+    assert metrics.module("").errors == 1
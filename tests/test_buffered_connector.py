@@ -0,0 +1,113 @@
+"""
+BufferedConnector: flush thread lifecycle, periodic flush errors reaching the circuit breaker, Redis entries of
+events with missing fields (against the stand-in Redis server)
+"""
+import time
+import threading
+
+import pytest
+
+from wormhole.hooking.breaker import CircuitBreaker
+from wormhole.hooking.connectors.base import BufferedConnector
+from wormhole.hooking.connectors.redisdb import Redisdb
+from wormhole.hooking.event import HookEvent
+from wormhole.hooking.fanout import ConnectorWorker
+
+from standins import StandInRedis
+
+TIMEOUT = 10.0
+
+
+def wait_until(condition, timeout: float = TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def event(i: int, tid=1) -> HookEvent:
+    return HookEvent(i, tid, "io", "open", args=[f"/tmp/{i}", "0x0"], ret="0x3", template="{args[0]} -> {ret}")
+
+
+def flushers(name: str) -> list:
+    return [thread for thread in threading.enumerate() if thread.name == f"wormhole-{name}-flush"]
+
+
+class Sink(BufferedConnector):
+    """
+    Buffered connector whose writes fail while down is set
+    """
+
+    def __init__(self, batch_size: int = 1000, flush_interval: float = 0.05, fail_acquire: bool = False):
+        super(Sink, self).__init__(batch_size, flush_interval)
+        if fail_acquire:
+            raise ConnectionError("server unreachable")
+        self.down = threading.Event()
+        self.written: list = list()
+
+    def _encode(self, hook_event: HookEvent) -> int:
+        return hook_event.timestamp
+
+    def _write(self, key, items: list) -> None:
+        if self.down.is_set():
+            raise ConnectionError("server down")
+        self.written.extend(items)
+
+
+def test_flusher_starts_with_the_first_event():
+    with pytest.raises(ConnectionError):
+        Sink(fail_acquire=True)
+    assert flushers("sink") == []
+
+    sink = Sink()
+    assert sink.threads() == [] and flushers("sink") == []
+    sink.forward(event(0))
+    assert sink.threads() == flushers("sink")
+    # Written by the periodic flush
+    assert wait_until(lambda: sink.written == [0])
+    sink.close()
+    assert wait_until(lambda: flushers("sink") == [])
+
+
+def test_periodic_flush_errors_reach_the_breaker(tmp_path):
+    sink = Sink()
+    breaker = CircuitBreaker(failure_threshold=3, initial_backoff=0.1, max_backoff=0.2)
+    worker = ConnectorWorker(sink, "sink", spill_dir=str(tmp_path), breaker=breaker)
+    try:
+        sink.down.set()
+        worker.put(event(0))
+        # Failing on the flush thread, only the periodic flush sees the error: the next events fail as well
+        assert wait_until(lambda: sink._flush_error is not None)
+        for i in range(1, 10):
+            worker.put(event(i))
+        assert wait_until(lambda: breaker.trips == 1)
+        assert worker.stats()["spooled"] > 0
+
+        sink.down.clear()
+        assert wait_until(lambda: sorted(sink.written) == list(range(10)))
+        assert wait_until(lambda: breaker.is_closed)
+    finally:
+        worker.stop()
+
+
+def test_redis_entries_without_missing_fields():
+    server = StandInRedis()
+    server.start()
+    connector = Redisdb(port=server.port, batch_size=10, flush_interval=0.1)
+    try:
+        connector.forward(event(0))
+        connector.forward(HookEvent(None, None, "io", "open", args=["/tmp/1", "0x0"], ret="0x3",
+                                    template="{args[0]} -> {ret}"))
+        connector.forward(event(2))
+        connector.flush()
+    finally:
+        connector.close()
+        server.stop()
+
+    assert connector.appended == 3
+    entries = [fields for _, fields in server.streams[b"wormhole:io"]]
+    assert [fields.get(b"timestamp") for fields in entries] == [b"0", None, b"2"]
+    assert b"tid" not in entries[1]
+    assert entries[1][b"text"] == b"/tmp/1 -> 0x3"
@@ -0,0 +1,136 @@
+"""
+Capture segments: write/read round trip, torn and corrupted records, index skips, I/O errors
+"""
+import os
+import errno
+
+import pytest
+
+from wormhole.hooking import capture
+from wormhole.hooking.batch import build_batch
+from wormhole.hooking.capture import CaptureReader, CaptureWriter, MAGIC
+
+
+def message(i: int, module: str = "io") -> dict:
+    return {"type": "send", "payload": {"type": module, "symbol": "open", "tid": 259, "timestamp": i,
+                                        "data": {"args": [f"/tmp/{i}", "0x0"], "ret": "0x3"}}}
+
+
+class FullDisk:
+    """
+    Segment file of a full disk
+    """
+
+    def write(self, content):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    def flush(self):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    def close(self):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+
+def write_all(directory: str, messages: list, **kwargs) -> None:
+    writer = CaptureWriter(directory, **kwargs)
+    for captured_message, data in messages:
+        writer.write(captured_message, data)
+    writer.close()
+
+
+def test_round_trip(tmp_path):
+    messages = [(message(0), None), (message(1), b""), (message(2, "xpc"), b"\x00\xff" * 100),
+                build_batch([(message(3)["payload"], b"a"), (message(4, "network")["payload"], None)])]
+    write_all(str(tmp_path), messages)
+
+    captured = list(CaptureReader(str(tmp_path)))
+    assert [(c.message, c.data) for c in captured] == messages
+    assert [c.time_ns for c in captured] == sorted(c.time_ns for c in captured)
+    assert CaptureReader(str(tmp_path)).modules() == {"io", "xpc", "network"}
+
+
+def test_segments_roll_over(tmp_path):
+    messages = [(message(i), bytes(100)) for i in range(50)]
+    write_all(str(tmp_path), messages, segment_bytes=1024)
+    reader = CaptureReader(str(tmp_path))
+    assert len(reader.segments) > 1
+    assert [(c.message, c.data) for c in reader] == messages
+
+
+def test_torn_record(tmp_path):
+    messages = [(message(i), b"data") for i in range(10)]
+    write_all(str(tmp_path), messages)
+    segment = tmp_path / "capture-000001.seg"
+    content = segment.read_bytes()
+    # Process killed in the middle of the last record
+    segment.write_bytes(content[:-3])
+    assert [c.message for c in CaptureReader(str(tmp_path))] == [m for m, _ in messages[:9]]
+
+    # Flipped byte inside the 5th record: the reading of its block ends there
+    record_size = (len(content) - len(MAGIC)) // 10
+    corrupted = bytearray(content)
+    corrupted[len(MAGIC) + 4 * record_size + record_size - 1] ^= 0xff
+    segment.write_bytes(bytes(corrupted))
+    assert [c.message for c in CaptureReader(str(tmp_path))] == [m for m, _ in messages[:4]]
+
+
+def test_index_skips_blocks(tmp_path):
+    messages = [(message(i, "io" if i < 10 else "xpc"), b"data") for i in range(20)]
+    write_all(str(tmp_path), messages, index_records=5)
+    reader = CaptureReader(str(tmp_path))
+    times = [c.time_ns for c in reader]
+
+    # Corrupt the first block: it must not even be read when outside of the requested range/modules
+    segment = tmp_path / "capture-000001.seg"
+    content = bytearray(segment.read_bytes())
+    content[len(MAGIC) + capture.RECORD_HEADER.size] ^= 0xff
+    segment.write_bytes(bytes(content))
+
+    assert [c.message for c in reader.messages(modules=["xpc"])] == [m for m, _ in messages[10:]]
+    assert [c.message for c in reader.messages(start_ns=times[5], end_ns=times[14])] == \
+        [m for m, _ in messages[5:15]]
+    # Without skipping, the corrupted block is lost (the next ones are found through the index)
+    assert [c.message for c in reader.messages()] == [m for m, _ in messages[5:]]
+
+
+def test_numbering_continues_after_the_last_segment(tmp_path):
+    for number in (1, 5):
+        (tmp_path / f"capture-{number:06d}.seg").write_bytes(MAGIC)
+    (tmp_path / "capture-000009.seg.bak").write_bytes(MAGIC)
+    write_all(str(tmp_path), [(message(0), None)])
+    assert (tmp_path / "capture-000006.seg").stat().st_size > len(MAGIC)
+
+
+def test_io_errors_do_not_reach_the_caller(tmp_path, monkeypatch):
+    monkeypatch.setattr(capture, "RETRY_INTERVAL", 0.0)
+    writer = CaptureWriter(str(tmp_path), index_records=1)
+    writer.write(message(0), b"before")
+
+    failing = writer._segment
+    writer._segment = FullDisk()
+    writer.write(message(1), b"lost")
+    failing.close()
+    assert writer.stats()["lost"] == 1
+
+    # Disk full again when retrying in a new segment
+    monkeypatch.setattr(capture, "open", lambda *args, **kwargs: FullDisk(), raising=False)
+    writer.write(message(2), b"lost")
+    assert writer.stats()["lost"] == 2
+    monkeypatch.delattr(capture, "open")
+
+    writer.write(message(3), b"after")
+    writer.close()
+    assert writer.stats()["lost"] == 2
+    assert [(c.message, c.data) for c in CaptureReader(str(tmp_path))] == \
+        [(message(0), b"before"), (message(3), b"after")]
+    assert os.path.exists(tmp_path / "capture-000003.seg")
+
+
+def test_close_after_io_errors(tmp_path):
+    writer = CaptureWriter(str(tmp_path))
+    writer.write(message(0), None)
+    writer._segment = FullDisk()
+    writer.write(message(1), None)
+    writer.close()
+    with pytest.raises(ValueError):
+        writer._index.write("closed")
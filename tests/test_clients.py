@@ -0,0 +1,103 @@
+"""
+ClientPool: shared clients per endpoint, reference counts, closing of the clients released by their last user
+"""
+import threading
+
+import pytest
+
+from wormhole.hooking.clients import ClientPool
+
+
+class Client:
+
+    def __init__(self, endpoint: str):
+        self.endpoint: str = endpoint
+        self.closed: int = 0
+
+    def close(self) -> None:
+        self.closed += 1
+
+
+def test_acquire_and_release():
+    pool = ClientPool()
+    first = pool.acquire(("redis", "127.0.0.1", 6379), lambda: Client("a"))
+    second = pool.acquire(("redis", "127.0.0.1", 6379), lambda: Client("b"))
+    other = pool.acquire(("mongodb", "127.0.0.1", 27017), lambda: Client("c"))
+    assert first is second and first.endpoint == "a"
+    assert other is not first
+    assert pool.stats() == {"redis:127.0.0.1:6379": 2, "mongodb:127.0.0.1:27017": 1}
+
+    pool.release(first)
+    assert pool.stats()["redis:127.0.0.1:6379"] == 1
+    # Released more than acquired: the count stays at 0
+    pool.release(other)
+    pool.release(other)
+    assert pool.stats()["mongodb:127.0.0.1:27017"] == 0
+    # Not borrowed from the pool
+    pool.release(Client("d"))
+
+
+def test_clients_are_closed_once_released_by_their_last_user():
+    pool = ClientPool()
+    client = pool.acquire("endpoint", lambda: Client("a"))
+    pool.acquire("endpoint", lambda: Client("b"))
+
+    pool.release(client)
+    assert pool.close_idle() == 0
+    assert client.closed == 0
+
+    pool.release(client)
+    # Still reusable until closed
+    assert pool.acquire("endpoint", lambda: Client("b")) is client
+    pool.release(client)
+    assert pool.close_idle() == 1
+    assert client.closed == 1
+    assert pool.stats() == {}
+
+    # A new client after closing
+    assert pool.acquire("endpoint", lambda: Client("c")).endpoint == "c"
+
+
+def test_close_all():
+    pool = ClientPool()
+    clients = [pool.acquire(name, lambda name=name: Client(name)) for name in ("a", "b")]
+    pool.close_all()
+    assert [client.closed for client in clients] == [1, 1]
+    assert pool.stats() == {}
+
+
+def test_factory_errors():
+    pool = ClientPool()
+
+    def unreachable():
+        raise ConnectionError("unreachable")
+
+    with pytest.raises(ConnectionError):
+        pool.acquire("endpoint", unreachable)
+    assert pool.stats() == {}
+    assert pool.acquire("endpoint", lambda: Client("a")).endpoint == "a"
+
+
+def test_concurrent_acquire():
+    pool = ClientPool()
+    created = list()
+    acquired = list()
+    start = threading.Barrier(8)
+
+    def factory():
+        created.append(Client("a"))
+        return created[-1]
+
+    def borrow():
+        start.wait()
+        acquired.append(pool.acquire("endpoint", factory))
+
+    threads = [threading.Thread(target=borrow) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(client is created[0] for client in acquired)
+    assert pool.stats() == {"endpoint": 8}
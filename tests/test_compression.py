@@ -0,0 +1,67 @@
+"""
+Payloads compressed as the agent does (compress_payload), inflated by the PayloadInflater
+"""
+import zlib
+
+import pytest
+
+from wormhole.hooking.compression import INFLATERS, PayloadInflater, compress_payload
+
+
+def message(module: str) -> dict:
+    return {"type": "send", "payload": {"type": module, "symbol": "read", "tid": 259, "data": {"args": ["0x3"]}}}
+
+
+@pytest.mark.parametrize("method", sorted(INFLATERS))
+def test_round_trip(method):
+    data = b"GET /index.html HTTP/1.1\r\nHost: example.com\r\n\r\n" * 50
+    flagged, compressed = compress_payload(message("network"), data, method)
+    assert flagged["payload"]["compression"] == method
+    assert len(compressed) < len(data)
+    assert PayloadInflater().inflate(flagged, compressed) == data
+
+
+def test_uncompressed_data_is_untouched():
+    data = b"raw"
+    assert PayloadInflater().inflate(message("io"), data) is data
+    flagged, _ = compress_payload(message("io"), b"raw")
+    assert PayloadInflater().inflate(flagged, None) is None
+
+
+def test_corrupt_payload():
+    inflater = PayloadInflater()
+    flagged, compressed = compress_payload(message("io"), b"0123456789" * 100, "gzip")
+    with pytest.raises(zlib.error):
+        inflater.inflate(flagged, compressed[:len(compressed) // 2])
+    with pytest.raises(zlib.error):
+        inflater.inflate(flagged, b"not compressed at all")
+    # Nothing accounted for messages that could not be inflated
+    assert inflater.stats() == {}
+
+
+def test_unsupported_method():
+    flagged = message("io")
+    flagged["payload"]["compression"] = "lz4"
+    with pytest.raises(ValueError):
+        PayloadInflater().inflate(flagged, b"data")
+    with pytest.raises(ValueError):
+        compress_payload(message("io"), b"data", "lz4")
+
+
+def test_per_module_stats():
+    inflater = PayloadInflater()
+    data = b"a" * 4000
+    for module, count in (("io", 3), ("network", 1)):
+        for _ in range(count):
+            inflater.inflate(*compress_payload(message(module), data, "deflate"))
+    inflater.inflate(message("xpc"), b"uncompressed")
+
+    stats = inflater.stats()
+    assert set(stats) == {"io", "network"}
+    assert stats["io"]["messages"] == 3
+    assert stats["network"]["messages"] == 1
+    compressed = len(compress_payload(message("io"), data, "deflate")[1])
+    assert stats["io"]["compressed_bytes"] == 3 * compressed
+    assert stats["io"]["inflated_bytes"] == 3 * len(data)
+    assert stats["io"]["ratio"] == pytest.approx(len(data) / compressed)
+    assert stats["io"]["avg_inflate_us"] >= 0.0
@@ -0,0 +1,75 @@
+"""
+End-to-end load test of Core on the fake Frida device: every hooked call sent by the agent is processed and every
+published event reaches a slow connector behind a small queue with the block policy
+"""
+import time
+
+from wormhole.core import Core
+from wormhole.hooking.connector_manager import ConnectorManager
+from wormhole.hooking.connectors.base import BaseConnector
+from wormhole.hooking.connectors.null import Null
+from wormhole.hooking.fanout import OverflowPolicy
+
+from bench_modules import CORPORA
+from fake_frida import CorpusStream, FakeDevice
+
+MODULES = ("io", "sqlite", "syscall", "xpc")
+EVENTS_PER_MODULE = 2000
+RATE = 20000
+TIMEOUT = 30.0
+
+
+class Counting(BaseConnector):
+    """
+    Slow connector: it fills its queue, so publishing blocks
+    """
+
+    def __init__(self):
+        super(Counting, self).__init__()
+        self.count: int = 0
+
+    def forward(self, event):
+        event.text()
+        self.count += 1
+        if self.count % 100 == 0:
+            time.sleep(0.001)
+
+
+def test_nothing_lost_under_block_policy(tmp_path):
+    streams = [CorpusStream(module, CORPORA[module](EVENTS_PER_MODULE), rate=RATE / len(MODULES),
+                            count=EVENTS_PER_MODULE) for module in MODULES]
+    device = FakeDevice(streams=streams)
+    total = EVENTS_PER_MODULE * len(MODULES)
+    # Room for every message: only the connector queue applies back pressure
+    core = Core(device, "com.example.fake", None, queue_capacity=total, data_root=str(tmp_path))
+
+    manager = ConnectorManager([], capacity=64)
+    published, delivered = Null(), Counting()
+    manager.add_connector(published)
+    manager.add_connector(delivered, policy=OverflowPolicy.BLOCK)
+    assert core.run(js_source="")
+    assert core.operations(list(MODULES), [], [], connector_manager=manager)
+
+    script = device.sessions[0].scripts[0]
+    deadline = time.monotonic() + TIMEOUT
+    while script.sent < total:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    connector_stats = core.connector_stats()["counting"]
+    # Waits for the messages already received, then for the connector queues
+    assert core.unhook()
+
+    ingestion = core.ingestion_stats()
+    assert ingestion["received"] == total
+    assert ingestion["processed"] == total
+    assert ingestion["dropped"] == 0
+    assert ingestion["errors"] == 0
+    modules = core.metrics()["modules"]
+    assert sum(modules[module]["events"] for module in MODULES) == total
+    assert all(modules[module]["errors"] == 0 for module in MODULES)
+
+    assert published.count > 0
+    assert delivered.count == published.count
+    assert connector_stats["policy"] == OverflowPolicy.BLOCK.value
+    assert connector_stats["dropped"] == 0
+    core.detach_session()
@@ -0,0 +1,192 @@
+"""
+Circuit breaker, spool and glitch retries of the connector workers, also against a stand-in Redis server
+"""
+import time
+import threading
+
+from wormhole.hooking.breaker import BreakerState, CircuitBreaker
+from wormhole.hooking.connectors.base import BaseConnector
+from wormhole.hooking.connectors.redisdb import Redisdb
+from wormhole.hooking.event import HookEvent
+from wormhole.hooking.fanout import ConnectorWorker
+
+from standins import StandInRedis
+
+STREAM = b"wormhole:io"
+TIMEOUT = 10.0
+
+
+def wait_until(condition, timeout: float = TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def event(i: int) -> HookEvent:
+    return HookEvent(i, 1, "io", "open", args=[f"/tmp/{i}", "0x0"], ret="0x3", template="{args[0]} -> {ret}")
+
+
+def unique(timestamps) -> list:
+    """
+    Timestamps in order, without the duplicates of an at-least-once replay
+    """
+    ordered = list()
+    for timestamp in timestamps:
+        if timestamp not in ordered:
+            ordered.append(timestamp)
+    return ordered
+
+
+def stored(server: StandInRedis) -> list:
+    return unique(int(fields[b"timestamp"]) for _, fields in list(server.streams.get(STREAM, [])))
+
+
+class Sink(BaseConnector):
+    """
+    Connector failing while down is set, and on its next `failures` events
+    """
+
+    def __init__(self):
+        super(Sink, self).__init__()
+        self.down = threading.Event()
+        self.failures = 0
+        self.events = list()
+
+    def forward(self, event):
+        if self.down.is_set():
+            raise ConnectionError("sink down")
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("glitch")
+        self.events.append(event.timestamp)
+
+
+def test_spool_while_down_and_replay_on_restart(tmp_path):
+    sink = Sink()
+    breaker = CircuitBreaker(failure_threshold=5, initial_backoff=0.1, max_backoff=0.5)
+    worker = ConnectorWorker(sink, "sink", spill_dir=str(tmp_path), breaker=breaker)
+    try:
+        for i in range(100):
+            worker.put(event(i))
+        assert wait_until(lambda: len(sink.events) == 100)
+
+        sink.down.set()
+        for i in range(100, 300):
+            worker.put(event(i))
+        assert wait_until(lambda: worker.stats()["spooled"] > 0)
+        assert breaker.state is not BreakerState.CLOSED
+        assert breaker.trips == 1
+
+        sink.down.clear()
+        assert wait_until(lambda: breaker.is_closed and worker.stats()["spool_depth"] == 0)
+        assert worker.stats()["replayed"] > 0
+    finally:
+        worker.stop()
+
+    assert worker.stats()["dropped"] == 0
+    assert unique(sink.events) == list(range(300))
+
+
+def test_redis_outage_is_spooled_and_replayed(tmp_path):
+    server = StandInRedis()
+    server.start()
+    breaker = CircuitBreaker(failure_threshold=5, initial_backoff=0.1, max_backoff=0.5)
+    worker = ConnectorWorker(Redisdb(port=server.port, batch_size=1, flush_interval=0.1), "redisdb",
+                             spill_dir=str(tmp_path), breaker=breaker)
+    try:
+        for i in range(100):
+            worker.put(event(i))
+        assert wait_until(lambda: len(stored(server)) >= 99)
+
+        server.stop()
+        for i in range(100, 300):
+            worker.put(event(i))
+        assert wait_until(lambda: worker.stats()["spooled"] > 0)
+        assert breaker.state is not BreakerState.CLOSED
+        assert breaker.trips == 1
+
+        server.start()
+        assert wait_until(lambda: breaker.is_closed and worker.stats()["spool_depth"] == 0)
+        assert worker.stats()["replayed"] > 0
+    finally:
+        worker.stop()
+        server.stop()
+
+    assert worker.stats()["dropped"] == 0
+    assert stored(server) == list(range(300))
+
+
+def test_glitch_keeps_the_order(tmp_path):
+    sink = Sink()
+    breaker = CircuitBreaker(failure_threshold=5, initial_backoff=0.1, max_backoff=0.5)
+    worker = ConnectorWorker(sink, "sink", spill_dir=str(tmp_path), breaker=breaker)
+    try:
+        for i in range(50):
+            worker.put(event(i))
+        assert wait_until(lambda: len(sink.events) == 50)
+
+        # The circuit stays closed: the failed event is retried before the newer ones
+        sink.failures = 1
+        for i in range(50, 100):
+            worker.put(event(i))
+        assert wait_until(lambda: len(sink.events) == 100)
+    finally:
+        worker.stop()
+
+    assert sink.events == list(range(100))
+    assert worker.stats()["dropped"] == 0
+    assert breaker.trips == 0
+
+
+class Gate:
+    """
+    Connector blocked until opened, refusing the events listed in refuse
+    """
+
+    def __init__(self, refuse=()):
+        self.opened = threading.Event()
+        self.refuse = set(refuse)
+        self.events = list()
+
+    def forward(self, event):
+        self.opened.wait(TIMEOUT)
+        if event.timestamp in self.refuse:
+            raise ValueError(f"refused {event.timestamp}")
+        self.events.append(event.timestamp)
+
+
+def test_dropped_counts_producers_and_worker(tmp_path):
+    gate = Gate(refuse={0})
+    worker = ConnectorWorker(gate, "gate", policy="drop_newest", capacity=10, spill_dir=str(tmp_path))
+    try:
+        for i in range(50):
+            worker.put(event(i))
+        gate.opened.set()
+        assert wait_until(lambda: worker.stats()["depth"] == 0 and 1 in gate.events)
+    finally:
+        worker.stop()
+
+    stats = worker.stats()
+    # Dropped by the full queue (producers) and the refused event (worker)
+    assert stats["dropped"] == 50 - len(gate.events)
+    assert 0 not in gate.events
+
+
+def test_stats_do_not_change_the_rate():
+    gate = Gate()
+    gate.opened.set()
+    worker = ConnectorWorker(gate, "gate")
+    try:
+        for i in range(1000):
+            worker.put(event(i))
+        assert wait_until(lambda: worker.stats()["delivered"] == 1000)
+        time.sleep(1.1)
+        rates = [worker.stats()["events_per_sec"] for _ in range(3)]
+    finally:
+        worker.stop()
+
+    assert rates[0] > 0
+    assert rates == [rates[0]] * 3
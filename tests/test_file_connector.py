@@ -0,0 +1,96 @@
+"""
+File connector: color hints, rotation and compression of the rotated segments
+"""
+import os
+import re
+import gzip
+import glob
+
+import pytest
+
+from wormhole.hooking.connectors.file import File, BColors, SEPARATOR, zstandard
+from wormhole.hooking.event import HookEvent
+
+
+def event(i: int, color: str = None) -> HookEvent:
+    return HookEvent(1700000000000 + i, 259, "io", "open", args=[f"/tmp/{i}", "0x0"], ret="0x3",
+                     template="{args[0]} -> " + BColors.BOLD + "{ret}" + BColors.ENDC, color=color)
+
+
+def lines(content: str) -> list:
+    return [line for line in content.split(SEPARATOR) if line]
+
+
+def segments_content(path: str) -> str:
+    content = ""
+    # <name>.<yyyymmdd-hhmmss>.<n>[.gz|.zst]
+    for segment in sorted(glob.glob(f"{path}.*"), key=lambda name: int(re.search(r"\.(\d+)(\.\w+)?$", name)[1])):
+        if segment.endswith(".gz"):
+            with gzip.open(segment, "rt", encoding="utf-8") as f:
+                content += f.read()
+        elif segment.endswith(".zst"):
+            with open(segment, "rb") as f:
+                content += zstandard.ZstdDecompressor().stream_reader(f).read().decode("utf-8")
+        else:
+            with open(segment, "r", encoding="utf-8") as f:
+                content += f.read()
+    with open(path, "r", encoding="utf-8") as f:
+        return content + f.read()
+
+
+def test_colors(tmp_path):
+    connector = File(str(tmp_path), buffer_lines=10, compression=None)
+    connector.forward(event(0, "WARNING"))
+    connector.forward(event(1))
+    connector.close()
+
+    first, second = lines((tmp_path / "hooks.log").read_text(encoding="utf-8"))
+    assert first.endswith(f"{BColors.WARNING}/tmp/0 -> {BColors.BOLD}0x3{BColors.ENDC}{BColors.ENDC}\n")
+    assert second.endswith(f"/tmp/1 -> {BColors.BOLD}0x3{BColors.ENDC}\n")
+
+
+def test_colors_are_stripped(tmp_path):
+    connector = File(str(tmp_path), colors=False, buffer_lines=10, compression=None)
+    connector.forward(event(0, "WARNING"))
+    connector.forward(event(1))
+    connector.close()
+
+    content = (tmp_path / "hooks.log").read_text(encoding="utf-8")
+    assert "\x1b" not in content
+    assert [line.split(": ", 1)[1] for line in lines(content)] == ["/tmp/0 -> 0x3\n", "/tmp/1 -> 0x3\n"]
+
+
+def test_invalid_color(tmp_path):
+    connector = File(str(tmp_path), compression=None)
+    for color in ("PURPLE", "colored", "__doc__"):
+        with pytest.raises(ValueError, match=f"Unknown color '{color}'"):
+            connector.forward(event(0, color))
+    connector.close()
+
+
+@pytest.mark.parametrize("compression", [
+    None, "gzip",
+    pytest.param("zstd", marks=pytest.mark.skipif(zstandard is None, reason="zstandard not installed"))
+])
+def test_rotation(tmp_path, compression):
+    connector = File(str(tmp_path), colors=False, buffer_lines=10, max_bytes=2048, compression=compression)
+    for i in range(200):
+        connector.forward(event(i))
+    connector.close()
+
+    path = str(tmp_path / "hooks.log")
+    segments = glob.glob(f"{path}.*")
+    assert len(segments) > 1
+    if compression:
+        # Uncompressed segments removed once compressed
+        suffix = {"gzip": ".gz", "zstd": ".zst"}[compression]
+        assert all(segment.endswith(suffix) for segment in segments)
+    assert all(os.path.getsize(segment) > 0 for segment in segments)
+
+    content = lines(segments_content(path))
+    assert [line.split(": ", 1)[1] for line in content] == [f"/tmp/{i} -> 0x3\n" for i in range(200)]
+
+
+def test_unsupported_compression(tmp_path):
+    with pytest.raises(ValueError):
+        File(str(tmp_path), compression="lz4")
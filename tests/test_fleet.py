@@ -0,0 +1,49 @@
+"""
+FleetRunner on fake Frida devices: one spawned worker per device, events streamed back to the parent in order
+"""
+import os
+
+from wormhole.fleet import FleetRunner
+
+from fake_frida import EventStream, FakeDevice
+
+EVENTS = 300
+DEVICES = ["fake-1", "fake-2"]
+
+
+def fake_device(device_id: str) -> FakeDevice:
+    """
+    Device factory of the workers: a module function, so the spawned processes can unpickle it
+    """
+    return FakeDevice(streams=[EventStream("io", "open", lambda i: [f"/{device_id}/{i}", "0x0"], "0x3", rate=20000,
+                                           count=EVENTS)])
+
+
+def test_devices_run_in_isolated_workers(tmp_path):
+    agents = tmp_path / "agents"
+    agents.mkdir()
+    (agents / "_ios_base_agent.js").write_text("// agent")
+
+    received = {device_id: list() for device_id in DEVICES}
+    runner = FleetRunner(DEVICES, "com.example.fake", ["io"], data_root=str(tmp_path / "fleetData"),
+                         agent_dir=str(agents), device_factory=fake_device,
+                         on_event=lambda device_id, event: received[device_id].append(event))
+    # The workers have another working directory: agents and data roots must not depend on it
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    cwd = os.getcwd()
+    os.chdir(elsewhere)
+    try:
+        progress = runner.run(duration=1.5, refresh=0.2, show=False)
+    finally:
+        os.chdir(cwd)
+
+    for device_id in DEVICES:
+        assert progress[device_id]["state"] == "done", progress[device_id]["error"]
+        assert progress[device_id]["events"] == EVENTS
+        assert progress[device_id]["ingestion"]["processed"] == EVENTS
+        events = received[device_id]
+        assert [event.args[0] for event in events] == [f"/{device_id}/{i}" for i in range(EVENTS)]
+        # Rendered by the parent
+        assert f"/{device_id}/0" in events[0].text()
+        assert os.path.isdir(tmp_path / "fleetData" / device_id)
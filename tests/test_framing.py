@@ -0,0 +1,99 @@
+"""
+Round trips of hooked calls through the binary framing
+"""
+import pytest
+
+from wormhole.hooking.dispatch import MessageDispatcher
+from wormhole.hooking.framing import FrameDecoder, FramingError, SymbolRegistry, encode_frame
+
+
+def payload(module: str, symbol: str, args: list, **func_data) -> dict:
+    return {"type": module, "symbol": symbol, "timestamp": 1700000000123, "tid": 259,
+            "data": dict(func_data, args=args)}
+
+
+def round_trip(*calls) -> list:
+    registry = SymbolRegistry()
+    frames = b"".join(encode_frame(registry, call_payload, data) for call_payload, data in calls)
+    return list(FrameDecoder(SymbolRegistry.from_payload(registry.to_payload())).decode(frames))
+
+
+def test_values_round_trip():
+    args = [None, True, False, 0, -1, 2 ** 63 - 1, 1.5, "", "/tmp/é", b"\x00\xff", [1, "a", None],
+            {"key": {"nested": [True, 2.5]}}, []]
+    message, = round_trip((payload("xpc", "xpc_connection_send_message", args, ret={"reply": [1, 2]}), None))
+    assert message.timestamp == 1700000000123
+    assert message.tid == 259
+    assert message.module == "xpc"
+    assert message.symbol == "xpc_connection_send_message"
+    assert message.args == args
+    assert message.ret == {"reply": [1, 2]}
+    assert message.data is None
+
+
+def test_many_frames_with_data():
+    calls = [(payload("io", "read", ["0x3", i], ret=i), bytes([i]) * i) for i in range(5)]
+    calls.append((payload("syscall", "sysctl", ["a"]), None))
+    messages = round_trip(*calls)
+
+    assert [(m.module, m.symbol, m.args, m.data) for m in messages[:5]] == \
+        [("io", "read", ["0x3", i], bytes([i]) * i) for i in range(5)]
+    assert messages[5].module == "syscall"
+    # No ret sent: same default as the JSON payload
+    assert messages[5].ret == ""
+
+
+def test_unsupported_value_type():
+    with pytest.raises(TypeError):
+        encode_frame(SymbolRegistry(), payload("io", "open", [object()]))
+    with pytest.raises(TypeError):
+        encode_frame(SymbolRegistry(), payload("io", "open", [{1, 2}]))
+
+
+def test_truncated_frame():
+    frame = encode_frame(SymbolRegistry(["io"], ["open"]), payload("io", "open", ["/tmp/a"]))
+    with pytest.raises(FramingError):
+        list(FrameDecoder(SymbolRegistry(["io"], ["open"])).decode(frame[:-2]))
+    frame = encode_frame(SymbolRegistry(["io"], ["read"]), payload("io", "read", ["0x3"]), b"0123456789")
+    with pytest.raises(FramingError):
+        list(FrameDecoder(SymbolRegistry(["io"], ["read"])).decode(frame[:-2]))
+
+
+def test_unknown_ids_reject_the_whole_data():
+    registry = SymbolRegistry()
+    frames = encode_frame(registry, payload("io", "open", ["/tmp/a"])) + \
+        encode_frame(registry, payload("xpc", "xpc_connection_send_message", []))
+    # Registry sent before the xpc module was added
+    for known in (SymbolRegistry(["io"], registry.symbols), SymbolRegistry(registry.modules, ["open"])):
+        decoder = FrameDecoder(known)
+        with pytest.raises(FramingError, match="Unknown module id"):
+            decoder.decode(frames)
+
+
+class Recorder:
+    """
+    Modules manager recording the decoded messages
+    """
+
+    def __init__(self):
+        self.decoded: list = list()
+
+    def process_decoded(self, message) -> None:
+        self.decoded.append(message)
+
+
+def test_dispatch_delivers_nothing_from_malformed_frames():
+    registry = SymbolRegistry()
+    valid = encode_frame(registry, payload("io", "open", ["/tmp/a"]))
+    recorder = Recorder()
+    dispatcher = MessageDispatcher(recorder)
+    dispatcher.dispatch({"type": "send", "payload": SymbolRegistry(["io"], ["open"]).to_payload()}, None)
+
+    unknown = encode_frame(SymbolRegistry(["io", "xpc"], ["open"]), payload("xpc", "open", []))
+    for frames in (valid + unknown, valid + valid[:-2]):
+        with pytest.raises(FramingError):
+            dispatcher.dispatch({"type": "send", "payload": {"type": "frames"}}, frames)
+    assert recorder.decoded == []
+
+    dispatcher.dispatch({"type": "send", "payload": {"type": "frames"}}, valid + valid)
+    assert [message.args for message in recorder.decoded] == [["/tmp/a"], ["/tmp/a"]]
@@ -0,0 +1,52 @@
+"""
+Pipeline metrics: render times are accounted to the pipeline of each event, rates do not depend on readers
+"""
+import pickle
+
+from wormhole.hooking.connector_manager import ConnectorManager
+from wormhole.hooking.connectors.null import Null
+from wormhole.hooking.event import HookEvent
+from wormhole.hooking.metrics import PipelineMetrics, RateMeter
+
+
+def event(i: int) -> HookEvent:
+    return HookEvent(i, 1, "io", "open", args=[f"/tmp/{i}"], ret="0x3", template="{args[0]} -> {ret}")
+
+
+def test_render_time_goes_to_the_pipeline_of_the_event():
+    first, second = PipelineMetrics(), PipelineMetrics()
+    managers = [ConnectorManager([], metrics=first), ConnectorManager([], metrics=second)]
+    for manager in managers:
+        manager.add_connector(Null(render=True))
+
+    for i in range(30):
+        managers[0].forward(event(i))
+    for i in range(10):
+        managers[1].forward(event(i))
+
+    assert first.snapshot()["stages"]["render"]["count"] == 30
+    assert second.snapshot()["stages"]["render"]["count"] == 10
+
+
+def test_pickled_events_leave_the_render_histogram():
+    metrics = PipelineMetrics()
+    published = event(1)
+    ConnectorManager([], metrics=metrics).forward(published)
+    assert published.render_histogram is metrics.render
+
+    copy = pickle.loads(pickle.dumps(published))
+    assert copy.render_histogram is None
+    assert copy.text() == "/tmp/1 -> 0x3"
+    assert copy.metadata() == published.metadata()
+    assert metrics.snapshot()["stages"]["render"]["count"] == 0
+
+
+def test_rate_does_not_change_when_read():
+    meter = RateMeter(window=2)
+    for second in (10.0, 10.5, 11.2, 11.7, 11.9):
+        meter.add(10, now=second)
+    # Current second (12) excluded
+    assert meter.rate(now=12.3) == 25.0
+    assert meter.rate(now=12.3) == 25.0
+    assert meter.rate(now=13.0) == 15.0
+    assert meter.rate(now=20.0) == 0.0
@@ -0,0 +1,91 @@
+"""
+Pipeline profiler: sampled threads, results written after the session detached, routing of the GUI requests
+"""
+import os
+import threading
+
+from wormhole.hooking.ingestion import IngestionQueue
+from wormhole.hooking.profiler import PipelineProfiler, ProfilerMode, SamplingProfiler, \
+    _dispatch_profile_request
+
+TIMEOUT = 10.0
+
+
+def spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(100))
+
+
+def test_sampling_only_the_given_threads():
+    stop = threading.Event()
+    session = threading.Thread(target=spin, args=(stop,), name="wormhole-ingestion", daemon=True)
+    other_session = threading.Thread(target=spin, args=(stop,), name="wormhole-ingestion", daemon=True)
+    waiting = threading.Thread(target=stop.wait, name="wormhole-connector-null", daemon=True)
+    for thread in (session, other_session, waiting):
+        thread.start()
+
+    sampler = SamplingProfiler(interval=0.001, threads=lambda: [session, waiting, None])
+    sampler.start()
+    # Samples of the session threads only
+    while sampler.busy["wormhole-ingestion"] < 20 or sampler.idle["wormhole-connector-null"] < 20:
+        stop.wait(0.01)
+    sampler.stop()
+    stop.set()
+
+    assert sum(sampler.stacks.values()) == sampler.busy["wormhole-ingestion"]
+    assert all(stack.startswith("wormhole-ingestion;") and "spin (test_profiler.py" in stack
+               for stack in sampler.stacks)
+    # The waiting thread is sampled once per round: the thread of the other session, with the same name, would
+    # double the busy samples
+    assert sampler.busy["wormhole-ingestion"] <= sampler.idle["wormhole-connector-null"] + 1
+    assert "wormhole-connector-null" not in sampler.busy
+
+
+def test_sampling_defaults_to_the_thread_prefix():
+    stop = threading.Event()
+    named = threading.Thread(target=spin, args=(stop,), name="wormhole-test", daemon=True)
+    unnamed = threading.Thread(target=spin, args=(stop,), name="other-test", daemon=True)
+    named.start()
+    unnamed.start()
+    sampler = SamplingProfiler(interval=0.001)
+    sampler.start()
+    while sampler.busy["wormhole-test"] < 20:
+        stop.wait(0.01)
+    sampler.stop()
+    stop.set()
+    assert "other-test" not in sampler.busy
+
+
+def test_cprofile_written_after_the_ingestion_stopped(tmp_path):
+    done = list()
+    ingestion = IngestionQueue(lambda message, data: sum(range(1000)))
+    ingestion.start()
+    profiler = PipelineProfiler(str(tmp_path), ingestion, done.append)
+    outputs = profiler.start(60, ProfilerMode.CPROFILE)
+    for i in range(100):
+        ingestion.put({"payload": i}, None)
+    # Session detached before the end of the profile
+    ingestion.stop()
+    profiler.stop()
+
+    assert done == [outputs]
+    assert os.path.getsize(outputs["stats"]) > 0
+    with open(outputs["summary"]) as summary:
+        assert "<lambda>" in summary.read()
+
+
+def test_profile_requests_routed_to_their_session():
+    handlers = {
+        "backupd_2001": lambda request: {"session": "backupd_2001"},
+        "cloudd_2002": lambda request: {"session": "cloudd_2002"},
+    }
+    assert _dispatch_profile_request(handlers, {"session": "cloudd_2002"}) == {"session": "cloudd_2002"}
+    assert _dispatch_profile_request(handlers, {"pid": 2001}) == {"session": "backupd_2001"}
+    assert _dispatch_profile_request(handlers, {"pid": "2002"}) == {"session": "cloudd_2002"}
+    assert "error" in _dispatch_profile_request(handlers, {"pid": 9})
+    assert "error" in _dispatch_profile_request(handlers, {"session": "missing_1"})
+    # Which session is ambiguous
+    assert "error" in _dispatch_profile_request(handlers, None)
+
+    single = {"backupd_2001": handlers["backupd_2001"]}
+    assert _dispatch_profile_request(single, {"seconds": 5}) == {"session": "backupd_2001"}
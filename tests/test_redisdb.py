@@ -0,0 +1,97 @@
+"""
+Redisdb connector against a local redis-server (skipped when it is not installed)
+"""
+import json
+import time
+import shutil
+import socket
+import subprocess
+
+import pytest
+
+from redis import Redis
+from redis.exceptions import ConnectionError
+
+from wormhole.hooking.clients import CLIENTS
+from wormhole.hooking.connectors.redisdb import Redisdb
+from wormhole.hooking.event import HookEvent
+
+REDIS_SERVER = shutil.which("redis-server")
+STARTUP_TIMEOUT = 10.0
+
+pytestmark = pytest.mark.skipif(REDIS_SERVER is None, reason="redis-server not available")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def redis_port(tmp_path):
+    port = free_port()
+    # Small stream nodes: approximate trimming removes whole nodes
+    process = subprocess.Popen([REDIS_SERVER, "--port", str(port), "--bind", "127.0.0.1", "--save", "",
+                                "--appendonly", "no", "--dir", str(tmp_path), "--stream-node-max-entries", "10"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = Redis(port=port, protocol=2)
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                client.ping()
+                break
+            except ConnectionError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+        yield port
+    finally:
+        client.close()
+        CLIENTS.close_idle()
+        process.terminate()
+        process.wait()
+
+
+def event(i: int, module: str = "io", data: bytes = None) -> HookEvent:
+    return HookEvent(i, 7, module, "open", args=[f"/tmp/{i}", "0x0"], ret="0x3", template="{args[0]} -> {ret}",
+                     data=data)
+
+
+def test_events_go_to_per_module_streams(redis_port):
+    connector = Redisdb(port=redis_port, batch_size=10, flush_interval=0.1)
+    for i in range(25):
+        connector.forward(event(i, "io" if i % 2 else "sqlite", b"\x00\xff" if i == 3 else None))
+    connector.close()
+
+    client = Redis(port=redis_port, protocol=2)
+    assert connector.appended == 25
+    assert client.xlen("wormhole:sqlite") == 13
+    entries = client.xrange("wormhole:io")
+    assert [int(fields[b"timestamp"]) for _, fields in entries] == list(range(1, 25, 2))
+
+    _, fields = entries[1]
+    assert fields[b"module"] == b"io"
+    assert fields[b"function"] == b"open"
+    assert fields[b"text"] == b"/tmp/3 -> 0x3"
+    assert fields[b"data"] == b"\x00\xff"
+    document = json.loads(fields[b"document"])
+    assert document["args"] == ["/tmp/3", "0x0"]
+    assert "data" not in document
+    assert b"data" not in entries[0][1]
+    client.close()
+
+
+def test_streams_are_capped(redis_port):
+    connector = Redisdb(port=redis_port, maxlen=100, batch_size=50)
+    for i in range(1000):
+        connector.forward(event(i))
+    connector.close()
+
+    client = Redis(port=redis_port, protocol=2)
+    # Approximate trimming: never below maxlen, at most a few nodes above
+    assert 100 <= client.xlen("wormhole:io") < 200
+    assert int(client.xrange("wormhole:io", count=1)[0][1][b"timestamp"]) >= 800
+    assert int(client.xrevrange("wormhole:io", count=1)[0][1][b"timestamp"]) == 999
+    client.close()
@@ -0,0 +1,63 @@
+"""
+A session captured on the fake Frida device and replayed offline produces the same events
+"""
+import glob
+import time
+
+from wormhole.core import Core
+from wormhole.hooking.connector_manager import ConnectorManager
+from wormhole.hooking.connectors.base import BaseConnector
+from wormhole.replay import Pacing, Replay
+
+from fake_frida import EventStream, FakeDevice
+
+EVENTS = 300
+TIMEOUT = 10.0
+
+
+class Collector(BaseConnector):
+    inline = True
+
+    def __init__(self):
+        super(Collector, self).__init__()
+        self.events: list = list()
+
+    def forward(self, event):
+        self.events.append((event.to_dict(), event.text(), event.data))
+
+
+def fake_device() -> FakeDevice:
+    return FakeDevice(streams=[
+        EventStream("io", "open", lambda i: [f"/tmp/{i}", hex(i % 4)], lambda i: "0x3" if i % 5 else "0x0",
+                    rate=20000, count=EVENTS),
+        # Batches sharing a blob
+        EventStream("IOKit", "IOConnectCallMethod", lambda i: [i, "0x1", 3, 0, "0x0", 4, "0x0", 0, "0x0", 4],
+                    data=lambda i: i.to_bytes(8, "little"), rate=20000, count=EVENTS, batch_size=10),
+    ])
+
+
+def test_replay_matches_the_live_session(tmp_path):
+    live = Collector()
+    core = Core(fake_device(), "com.example.fake", None, data_root=str(tmp_path / "appData"), capture=True)
+    core.add_connector(live)
+    assert core.run(js_source="")
+    assert core.operations(["io", "IOKit"], [], [])
+
+    deadline = time.monotonic() + TIMEOUT
+    while len(live.events) < 2 * EVENTS:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    core.detach_session()
+
+    capture_dir, = glob.glob(str(tmp_path / "appData" / "*" / "capture"))
+    replayed = Collector()
+    connector_manager = ConnectorManager([])
+    connector_manager.add_connector(replayed)
+    # Modules found inside the capture
+    stats = Replay(capture_dir, "com.example.fake", str(tmp_path / "replay"),
+                   connector_manager=connector_manager).run(pacing=Pacing.ASAP)
+
+    assert stats["errors"] == 0
+    assert set(stats["modules"]) == {"io", "IOKit"}
+    assert stats["events"] == 2 * EVENTS
+    assert replayed.events == live.events
@@ -0,0 +1,72 @@
+"""
+SessionPool on the fake Frida device: every session hooks its process, its events are tagged and counted per
+session, and the pooled cores keep the ConnectorManager.stats() shape
+"""
+import os
+import time
+
+from wormhole.hooking.connectors.base import BaseConnector
+from wormhole.session_pool import SessionPool
+
+from fake_frida import EventStream, FakeDevice, FakeProcess
+
+EVENTS = 300
+TIMEOUT = 10.0
+
+
+class Collector(BaseConnector):
+
+    def __init__(self):
+        super(Collector, self).__init__()
+        self.sessions: list = list()
+
+    def forward(self, event):
+        self.sessions.append(event.session)
+
+
+def test_sessions_are_tagged_and_counted(tmp_path):
+    agents = tmp_path / "agents"
+    agents.mkdir()
+    (agents / "_ios_base_agent.js").write_text("// agent")
+
+    device = FakeDevice(
+        streams=[EventStream("io", "open", lambda i: [f"/tmp/{i}", "0x0"], "0x3", rate=20000, count=EVENTS)],
+        processes=[FakeProcess(2001, "backupd"), FakeProcess(2002, "backupd"), FakeProcess(2003, "cloudd")]
+    )
+    pool = SessionPool(device, [], data_root=str(tmp_path / "appData"), agent_dir=str(agents))
+    sessions = pool.attach_matching("^backupd$")
+    assert sorted(sessions) == ["backupd_2001", "backupd_2002"]
+    assert all(os.path.isdir(tmp_path / "appData" / session) for session in sessions)
+
+    collectors = {session: Collector() for session in sessions}
+    for session, collector in collectors.items():
+        pool.get_session(session).add_connector(collector)
+    assert pool.operations(["io"]) == {session: True for session in sessions}
+
+    scripts = [session.scripts[0] for session in device.sessions]
+    deadline = time.monotonic() + TIMEOUT
+    while any(script.sent < EVENTS for script in scripts):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    for session in sessions:
+        core = pool.get_session(session)
+        assert core.session_name == session
+        # Per connector stats, as for a Core outside of a pool
+        while core.connector_stats()["collector"]["delivered"] < EVENTS:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    pool.unhook()
+
+    for session, collector in collectors.items():
+        assert collector.sessions == [session] * EVENTS
+
+    stats = pool.stats()
+    assert set(stats) == set(sessions)
+    for session_stats in stats.values():
+        assert session_stats["events"] == EVENTS
+        assert session_stats["ingestion"]["processed"] == EVENTS
+        assert session_stats["events_per_sec"] >= 0.0
+
+    pool.detach()
+    assert pool.sessions == []
+    assert all(session.detached for session in device.sessions)
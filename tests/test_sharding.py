@@ -0,0 +1,83 @@
+"""
+ShardedExecutor on a synthetic corpus: spawned workers, raw bytes handed over through the shared memory rings,
+results pickled back to the parent in order per tid
+"""
+import base64
+import time
+
+from wormhole.hooking.connector_manager import ConnectorManager
+from wormhole.hooking.connectors.base import BaseConnector
+from wormhole.hooking.modules.base import Message
+from wormhole.hooking.sharding import ShardedExecutor
+
+EVENTS = 2000
+TIDS = 8
+# Small rings: payloads wrap around their end and the parent waits for the workers to consume them
+ARENA_SIZE = 4096
+TIMEOUT = 30.0
+
+
+class Collector(BaseConnector):
+    inline = True
+
+    def __init__(self):
+        super(Collector, self).__init__()
+        self.events: list = list()
+
+    def forward(self, event):
+        self.events.append(event)
+
+
+def corpus() -> list:
+    """
+    IOConnectCallMethod calls: input and output structures in the raw bytes, none for some calls, bigger than
+    the ring for others (sent inline with the task)
+    """
+    messages = list()
+    for i in range(EVENTS):
+        if i % 10 == 0:
+            data = None
+        elif i % 97 == 0:
+            data = bytes([i % 256]) * (ARENA_SIZE + 100)
+        else:
+            data = bytes([i % 256]) * (i % 700 + 1)
+        input_length = len(data) // 2 if data else 0
+        output_length = len(data) - input_length if data else 0
+        args = [i, "0x1", 3, 0, "0x0", input_length, "0x0", 0, "0x0", output_length]
+        messages.append(Message.from_fields(1700000000000 + i, 1000 + i % TIDS, "IOKit", "IOConnectCallMethod",
+                                            args, "0x0", data))
+    return messages
+
+
+def test_sharded_corpus_keeps_order_per_tid(tmp_path):
+    collector = Collector()
+    connector_manager = ConnectorManager([])
+    connector_manager.add_connector(collector)
+    executor = ShardedExecutor("test", str(tmp_path), connector_manager, workers=2, arena_size=ARENA_SIZE)
+    assert executor.start(["IOKit"]) == ["IOKit"]
+
+    messages = corpus()
+    try:
+        for message in messages:
+            executor.submit(message)
+        deadline = time.monotonic() + TIMEOUT
+        while executor.stats()["published"] < EVENTS:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        # Every payload of the rings consumed by the workers
+        assert executor.stats()["arena_in_use"] == [0, 0]
+    finally:
+        executor.stop()
+
+    assert executor.stats()["submitted"] == EVENTS
+    assert len(collector.events) == EVENTS
+    for tid in range(1000, 1000 + TIDS):
+        indexes = [event.args[0] for event in collector.events if event.tid == tid]
+        assert indexes == [i for i in range(EVENTS) if 1000 + i % TIDS == tid]
+
+    sent = {message.args[0]: message for message in messages}
+    for event in collector.events:
+        assert event.data == sent[event.args[0]].data
+    # Events pickled by the workers render in the parent
+    event = next(event for event in collector.events if event.data)
+    assert base64.b64encode(event.data[:event.args[5]]).decode() in event.text()
@@ -0,0 +1,168 @@
+"""
+Websocket connector: subscriptions, routing of the frames between the GUI clients, namespaces shared by many
+connectors
+"""
+import pytest
+
+from flask import Flask
+from flask_socketio import Namespace, SocketIO
+
+from wormhole.hooking.connectors.websocket import Subscription, SubscriptionIndex, Websocket
+from wormhole.hooking.event import HookEvent
+
+NAMESPACE = "/wormhole"
+
+
+class FakeSocketIO:
+
+    def __init__(self):
+        self.emitted: list = list()
+
+    def emit(self, event, data, namespace=None, skip_sid=None):
+        self.emitted.append((event, data, namespace, skip_sid))
+
+
+class FakeNamespace:
+    """
+    Emits of a flask_socketio Namespace, recorded
+    """
+
+    def __init__(self):
+        self.namespace = NAMESPACE
+        self.socketio = FakeSocketIO()
+        self.emitted: list = list()
+
+    def emit(self, event, data, room=None):
+        self.emitted.append((event, data, room))
+
+    def on_disconnect(self):
+        return "disconnected"
+
+
+def message(module: str, function: str, tid: int) -> dict:
+    return {"module": module, "function": function, "tid": tid, "message": f"{function}()"}
+
+
+def event(i: int, module: str) -> HookEvent:
+    return HookEvent(i, 1, module, "open", args=[f"/tmp/{i}"], template="{args[0]}")
+
+
+def test_subscription_from_request():
+    subscription = Subscription.from_request({"modules": "io", "tids": [1, "2"]})
+    assert subscription.modules == {"io"}
+    assert subscription.symbols is None
+    assert subscription.tids == {1, 2}
+    assert subscription.to_dict() == {"modules": ["io"], "symbols": None, "tids": [1, 2]}
+
+    with pytest.raises(ValueError):
+        Subscription.from_request(["io"])
+    with pytest.raises(ValueError):
+        Subscription.from_request({"symbols": {"open": True}})
+    with pytest.raises(ValueError):
+        Subscription.from_request({"tids": ["main"]})
+
+
+def test_route_by_module_symbol_and_tid():
+    index = SubscriptionIndex()
+    index.subscribe("io", Subscription(modules=["io"]))
+    index.subscribe("open", Subscription(symbols=["open"]))
+    index.subscribe("xpc", Subscription(modules=["xpc"], tids=[7]))
+    messages = [message("io", "open", 1), message("io", "read", 7), message("xpc", "send", 7),
+                message("xpc", "send", 8), message("sqlite", "open", 3)]
+
+    frames = index.route(messages)
+    assert frames == {
+        "io": messages[0:2],
+        "open": [messages[0], messages[4]],
+        "xpc": [messages[2]],
+    }
+
+    assert index.unsubscribe("io")
+    assert not index.unsubscribe("io")
+    assert sorted(index.sids) == ["open", "xpc"]
+    assert "io" not in index.route(messages)
+    # Clients without matching messages are left out
+    assert index.route([message("dyld", "dlopen", 1)]) == {}
+
+
+@pytest.mark.parametrize("legacy", [False, True])
+def test_frames_split_between_subscribed_and_other_clients(legacy):
+    ws = FakeNamespace()
+    websocket = Websocket(ws, legacy=legacy)
+    websocket.subscriptions.subscribe("sid-io", Subscription(modules=["io"]))
+    for i, module in enumerate(("io", "xpc", "io")):
+        websocket.forward(event(i, module))
+    websocket.close()
+
+    if legacy:
+        broadcast = [(e, data["data"]["module"], skip_sid) for e, data, _, skip_sid in ws.socketio.emitted]
+        assert broadcast == [("message", module, ["sid-io"]) for module in ("io", "xpc", "io")]
+        assert [(e, data["data"]["module"], room) for e, data, room in ws.emitted] == \
+               [("message", "io", "sid-io")] * 2
+    else:
+        (name, frame, namespace, skip_sid), = ws.socketio.emitted
+        assert (name, namespace, skip_sid) == ("messages", NAMESPACE, ["sid-io"])
+        assert [item["message"] for item in frame["data"]] == ["/tmp/0", "/tmp/1", "/tmp/2"]
+        (name, frame, room), = ws.emitted
+        assert (name, room) == ("messages", "sid-io")
+        assert [item["message"] for item in frame["data"]] == ["/tmp/0", "/tmp/2"]
+
+
+def test_no_subscription_broadcasts_to_the_namespace():
+    ws = FakeNamespace()
+    websocket = Websocket(ws)
+    websocket.forward(event(0, "io"))
+    websocket.close()
+    assert ws.socketio.emitted == []
+    (name, frame, room), = ws.emitted
+    assert (name, room, len(frame["data"])) == ("messages", None, 1)
+
+
+def test_connectors_share_the_namespace_subscriptions():
+    ws = FakeNamespace()
+    first, second = Websocket(ws), Websocket(ws)
+    assert first.subscriptions is second.subscriptions
+    handlers = ws.on_subscribe, ws.on_unsubscribe, ws.on_disconnect
+
+    first.close()
+    assert (ws.on_subscribe, ws.on_unsubscribe, ws.on_disconnect) == handlers
+    second.close()
+    assert not hasattr(ws, "on_subscribe")
+    # The handler of the class is back
+    assert ws.on_disconnect() == "disconnected"
+
+    third = Websocket(ws)
+    assert third.subscriptions is not first.subscriptions
+    third.close()
+
+
+def test_gui_clients_subscribe_through_the_namespace():
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode="threading")
+    namespace = Namespace(NAMESPACE)
+    socketio.on_namespace(namespace)
+    subscribed, other = socketio.test_client(app, namespace=NAMESPACE), socketio.test_client(app, namespace=NAMESPACE)
+
+    first, second = Websocket(namespace), Websocket(namespace)
+    reply = subscribed.emit("subscribe", {"modules": ["io"]}, namespace=NAMESPACE, callback=True)
+    assert reply == {"modules": ["io"], "symbols": None, "tids": None}
+    assert "error" in subscribed.emit("subscribe", {"modules": 3.5}, namespace=NAMESPACE, callback=True)
+    # Closing another connector of the namespace keeps the subscriptions
+    first.close()
+
+    for i, module in enumerate(("io", "xpc")):
+        second.forward(event(i, module))
+    second.flush()
+
+    def modules(client) -> list:
+        return [[item["module"] for item in packet["args"][0]["data"]] for packet in client.get_received(NAMESPACE)
+                if packet["name"] == "messages"]
+    assert modules(subscribed) == [["io"]]
+    assert modules(other) == [["io", "xpc"]]
+
+    assert subscribed.emit("unsubscribe", namespace=NAMESPACE, callback=True) is True
+    second.forward(event(2, "xpc"))
+    second.close()
+    assert modules(subscribed) == [["xpc"]]
+    subscribed.disconnect(namespace=NAMESPACE)
+    other.disconnect(namespace=NAMESPACE)
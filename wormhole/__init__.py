@@ -1 +1,2 @@
-from .core import Core
\ No newline at end of file
+from .core import Core
+from .async_core import AsyncCore
@@ -0,0 +1,196 @@
+import asyncio
+import functools
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, List, Tuple, Union
+
+from .core import Core
+from .hooking.event import HookEvent
+from .hooking.connectors.base import BaseConnector
+
+DEFAULT_EXECUTOR_WORKERS = 4
+DEFAULT_EVENTS_CAPACITY = 10000
+
+
+class EventStream(BaseConnector):
+    """
+    Connector turning published events into an async iterator. Events are published on the processing thread
+    and handed over to the event loop without blocking: when the consumer is too slow they are dropped and counted.
+    Every item is a HookEvent.
+    """
+    inline = True
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, capacity: int = DEFAULT_EVENTS_CAPACITY):
+        super(EventStream, self).__init__()
+        self._loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=capacity)
+        self._closed: bool = False
+        self.dropped: int = 0
+
+    def _put(self, item) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _finish(self) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(None)
+
+    def forward(self, event):
+        if self._closed:
+            return
+        try:
+            # Consumed later on the loop thread: take a snapshot of objects modules may still modify
+            self._loop.call_soon_threadsafe(self._put, event.detach())
+        except RuntimeError:
+            # Event loop already closed
+            self._closed = True
+
+    def close(self) -> None:
+        """
+        Stop the iteration once pending events have been consumed (thread-safe)
+        """
+        if not self._closed:
+            self._closed = True
+            try:
+                self._loop.call_soon_threadsafe(self._finish)
+            except RuntimeError:
+                # Event loop already closed: nobody is iterating anymore
+                pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> HookEvent:
+        item = await self._queue.get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+
+class AsyncCore:
+    """
+    asyncio facade over Core: blocking Frida calls run on a managed executor, so a single event loop can drive
+    many sessions without spawning a thread per request.
+    Event streams end when the session detaches, whatever the reason (detach_session, kill_session, target exited).
+    """
+
+    def __init__(self, core: Core, executor: Union[Executor, None] = None):
+        """
+        :param core: the wrapped Core
+        :param executor: executor running blocking calls. If missing, a private one is created and shut down on close.
+                        Pass the same executor to many AsyncCore to share its threads.
+        """
+        self._core: Core = core
+        self._own_executor: bool = executor is None
+        self._executor: Executor = executor or ThreadPoolExecutor(max_workers=DEFAULT_EXECUTOR_WORKERS,
+                                                                  thread_name_prefix="wormhole-core")
+        self._streams: List[EventStream] = list()
+        self._detached: bool = False
+        core.add_detached_callback(self._on_detached)
+
+    def _on_detached(self) -> None:
+        self._detached = True
+        for stream in list(self._streams):
+            self.close_events(stream)
+
+    @classmethod
+    async def create(cls, device, target: Union[str, int], ws=None, executor: Union[Executor, None] = None,
+                     **core_kwargs) -> 'AsyncCore':
+        """
+        Build the Core (that queries the device) without blocking the event loop
+        :param device: device to attach
+        :param target: bundle ID of the app/pid of the process to analyze
+        :param ws: websocket connection with GUI
+        :param executor: executor running blocking calls
+        :param core_kwargs: other Core parameters
+        """
+        own_executor = executor is None
+        executor = executor or ThreadPoolExecutor(max_workers=DEFAULT_EXECUTOR_WORKERS,
+                                                  thread_name_prefix="wormhole-core")
+        try:
+            core = await asyncio.get_running_loop().run_in_executor(
+                executor, functools.partial(Core, device, target, ws, **core_kwargs))
+        except BaseException:
+            if own_executor:
+                executor.shutdown(wait=False)
+            raise
+        async_core = cls(core, executor)
+        async_core._own_executor = own_executor
+        return async_core
+
+    @property
+    def core(self) -> Core:
+        return self._core
+
+    async def _call(self, func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._executor,
+                                                                functools.partial(func, *args, **kwargs))
+
+    async def run(self, js_source: Union[str, None] = None) -> bool:
+        return await self._call(self._core.run, js_source)
+
+    async def resume_target(self) -> bool:
+        return await self._call(self._core.resume_target)
+
+    async def operations(self, modules: List[str], custom_modules: List[str], connectors: List[str]) -> bool:
+        return await self._call(self._core.operations, modules, custom_modules, connectors)
+
+    async def execute_method(self, method: str, *args):
+        return await self._call(self._core.execute_method, method, *args)
+
+    async def dump_ipa(self) -> Tuple[Union[str, None], Union[str, None]]:
+        return await self._call(self._core.execute_method, 'dumpipa')
+
+    async def profile(self, seconds: float = 10.0, mode: str = "sampling") -> Union[Dict[str, str], None]:
+        return await self._call(self._core.profile, seconds, mode)
+
+    async def unhook(self) -> bool:
+        return await self._call(self._core.unhook)
+
+    async def detach_session(self) -> None:
+        await self._call(self._core.detach_session)
+
+    async def kill_session(self) -> None:
+        await self._call(self._core.kill_session)
+
+    def events(self, capacity: int = DEFAULT_EVENTS_CAPACITY) -> EventStream:
+        """
+        Async iterator of the events published by modules, from now on:
+
+            async for event in async_core.events():
+                ...
+
+        The iteration stops when the session detaches.
+        :param capacity: max number of events waiting to be consumed before dropping new ones
+        """
+        stream = EventStream(asyncio.get_running_loop(), capacity)
+        self._streams.append(stream)
+        self._core.add_connector(stream)
+        if self._detached:
+            # Session already detached (or meanwhile): nothing will come
+            self.close_events(stream)
+        return stream
+
+    def close_events(self, stream: EventStream) -> None:
+        """
+        Stop one of the event streams
+        """
+        self._core.remove_connector(stream)
+        stream.close()
+        try:
+            self._streams.remove(stream)
+        except ValueError:
+            pass
+
+    async def close(self) -> None:
+        """
+        Stop all event streams and release the private executor
+        """
+        for stream in list(self._streams):
+            self.close_events(stream)
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
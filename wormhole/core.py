@@ -3,11 +3,12 @@ import frida
 import shutil
 import logging
 import paramiko
+import threading
 import subprocess
 
 from paramiko import SSHClient
 from scp import SCPClient
-from typing import List, Union, Tuple
+from typing import Callable, Dict, List, Union, Tuple
 from flask_socketio import Namespace
 from enum import Enum
 
@@ -15,9 +16,18 @@ from .utils.utils import zip_folder
 
 from .hooking.connector_manager import ConnectorManager
 from .hooking.modules_manager import ModulesManager
+from .hooking.sharding import DEFAULT_WORKERS
+from .hooking.ingestion import IngestionQueue, DEFAULT_CAPACITY
+from .hooking.dispatch import MessageDispatcher
+from .hooking.capture import CaptureWriter
+from .hooking.metrics import MetricsServer, PipelineMetrics
+from .hooking.profiler import PipelineProfiler, ProfilerMode, DEFAULT_INTERVAL, register_profile_handler, \
+    unregister_profile_handler
 
 AGENT_PROJECT_DIR = os.path.join(os.getcwd(), 'wormhole-agent')
 AGENT_DIR = os.path.join(os.getcwd(), 'agents')
+CAPTURE_DIR = 'capture'
+PROFILES_DIR = 'profiles'
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -34,12 +44,35 @@ class TargetOs(Enum):
 
 class Core(object):
 
-    def __init__(self, device: frida.core.Device, target: Union[str, int], ws: Union[Namespace, None]):
+    def __init__(self,
+                 device: frida.core.Device,
+                 target: Union[str, int],
+                 ws: Union[Namespace, None],
+                 queue_capacity: int = DEFAULT_CAPACITY,
+                 sharded_modules: List[str] = None,
+                 shard_workers: int = DEFAULT_WORKERS,
+                 data_root: Union[str, None] = None,
+                 connector_policies: Union[Dict[str, str], None] = None,
+                 connector_options: Union[Dict[str, dict], None] = None,
+                 capture: bool = False,
+                 agent_dir: Union[str, None] = None,
+                 agent_project_dir: Union[str, None] = None):
         """
         Initialize Core
         :param device: device to attach
         :param target: bundle ID of the app/pid of the process to analyze
         :param ws: websocket connection with GUI
+        :param queue_capacity: max number of agent messages waiting to be processed before dropping new ones
+        :param sharded_modules: modules to run inside worker processes instead of the ingestion thread
+        :param shard_workers: number of worker processes for sharded modules
+        :param data_root: directory containing the data directories of analyzed targets (default: ./appData)
+        :param connector_policies: connector name -> overflow policy of its queue
+                                    ("block" (default), "drop_oldest", "drop_newest" or "spill")
+        :param connector_options: connector name -> keyword arguments of the connector
+                                    (i.e. {"file": {"colors": False, "compression": "zstd"}})
+        :param capture: record every raw agent message inside '<data dir>/capture' (see CaptureReader)
+        :param agent_dir: directory of the compiled agents (default: ./agents)
+        :param agent_project_dir: agent sources, compiled with custom modules (default: ./wormhole-agent)
         """
         self._ws = ws
         self._device: frida.core.Device = device
@@ -63,12 +96,37 @@ class Core(object):
             self._target_name: str = target
             self._target_pid: Union[int, None] = None
 
+        self._data_root: str = data_root or os.path.join(os.getcwd(), 'appData')
+        self._agent_dir: str = agent_dir or AGENT_DIR
+        self._agent_project_dir: str = agent_project_dir or AGENT_PROJECT_DIR
         self._data_dir: str = self._create_data_dir()
         self._session: Union[frida.core.Session, None] = None
         self._script = None
         self._resumed = False if not self._target_pid else True
-        self._modules_manager: ModulesManager = ModulesManager(self._target_name, self._data_dir)
+        self._metrics: PipelineMetrics = PipelineMetrics()
+        self._metrics_server: Union[MetricsServer, None] = None
+        self._modules_manager: ModulesManager = ModulesManager(
+            self._target_name,
+            self._data_dir,
+            sharded_modules,
+            shard_workers,
+            self._metrics
+        )
         self._connector_manager: Union[ConnectorManager, None] = None
+        self._connector_policies: Dict[str, str] = connector_policies or {}
+        self._connector_options: Dict[str, dict] = connector_options or {}
+        self._extra_connectors: list = list()
+        self._capture: Union[CaptureWriter, None] = \
+            CaptureWriter(os.path.join(self._data_dir, CAPTURE_DIR)) if capture else None
+        self._ingestion: IngestionQueue = IngestionQueue(self._dispatch_message, queue_capacity, self._metrics)
+        self._dispatcher: MessageDispatcher = MessageDispatcher(self._modules_manager, self._metrics)
+        self._profiler: PipelineProfiler = PipelineProfiler(os.path.join(self._data_dir, PROFILES_DIR),
+                                                            self._ingestion, self._on_profile_done,
+                                                            self._pipeline_threads)
+        # Teardown is requested by the user (unhook, detach_session) and by Frida's thread (session detached)
+        self._teardown_lock = threading.Lock()
+        self._detached: bool = False
+        self._detached_callbacks: List[Callable[[], None]] = list()
         self._hooking_ops: bool = False
         self._dumped_ipa: bool = False
 
@@ -99,7 +157,7 @@ class Core(object):
         """
         Create home app directory
         """
-        base_dir = os.path.join(os.getcwd(), 'appData')
+        base_dir = self._data_root
         dir_path = os.path.join(base_dir,
                                 f"{self._target_name + '_' + str(self._target_pid) if self._target_pid else self._target_name}")
         if not os.path.exists(base_dir):
@@ -113,9 +171,19 @@ class Core(object):
         logger.info(f"Create data directory at: {dir_path}")
         return dir_path
 
-    def _on_session_detached(self) -> None:
+    def _on_session_detached(self, *args) -> None:
         logger.info("Session detached")
-        zip_file = os.path.join(os.getcwd(), 'appData', f'{self._target_name}_{self._target_pid}.zip')
+        self._stop_pipeline()
+        with self._teardown_lock:
+            self._detached = True
+            callbacks, self._detached_callbacks = self._detached_callbacks, list()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error on detached callback: {e}")
+
+        zip_file = os.path.join(self._data_root, f'{self._target_name}_{self._target_pid}.zip')
         logger.info(f"Zipping data inside {zip_file}")
         zip_folder(
             self._data_dir,
@@ -130,6 +198,37 @@ class Core(object):
         if self._ws:
             self._ws.emit('destroyed')
 
+    def add_detached_callback(self, callback: Callable[[], None]) -> None:
+        """
+        Call a function once the session is detached (detach_session, kill_session, target exited or crashed) and
+        every message received has been processed. It is called right away if the session is already detached.
+        :param callback: function without arguments, called on Frida's thread
+        """
+        with self._teardown_lock:
+            if not self._detached:
+                self._detached_callbacks.append(callback)
+                return
+        callback()
+
+    def add_connector(self, connector) -> None:
+        """
+        Register an already initialized connector that receives the output of every following hooking operation
+        :param connector: BaseConnector instance
+        """
+        self._extra_connectors.append(connector)
+        if self._connector_manager:
+            self._connector_manager.add_connector(connector)
+
+    def remove_connector(self, connector) -> None:
+        """
+        Unregister a connector previously added with add_connector
+        :param connector: BaseConnector instance
+        """
+        if connector in self._extra_connectors:
+            self._extra_connectors.remove(connector)
+        if self._connector_manager:
+            self._connector_manager.remove_connector(connector)
+
     def standard_modules(self) -> List[str]:
         """
         Retrieve a list of standard hooking modules for currently analyzed application.
@@ -154,14 +253,14 @@ class Core(object):
         :return: path for the compiled custom agent
         """
         hooking_template_file_path = os.path.join(
-            AGENT_PROJECT_DIR,
+            self._agent_project_dir,
             'src',
             'common',
             'hooking',
             'hooking.template.ts'
         )
         final_hooking_file_path = os.path.join(
-            AGENT_PROJECT_DIR,
+            self._agent_project_dir,
             'src',
             'common',
             'hooking',
@@ -198,7 +297,7 @@ class Core(object):
         # ...and then compile the agent
         logger.info("Compiling custom agent")
         src_script = os.path.join("src", f"{self._os.value}.ts")
-        p = subprocess.Popen(["frida-compile", "-S", "-c", src_script, "-o", final_agent_script_path], cwd=AGENT_PROJECT_DIR)
+        p = subprocess.Popen(["frida-compile", "-S", "-c", src_script, "-o", final_agent_script_path], cwd=self._agent_project_dir)
         p.communicate()
         try:
             p.wait(timeout=20)
@@ -210,7 +309,7 @@ class Core(object):
 
         return final_agent_script_path
 
-    def _get_agent_path(self, force: bool = False) -> str:
+    def get_agent_path(self, force: bool = False) -> str:
         """
         As it is possible to add custom modules to hook app-specific classes' methods and functions,
             it is necessary to compile the agent dynamically in order to use custom modules.
@@ -225,9 +324,9 @@ class Core(object):
             agent_name = f'_{self._os.value}_base_agent.js'
             logger.info(f"No custom modules. Using base agent {agent_name}")
             # Default agent script (precompiled)
-            return os.path.join(AGENT_DIR, agent_name)
+            return os.path.join(self._agent_dir, agent_name)
 
-        final_agent_script_path = os.path.join(AGENT_DIR, f"_{self._os.value}_{self._target_name}_agent.js")
+        final_agent_script_path = os.path.join(self._agent_dir, f"_{self._os.value}_{self._target_name}_agent.js")
         if os.path.exists(final_agent_script_path) and not force:
             logger.info(f"Using already compiled custom agent: {final_agent_script_path}...")
             return final_agent_script_path
@@ -240,25 +339,166 @@ class Core(object):
 
     def _on_message(self, message: dict, data: bytes) -> None:
         """
-        Callback method on receiving message
+        Callback method on receiving message. It runs on Frida's thread, so it only enqueues hooking messages:
+        the actual processing happens on the ingestion consumer thread.
+        File downloads are handled here because they are already flow-controlled by the agent (ack).
         :param message: dictionary containing message info
         :param data: raw bytes from "send" function
         """
         if message.get('payload', {}).get('type', '') == "download":
             self._handle_file_download(message, data)
         else:
-            self._modules_manager.process_message(message, data)
+            self._ingestion.put(message, data)
+
+    def _dispatch_message(self, message: dict, data: bytes) -> None:
+        """
+        Consumer of the ingestion queue: hand the message over to the modules (see MessageDispatcher).
+        Messages are captured as received, before any decoding.
+        :param message: dictionary containing message info
+        :param data: raw bytes from "send" function
+        """
+        if self._capture:
+            self._capture.write(message, data)
+        self._dispatcher.dispatch(message, data)
+
+    def ingestion_stats(self) -> dict:
+        """
+        Retrieve the counters of the ingestion queue (depth, max depth, received, processed, dropped messages)
+        """
+        return self._ingestion.stats()
+
+    def compression_stats(self) -> dict:
+        """
+        Retrieve per module statistics of compressed payloads (compression ratio, inflate time)
+        """
+        return self._dispatcher.inflater.stats()
+
+    def capture_stats(self) -> dict:
+        """
+        Retrieve the counters of the raw message capture (records, bytes, segments, messages lost on I/O errors)
+        """
+        return self._capture.stats() if self._capture else {}
 
-    def run(self) -> bool:
+    def connector_stats(self) -> Dict[str, dict]:
+        """
+        Retrieve per connector queue counters (depth, lag, throughput, dropped and spilled events)
+        """
+        return self._connector_manager.stats() if self._connector_manager else {}
+
+    def metrics(self) -> dict:
+        """
+        Retrieve the pipeline metrics: latency histograms of the receive, decode and render stages, per module and
+        per connector counters, processing/forward times and end-to-end lags since the agent timestamp
+        (microseconds), plus the ingestion queue counters
+        """
+        metrics = self._metrics.snapshot()
+        metrics["ingestion"] = self.ingestion_stats()
+        return metrics
+
+    @property
+    def pipeline_metrics(self) -> PipelineMetrics:
+        """
+        Metrics of the pipeline of this session, to share with a ConnectorManager created outside of Core
+        """
+        return self._metrics
+
+    def _prometheus_metrics(self) -> str:
+        ingestion = self.ingestion_stats()
+        return self._metrics.to_prometheus({
+            "wormhole_ingestion_depth": ingestion["depth"],
+            "wormhole_ingestion_received": ingestion["received"],
+            "wormhole_ingestion_processed": ingestion["processed"],
+            "wormhole_ingestion_dropped": ingestion["dropped"],
+        })
+
+    def serve_metrics(self, port: int = 0, host: str = "127.0.0.1") -> int:
+        """
+        Expose the pipeline metrics in the Prometheus text format on http://<host>:<port>/metrics,
+        until the session is detached
+        :param port: listening port (0: any free port)
+        :param host: listening address
+        :return: the listening port
+        """
+        if not self._metrics_server:
+            self._metrics_server = MetricsServer(self._prometheus_metrics, host, port)
+            logger.info(f"Serving metrics on http://{host}:{self._metrics_server.port}/metrics")
+        return self._metrics_server.port
+
+    def stop_metrics_server(self) -> None:
+        if self._metrics_server:
+            self._metrics_server.close()
+            self._metrics_server = None
+
+    def profile(self,
+                seconds: float = 10.0,
+                mode: Union[ProfilerMode, str] = ProfilerMode.SAMPLING,
+                interval: float = DEFAULT_INTERVAL) -> Union[Dict[str, str], None]:
+        """
+        Profile the processing of hooked calls for some seconds, without stopping the session.
+        Results are written inside '<data dir>/profiles' once the profile ends:
+            - cprofile: every call made on the ingestion thread (modules), as pstats
+            - sampling: stacks of the ingestion thread and of the connector threads, as collapsed stacks (flamegraph)
+        :param seconds: duration of the profile
+        :param mode: ProfilerMode (or its value)
+        :param interval: seconds between samples (sampling mode)
+        :return: paths of the results ("stats" and a text "summary"), None if a profile is already running
+        """
+        return self._profiler.start(seconds, mode, interval)
+
+    def _pipeline_threads(self) -> List[threading.Thread]:
+        """
+        Threads of this session: ingestion consumer, its connector workers and their threads. Connectors shared with
+        other sessions (SessionPool) are left out.
+        """
+        threads = [self._ingestion.thread]
+        if self._connector_manager:
+            threads.extend(self._connector_manager.threads())
+        return threads
+
+    def _on_profile_request(self, request_data) -> dict:
+        """
+        GUI request of a profile: {"session": "<name>_<pid>", "seconds": 10, "mode": "sampling"} (see
+        register_profile_handler). Results are announced with a 'profile' event naming the session.
+        """
+        request_data = request_data or {}
+        try:
+            outputs = self.profile(float(request_data.get("seconds", 10.0)),
+                                   request_data.get("mode", ProfilerMode.SAMPLING.value))
+        except (ValueError, TypeError, RuntimeError) as e:
+            return {"error": str(e)}
+        return outputs if outputs is not None else {"error": "Already profiling"}
+
+    def _on_profile_done(self, outputs: Dict[str, str]) -> None:
+        if self._ws:
+            self._ws.emit('profile', dict(outputs, session=self.session_name))
+
+    @property
+    def target_name(self) -> str:
+        return self._target_name
+
+    @property
+    def target_pid(self) -> Union[int, None]:
+        return self._target_pid
+
+    @property
+    def session_name(self) -> str:
+        """
+        Name of the session ("<name>_<pid>"), tagging its events and GUI requests
+        """
+        return f"{self._target_name}_{self._target_pid}"
+
+    def run(self, js_source: Union[str, None] = None) -> bool:
         """
         Spawn target app, load the agent script and resume the app
+        :param js_source: source of an already compiled agent to inject (i.e. shared among many sessions)
         :return: true if everything goes well
         """
 
         # Prepare agent script to inject
-        script_path = self._get_agent_path()
-        with open(script_path, "r") as js_file:
-            js_source = js_file.read()
+        if js_source is None:
+            script_path = self.get_agent_path()
+            with open(script_path, "r") as js_file:
+                js_source = js_file.read()
 
         # Spawn target if needed
         if not self._target_pid:
@@ -280,6 +520,8 @@ class Core(object):
             logger.error(f'{e}')
             return False
 
+        if self._ws:
+            register_profile_handler(self._ws, self.session_name, self._on_profile_request)
         self._script = self._session.create_script(js_source)
         self._session.on('detached', self._on_session_detached)
         self._script.on('message', self._on_message)
@@ -288,16 +530,22 @@ class Core(object):
         # self._script.on('stopped', )
         # self._script.on('crashed', )
         # self._script.on('unload', )
+        self._ingestion.start()
         self._script.load()
 
         return True
 
-    def operations(self, modules: List[str], custom_modules: List[str], connectors: List[str]) -> bool:
+    def operations(self,
+                   modules: List[str],
+                   custom_modules: List[str],
+                   connectors: List[str],
+                   connector_manager: Union[ConnectorManager, None] = None) -> bool:
         """
         Start hooking app's functions related to modules and custom modules. Publish intercepted calls to connectors
         :param modules: list of modules to hook
         :param custom_modules: list of custom modules created for single applications/processes
         :param connectors: list of connectors that publish intercepted data to their specific container
+        :param connector_manager: already initialized manager to use instead of creating one from connectors names
         :retval: true if everything goes well
         """
         if self._hooking_ops:
@@ -305,7 +553,13 @@ class Core(object):
             return False
 
         try:
-            self._connector_manager = ConnectorManager(connectors, self._ws)
+            self._connector_manager = connector_manager or ConnectorManager(connectors, self._ws,
+                                                                            self._connector_policies,
+                                                                            options=self._connector_options,
+                                                                            data_dir=self._data_dir,
+                                                                            metrics=self._metrics)
+            for connector in self._extra_connectors:
+                self._connector_manager.add_connector(connector)
             modules, custom_modules = self._modules_manager.init_modules(
                 modules,
                 custom_modules,
@@ -336,15 +590,18 @@ class Core(object):
         """
         Remove all previously added hooks
         """
-        if not self._hooking_ops:
-            return False
+        with self._teardown_lock:
+            if not self._hooking_ops:
+                return False
 
-        logger.info("Remove hooks")
-        self._script.exports.unhook()
-        self._hooking_ops = False
-        self._modules_manager.clear_modules()
-        self._connector_manager.clean_connectors()
-        return True
+            logger.info("Remove hooks")
+            self._script.exports.unhook()
+            self._hooking_ops = False
+            # Hooked calls already received still need their modules and connectors
+            self._ingestion.drain()
+            self._modules_manager.clear_modules()
+            self._connector_manager.clean_connectors()
+            return True
 
     def execute_method(self, method: str, *args):
         """
@@ -370,6 +627,23 @@ class Core(object):
     def detach_session(self):
         self.unhook()
         self._session.detach()
+        self._stop_pipeline()
+
+    def _stop_pipeline(self) -> None:
+        """
+        Stop the profiler (and its GUI requests), the ingestion consumer (after the messages already received),
+        the capture and the metrics server. Both detach_session and Frida's 'detached' callback call it: the first
+        call does the job.
+        """
+        with self._teardown_lock:
+            if self._ws:
+                unregister_profile_handler(self._ws, self.session_name)
+            self._profiler.stop()
+            self._ingestion.stop()
+            if self._capture:
+                self._capture.close()
+                self._capture = None
+            self.stop_metrics_server()
 
     def kill_session(self):
         self.detach_session()
@@ -0,0 +1,329 @@
+import os
+import sys
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+
+from typing import Callable, Dict, List, Union
+
+import frida
+
+from .hooking.connectors.base import BaseConnector
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+DEFAULT_FLUSH_SIZE = 200
+DEFAULT_TICK = 0.5
+DEFAULT_REFRESH = 1.0
+
+
+class _FleetConnector(BaseConnector):
+    """
+    Connector used inside device workers: events are sent back to the fleet parent in chunks,
+    to avoid one IPC round per event. Templated events are not rendered here: the parent renders them only if it
+    needs text. Events carrying a content object are detached (their text and document taken now): the object stays
+    in the worker, where its module may still modify it.
+    """
+    inline = True
+
+    def __init__(self, device_id: str, event_queue, flush_size: int = DEFAULT_FLUSH_SIZE):
+        super(_FleetConnector, self).__init__()
+        self._device_id: str = device_id
+        self._event_queue = event_queue
+        self._flush_size: int = flush_size
+        self._pending: list = list()
+        self._lock = threading.Lock()
+        self.events: int = 0
+
+    def forward(self, event):
+        with self._lock:
+            self._pending.append(event.detach())
+            self.events += 1
+            if len(self._pending) >= self._flush_size:
+                self._flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._event_queue.put(("events", self._device_id, self._pending))
+            self._pending = list()
+
+
+def _device_worker(device_id: str,
+                   target: Union[str, int],
+                   modules: List[str],
+                   custom_modules: List[str],
+                   connectors: List[str],
+                   data_root: str,
+                   agent_dir: str,
+                   agent_project_dir: str,
+                   duration: Union[float, None],
+                   device_factory: Union[Callable, None],
+                   event_queue,
+                   stop_event,
+                   core_kwargs: dict) -> None:
+    """
+    Entry point of a device worker process: it owns an isolated Core (module globals, loggers, data root).
+    Directories come resolved by the parent: the worker does not depend on its working directory.
+    """
+    from .core import Core
+
+    core = None
+    try:
+        device = device_factory(device_id) if device_factory else frida.get_device(device_id)
+        os.makedirs(data_root, exist_ok=True)
+        core = Core(device, target, None, data_root=data_root, agent_dir=agent_dir,
+                    agent_project_dir=agent_project_dir, **core_kwargs)
+        connector = _FleetConnector(device_id, event_queue)
+        core.add_connector(connector)
+
+        if not core.run():
+            raise RuntimeError(f"Impossible to run {target}")
+        if not core.operations(modules, custom_modules, connectors):
+            raise RuntimeError(f"Impossible to hook {modules} {custom_modules}")
+
+        event_queue.put(("started", device_id, None))
+        deadline = time.monotonic() + duration if duration else None
+        while not stop_event.wait(DEFAULT_TICK):
+            connector.flush()
+            event_queue.put(("stats", device_id, core.ingestion_stats()))
+            if deadline and time.monotonic() >= deadline:
+                break
+
+        core.detach_session()
+        connector.flush()
+        event_queue.put(("done", device_id, core.ingestion_stats()))
+    except Exception as e:
+        event_queue.put(("error", device_id, str(e)))
+        if core:
+            try:
+                core.detach_session()
+            except Exception:
+                pass
+
+
+class DeviceProgress:
+
+    def __init__(self, device_id: str):
+        self.device_id: str = device_id
+        self.state: str = "starting"
+        self.events: int = 0
+        self.rate: float = 0.0
+        self.ingestion: dict = dict()
+        self.error: Union[str, None] = None
+        self._last_events: int = 0
+        self._last_time: float = time.monotonic()
+
+    def update_rate(self, now: float) -> None:
+        if now > self._last_time:
+            self.rate = (self.events - self._last_events) / (now - self._last_time)
+        self._last_events, self._last_time = self.events, now
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "events": self.events,
+            "events_per_sec": self.rate,
+            "ingestion": self.ingestion,
+            "error": self.error,
+        }
+
+
+class FleetRunner:
+    """
+    Run the same capture on many devices at once, one isolated worker process (and Core) per device.
+    Every worker writes into its own data root (<data_root>/<device id>) and streams events back
+    to this process, which aggregates them and shows a combined progress and throughput view.
+    """
+
+    def __init__(self,
+                 device_ids: List[str],
+                 target: Union[str, int],
+                 modules: List[str],
+                 custom_modules: Union[List[str], None] = None,
+                 connectors: Union[List[str], None] = None,
+                 data_root: Union[str, None] = None,
+                 agent_dir: Union[str, None] = None,
+                 agent_project_dir: Union[str, None] = None,
+                 device_factory: Union[Callable, None] = None,
+                 on_event: Union[Callable, None] = None,
+                 **core_kwargs):
+        """
+        :param device_ids: ids of the devices (i.e. frida.Device.id, "local" for the local system)
+        :param target: bundle ID of the app/pid of the process to analyze on every device
+        :param modules: list of modules to hook
+        :param custom_modules: list of custom modules to hook
+        :param connectors: connectors used by each worker, on top of the stream towards this process
+        :param data_root: base directory of workers data roots (default: ./fleetData)
+        :param agent_dir: directory of the compiled agents (default: ./agents)
+        :param agent_project_dir: agent sources, compiled with custom modules (default: ./wormhole-agent)
+        :param device_factory: picklable function device_id -> device (i.e. stand-in devices).
+                                Default: frida.get_device
+        :param on_event: function(device_id, event) called in this process for every HookEvent
+        :param core_kwargs: other Core parameters
+        """
+        self._device_ids: List[str] = list(device_ids)
+        self._target = target
+        self._modules: List[str] = modules
+        self._custom_modules: List[str] = custom_modules or []
+        self._connectors: List[str] = connectors or []
+        self._data_root: str = os.path.abspath(data_root or os.path.join(os.getcwd(), 'fleetData'))
+        self._agent_dir: str = os.path.abspath(agent_dir or os.path.join(os.getcwd(), 'agents'))
+        self._agent_project_dir: str = os.path.abspath(agent_project_dir or os.path.join(os.getcwd(), 'wormhole-agent'))
+        self._device_factory = device_factory
+        self._on_event = on_event
+        self._core_kwargs: dict = core_kwargs
+        self._ctx = multiprocessing.get_context("spawn")
+        self._event_queue = self._ctx.Queue()
+        self._stop_event = self._ctx.Event()
+        self._processes: Dict[str, multiprocessing.Process] = dict()
+        self._progress: Dict[str, DeviceProgress] = {d: DeviceProgress(d) for d in self._device_ids}
+        self._started: float = 0.0
+        self._duration: Union[float, None] = None
+
+    def _device_data_root(self, device_id: str) -> str:
+        return os.path.join(self._data_root, device_id.replace(os.sep, "_"))
+
+    def start(self) -> None:
+        """
+        Spawn one worker process per device
+        """
+        self._started = time.monotonic()
+        for device_id in self._device_ids:
+            process = self._ctx.Process(
+                target=_device_worker,
+                args=(device_id, self._target, self._modules, self._custom_modules, self._connectors,
+                      self._device_data_root(device_id), self._agent_dir, self._agent_project_dir,
+                      self._duration, self._device_factory, self._event_queue, self._stop_event, self._core_kwargs),
+                name=f"wormhole-fleet-{device_id}",
+                daemon=True
+            )
+            process.start()
+            self._processes[device_id] = process
+
+    def stop(self) -> None:
+        """
+        Ask all workers to detach and exit
+        """
+        self._stop_event.set()
+
+    def _handle(self, kind: str, device_id: str, content) -> None:
+        progress = self._progress[device_id]
+        if kind == "events":
+            progress.events += len(content)
+            if self._on_event:
+                for event in content:
+                    self._on_event(device_id, event)
+        elif kind == "stats":
+            progress.ingestion = content
+        elif kind == "started":
+            progress.state = "running"
+        elif kind == "done":
+            progress.state = "done"
+            progress.ingestion = content
+        elif kind == "error":
+            progress.state = "error"
+            progress.error = content
+            logger.error(f"Device {device_id}: {content}")
+
+    def _is_running(self) -> bool:
+        return any(p.state in ("starting", "running") for p in self._progress.values()) and \
+            any(process.is_alive() for process in self._processes.values())
+
+    def progress(self) -> Dict[str, dict]:
+        """
+        Per device state, event counters and throughput
+        """
+        return {device_id: progress.to_dict() for device_id, progress in self._progress.items()}
+
+    def render_progress(self) -> str:
+        """
+        Combined progress and throughput view of the fleet
+        """
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        rows = [f"{'DEVICE':<28}{'STATE':<10}{'EVENTS':>12}{'EV/S':>10}{'QUEUE':>8}{'DROPPED':>9}"]
+        for progress in self._progress.values():
+            rows.append(f"{progress.device_id[:27]:<28}{progress.state:<10}{progress.events:>12}"
+                        f"{progress.rate:>10.0f}{progress.ingestion.get('depth', 0):>8}"
+                        f"{progress.ingestion.get('dropped', 0):>9}")
+        total = sum(p.events for p in self._progress.values())
+        rate = sum(p.rate for p in self._progress.values())
+        rows.append(f"{'TOTAL':<38}{total:>12}{rate:>10.0f}   [{elapsed:.0f}s]")
+        return "\n".join(rows)
+
+    def run(self, duration: Union[float, None] = None, refresh: float = DEFAULT_REFRESH, show: bool = True) -> dict:
+        """
+        Run the capture on all devices until duration expires, every worker ends or KeyboardInterrupt
+        :param duration: capture seconds per device (None: until stopped)
+        :param refresh: seconds between two updates of the progress view
+        :param show: print the progress view on stdout
+        :return: final progress of every device
+        """
+        self._duration = duration
+        self.start()
+        next_refresh = time.monotonic() + refresh
+        try:
+            while self._is_running() or not self._event_queue.empty():
+                try:
+                    self._handle(*self._event_queue.get(timeout=refresh / 4))
+                except queue.Empty:
+                    pass
+
+                now = time.monotonic()
+                if now >= next_refresh:
+                    for progress in self._progress.values():
+                        progress.update_rate(now)
+                    if show:
+                        sys.stdout.write(self.render_progress() + "\n\n")
+                        sys.stdout.flush()
+                    next_refresh = now + refresh
+        except KeyboardInterrupt:
+            logger.info("Stopping fleet...")
+            self.stop()
+
+        self._wait()
+        for progress in self._progress.values():
+            progress.update_rate(time.monotonic())
+
+        if show:
+            sys.stdout.write(self.render_progress() + "\n")
+        return self.progress()
+
+    def _wait(self, timeout: float = 30) -> None:
+        """
+        Wait for workers to exit while consuming their last events (a worker can't exit with unread queued data)
+        """
+        deadline = time.monotonic() + timeout
+        while any(process.is_alive() for process in self._processes.values()) and time.monotonic() < deadline:
+            try:
+                self._handle(*self._event_queue.get(timeout=0.1))
+            except queue.Empty:
+                pass
+
+        for device_id, process in self._processes.items():
+            if process.is_alive():
+                logger.warning(f"Worker of {device_id} did not exit, terminating it")
+                process.terminate()
+            process.join(1)
+        self._drain()
+
+        for progress in self._progress.values():
+            if progress.state in ("starting", "running"):
+                progress.state = "exited"
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                self._handle(*self._event_queue.get_nowait())
+            except queue.Empty:
+                break
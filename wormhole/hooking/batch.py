@@ -0,0 +1,68 @@
+"""
+Batched hook events.
+
+The agent can group several hooked calls into a single "send":
+
+    payload = {
+        "type": "batch",
+        "events": [
+            {"timestamp": ..., "tid": ..., "type": "io", "symbol": "read", "data": {...}, "offset": 0, "length": 16},
+            {"timestamp": ..., "tid": ..., "type": "io", "symbol": "close", "data": {...}},
+            ...
+        ]
+    }
+
+The raw bytes of all the events are concatenated into the single binary blob sent along with the message:
+every event references its own slice of the blob through "offset" and "length". Events without "offset"
+have no raw data, exactly like a standalone message sent without bytes.
+"""
+
+from typing import Iterator, List, Tuple, Union
+
+BATCH_TYPE = "batch"
+
+
+def is_batch(message: dict) -> bool:
+    """
+    Check if the message coming from the agent is a batch of events
+    :param message: dictionary containing message info
+    """
+    return message.get('payload', {}).get('type', '') == BATCH_TYPE
+
+
+def iter_batch(message: dict, data: Union[bytes, None]) -> Iterator[Tuple[dict, Union[bytes, None]]]:
+    """
+    Unpack a batch message into the single messages it carries, as if they came one by one from the agent
+    :param message: batch message
+    :param data: binary blob shared by all the events of the batch
+    :return: iterator of (message, data) couples
+    """
+    msg_type = message.get('type', 'send')
+    for event in message['payload'].get('events', []):
+        offset = event.get('offset', None)
+        if offset is None or data is None:
+            event_data = None
+        else:
+            event_data = data[offset:offset + event.get('length', 0)]
+
+        yield {'type': msg_type, 'payload': event}, event_data
+
+
+def build_batch(events: List[Tuple[dict, Union[bytes, None]]]) -> Tuple[dict, bytes]:
+    """
+    Pack a list of single events into a batch message. This is the host-side mirror of the agent's batching
+    and it is used to feed synthetic batches.
+    :param events: list of (payload, data) couples, where payload is the payload of a standalone message
+    :return: batch message and its binary blob
+    """
+    blob = bytearray()
+    batch_events = list()
+    for payload, data in events:
+        event = dict(payload)
+        if data is not None:
+            event['offset'] = len(blob)
+            event['length'] = len(data)
+            blob += data
+        batch_events.append(event)
+
+    return {'type': 'send', 'payload': {'type': BATCH_TYPE, 'events': batch_events}}, bytes(blob)
@@ -0,0 +1,98 @@
+import time
+
+from enum import Enum
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_INITIAL_BACKOFF = 1.0
+DEFAULT_MAX_BACKOFF = 60.0
+
+
+class BreakerState(Enum):
+    CLOSED = "closed"           # the sink is called for every event
+    OPEN = "open"               # the sink is failing: events are spooled, nothing is sent until the next probe
+    HALF_OPEN = "half_open"     # probing the sink
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing sink after some consecutive failures, then probe it again with exponential backoff.
+    Not thread safe: it is driven by the thread delivering events to the sink.
+    """
+
+    def __init__(self,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 initial_backoff: float = DEFAULT_INITIAL_BACKOFF,
+                 max_backoff: float = DEFAULT_MAX_BACKOFF):
+        """
+        :param failure_threshold: consecutive failures opening the circuit
+        :param initial_backoff: seconds before the first probe once open
+        :param max_backoff: max seconds between two probes (the delay doubles after every failed probe)
+        """
+        if failure_threshold <= 0:
+            raise ValueError(f"Invalid failure threshold: {failure_threshold}")
+
+        self._failure_threshold: int = failure_threshold
+        self._initial_backoff: float = initial_backoff
+        self._max_backoff: float = max_backoff
+        self.state: BreakerState = BreakerState.CLOSED
+        self._failures: int = 0
+        self._backoff: float = initial_backoff
+        self._next_probe: float = 0.0
+        self.trips: int = 0
+
+    @property
+    def is_closed(self) -> bool:
+        return self.state is BreakerState.CLOSED
+
+    def record_success(self) -> None:
+        self._failures = 0
+        if self.state is not BreakerState.CLOSED:
+            self.state = BreakerState.CLOSED
+            self._backoff = self._initial_backoff
+
+    def record_failure(self) -> bool:
+        """
+        :return: true if the failure (re)opened the circuit
+        """
+        if self.state is BreakerState.HALF_OPEN:
+            # Failed probe: wait longer before the next one
+            self._backoff = min(self._backoff * 2, self._max_backoff)
+            self._open()
+            return True
+
+        self._failures += 1
+        if self.state is BreakerState.CLOSED and self._failures >= self._failure_threshold:
+            self.trips += 1
+            self._backoff = self._initial_backoff
+            self._open()
+            return True
+        return False
+
+    def _open(self) -> None:
+        self.state = BreakerState.OPEN
+        self._next_probe = time.monotonic() + self._backoff
+
+    def probe_delay(self) -> float:
+        """
+        Seconds until the next probe is allowed (0 if it is already due)
+        """
+        return max(0.0, self._next_probe - time.monotonic())
+
+    def try_probe(self, force: bool = False) -> bool:
+        """
+        Move to half open if the next probe is due
+        :param force: probe now, even if the backoff has not expired yet
+        :return: true if the caller must probe the sink now
+        """
+        if self.state is BreakerState.OPEN and (force or time.monotonic() >= self._next_probe):
+            self.state = BreakerState.HALF_OPEN
+            return True
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self._failures,
+            "trips": self.trips,
+            "next_probe": self.probe_delay() if self.state is BreakerState.OPEN else 0.0,
+        }
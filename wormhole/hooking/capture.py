@@ -0,0 +1,344 @@
+"""
+Lossless capture of the raw agent messages.
+
+Every message received from the agent (the JSON message plus its raw bytes, still compressed/framed as sent) is
+appended to segment files:
+
+    <directory>/capture-000001.seg, capture-000002.seg, ...
+
+    segment = MAGIC record*
+    record  = header body
+    header  = body length (u32), crc32 (u32), receive time in ns (i64), JSON length (i32), data length (i32, -1: None)
+    body    = JSON message (utf-8), data
+
+The crc32 covers the header fields following it and the body, so torn writes (i.e. the process killed in the
+middle of a record) are detected when reading.
+Records are grouped in blocks (every index_records records or index_interval seconds): the sparse index
+<directory>/capture.idx has a JSON line per block with its segment, offsets, time range and modules, so readers
+skip the blocks outside the requested time range/modules. Segments are read through mmap.
+"""
+import os
+import re
+import json
+import mmap
+import time
+import zlib
+import struct
+import logging
+
+from typing import Dict, Iterator, List, NamedTuple, Set, Union
+
+from .batch import BATCH_TYPE
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+MAGIC = b"WHCAP\x00\x01\n"
+RECORD_HEADER = struct.Struct('<IIqii')
+CHECKED_FIELDS = struct.Struct('<qii')
+INDEX_FILE = "capture.idx"
+SEGMENT_NAME = "capture-{:06d}.seg"
+SEGMENT_PATTERN = re.compile(r"^capture-(\d+)\.seg$")
+
+DEFAULT_SEGMENT_BYTES = 256 * 1024 * 1024
+DEFAULT_INDEX_RECORDS = 1000
+DEFAULT_INDEX_INTERVAL = 1.0
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Seconds between two attempts to write again after an I/O error (i.e. disk full)
+RETRY_INTERVAL = 1.0
+
+
+def message_modules(message: dict) -> Set[str]:
+    """
+    Modules of a raw message: the payload type, or the types of the events of a batch
+    """
+    payload = message.get('payload', {})
+    if not isinstance(payload, dict):
+        return {message.get('type', '')}
+    msg_type = payload.get('type', '') if message.get('type', '') == 'send' else message.get('type', '')
+    if msg_type == BATCH_TYPE:
+        return {event.get('type', '') for event in payload.get('events', [])}
+    return {msg_type}
+
+
+class CapturedMessage(NamedTuple):
+    time_ns: int
+    message: dict
+    data: Union[bytes, None]
+
+
+class CaptureWriter:
+    """
+    Append raw agent messages to the capture segments.
+    Not thread safe: it is driven by the ingestion consumer thread.
+    I/O errors (i.e. disk full) never reach the caller: messages are dropped and counted as lost, and writing starts
+    again in a new segment (the failed one may end with a torn record) every RETRY_INTERVAL seconds.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                 index_records: int = DEFAULT_INDEX_RECORDS,
+                 index_interval: float = DEFAULT_INDEX_INTERVAL):
+        """
+        :param directory: directory of the segments and of the index (created if missing)
+        :param segment_bytes: size starting a new segment
+        :param index_records: max records of an index block
+        :param index_interval: max seconds of an index block
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory: str = directory
+        self._segment_bytes: int = segment_bytes
+        self._index_records: int = index_records
+        self._index_interval: float = index_interval
+        self._index = open(os.path.join(directory, INDEX_FILE), "a", encoding="utf-8")
+
+        # Continue after the last segment of a previous capture (numbering may have gaps)
+        numbers = [int(match.group(1)) for match in map(SEGMENT_PATTERN.match, os.listdir(directory)) if match]
+        self._segment_number: int = max(numbers, default=0)
+        self._segment = None
+        self._segment_name: str = ""
+        self._offset: int = 0
+        self._new_segment()
+        self._new_block()
+
+        self.records: int = 0
+        self.bytes: int = 0
+        self.lost: int = 0
+        self._failed_at: Union[float, None] = None
+
+    def _new_segment(self) -> None:
+        if self._segment:
+            self._segment.close()
+        self._segment_number += 1
+        self._segment_name = SEGMENT_NAME.format(self._segment_number)
+        self._segment = open(os.path.join(self.directory, self._segment_name), "wb", buffering=WRITE_BUFFER_SIZE)
+        self._segment.write(MAGIC)
+        self._offset = len(MAGIC)
+
+    def _new_block(self) -> None:
+        self._block_offset: int = self._offset
+        self._block_records: int = 0
+        self._block_first: int = 0
+        self._block_last: int = 0
+        self._block_modules: Set[str] = set()
+        self._block_started: float = time.monotonic()
+
+    def _end_block(self) -> None:
+        """
+        Flush the segment, then index the block (the index never points to data not written yet)
+        """
+        if not self._block_records:
+            return
+        self._segment.flush()
+        self._index.write(json.dumps({
+            "segment": self._segment_name,
+            "offset": self._block_offset,
+            "end": self._offset,
+            "records": self._block_records,
+            "first": self._block_first,
+            "last": self._block_last,
+            "modules": sorted(self._block_modules),
+        }) + "\n")
+        self._index.flush()
+        self._new_block()
+
+    def write(self, message: dict, data: Union[bytes, None]) -> None:
+        """
+        Append a raw agent message
+        :param message: dictionary containing message info
+        :param data: raw bytes from "send" function
+        """
+        if self._failed_at is not None:
+            if time.monotonic() - self._failed_at < RETRY_INTERVAL or not self._recover():
+                self.lost += 1
+                return
+
+        try:
+            self._write(message, data)
+        except OSError as e:
+            logger.error(f"Error writing capture segment {self._segment_name}, dropping messages: {e}")
+            self._failed_at = time.monotonic()
+            self.lost += 1
+
+    def _recover(self) -> bool:
+        """
+        Start a new segment after an I/O error
+        :return: true if writing can go on
+        """
+        try:
+            if self._segment:
+                self._segment.close()
+        except OSError:
+            pass
+        self._segment = None
+        try:
+            self._new_segment()
+            self._new_block()
+            self._segment.flush()
+        except OSError as e:
+            logger.debug(f"Capture still failing: {e}")
+            self._failed_at = time.monotonic()
+            return False
+
+        logger.warning(f"Capture written again in {self._segment_name}, {self.lost} messages lost")
+        self._failed_at = None
+        return True
+
+    def _write(self, message: dict, data: Union[bytes, None]) -> None:
+        time_ns = time.time_ns()
+        encoded = json.dumps(message, separators=(',', ':')).encode()
+        data_length = len(data) if data is not None else -1
+        checked = CHECKED_FIELDS.pack(time_ns, len(encoded), data_length)
+        crc = zlib.crc32(encoded, zlib.crc32(checked))
+        if data:
+            crc = zlib.crc32(data, crc)
+        body_length = len(encoded) + max(data_length, 0)
+
+        if self._offset + RECORD_HEADER.size + body_length > self._segment_bytes and self._offset > len(MAGIC):
+            self._end_block()
+            self._new_segment()
+            self._new_block()
+
+        self._segment.write(RECORD_HEADER.pack(body_length, crc, time_ns, len(encoded), data_length))
+        self._segment.write(encoded)
+        if data:
+            self._segment.write(data)
+        self._offset += RECORD_HEADER.size + body_length
+
+        if not self._block_records:
+            self._block_first = time_ns
+        self._block_last = time_ns
+        self._block_records += 1
+        self._block_modules.update(message_modules(message))
+        self.records += 1
+        self.bytes += RECORD_HEADER.size + body_length
+
+        if self._block_records >= self._index_records or \
+                time.monotonic() - self._block_started >= self._index_interval:
+            self._end_block()
+
+    def stats(self) -> dict:
+        return {"records": self.records, "bytes": self.bytes, "segments": self._segment_number, "lost": self.lost}
+
+    def close(self) -> None:
+        try:
+            if self._failed_at is None:
+                self._end_block()
+            if self._segment:
+                self._segment.close()
+        except OSError as e:
+            logger.error(f"Error closing capture segment {self._segment_name}: {e}")
+        finally:
+            try:
+                self._index.close()
+            except OSError as e:
+                logger.error(f"Error closing capture index: {e}")
+
+
+class CaptureReader:
+    """
+    Read the messages of a capture through mmap, in the order they were received.
+    Blocks outside the requested time range/modules are skipped using the sparse index; records written after the
+    last indexed block (i.e. the capture was not closed) are scanned one by one.
+    A record with a wrong checksum or truncated ends the reading of its block (the following indexed blocks are still
+    read) or, after the last indexed block, of its segment.
+    """
+
+    def __init__(self, directory: str):
+        """
+        :param directory: directory of a capture
+        """
+        self.directory: str = directory
+        self.segments: List[str] = sorted(name for name in os.listdir(directory) if name.endswith(".seg"))
+        self._blocks: Dict[str, List[dict]] = dict()
+
+        index_path = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as index:
+                for line in index:
+                    try:
+                        block = json.loads(line)
+                    except ValueError:
+                        # Last line torn by a crash
+                        continue
+                    self._blocks.setdefault(block["segment"], list()).append(block)
+
+    def modules(self) -> Set[str]:
+        """
+        Modules of the indexed messages
+        """
+        return {module for blocks in self._blocks.values() for block in blocks for module in block["modules"]}
+
+    def __iter__(self) -> Iterator[CapturedMessage]:
+        return self.messages()
+
+    def messages(self,
+                 start_ns: Union[int, None] = None,
+                 end_ns: Union[int, None] = None,
+                 modules: Union[List[str], None] = None) -> Iterator[CapturedMessage]:
+        """
+        :param start_ns: skip messages received before (ns since the epoch)
+        :param end_ns: skip messages received after (ns since the epoch)
+        :param modules: only messages of these modules (batches containing one of them are returned whole)
+        """
+        wanted = set(modules) if modules is not None else None
+        for segment in self.segments:
+            with open(os.path.join(self.directory, segment), "rb") as segment_file:
+                if os.fstat(segment_file.fileno()).st_size <= len(MAGIC):
+                    continue
+                with mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if mapped[:len(MAGIC)] != MAGIC:
+                        logger.error(f"Not a capture segment: {segment}")
+                        continue
+                    yield from self._segment_messages(segment, mapped, start_ns, end_ns, wanted)
+
+    def _segment_messages(self, segment: str, mapped, start_ns, end_ns, wanted) -> Iterator[CapturedMessage]:
+        position = len(MAGIC)
+        for block in self._blocks.get(segment, []):
+            if (start_ns is not None and block["last"] < start_ns) or \
+                    (end_ns is not None and block["first"] > end_ns) or \
+                    (wanted is not None and not wanted.intersection(block["modules"])):
+                position = block["end"]
+                continue
+            for captured in self._records(segment, mapped, block["offset"], block["end"]):
+                if self._matches(captured, start_ns, end_ns, wanted):
+                    yield captured
+            position = block["end"]
+
+        # Records not indexed yet
+        for captured in self._records(segment, mapped, position, len(mapped)):
+            if self._matches(captured, start_ns, end_ns, wanted):
+                yield captured
+
+    @staticmethod
+    def _matches(captured: CapturedMessage, start_ns, end_ns, wanted) -> bool:
+        if start_ns is not None and captured.time_ns < start_ns:
+            return False
+        if end_ns is not None and captured.time_ns > end_ns:
+            return False
+        return wanted is None or bool(wanted.intersection(message_modules(captured.message)))
+
+    @staticmethod
+    def _records(segment: str, mapped, position: int, end: int) -> Iterator[CapturedMessage]:
+        while position + RECORD_HEADER.size <= end:
+            body_length, crc, time_ns, json_length, data_length = RECORD_HEADER.unpack_from(mapped, position)
+            body_start = position + RECORD_HEADER.size
+            if body_start + body_length > end or json_length > body_length:
+                logger.error(f"Truncated record in {segment} at offset {position}")
+                return
+
+            body = mapped[body_start:body_start + body_length]
+            checked = CHECKED_FIELDS.pack(time_ns, json_length, data_length)
+            if zlib.crc32(body, zlib.crc32(checked)) != crc:
+                logger.error(f"Corrupted record in {segment} at offset {position}")
+                return
+
+            message = json.loads(body[:json_length])
+            data = body[json_length:] if data_length >= 0 else None
+            yield CapturedMessage(time_ns, message, data)
+            position = body_start + body_length
@@ -0,0 +1,88 @@
+import atexit
+import logging
+import threading
+
+from typing import Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+
+class ClientPool:
+    """
+    Process-wide database clients (i.e. MongoClient, Redis) shared by connectors, keyed by endpoint.
+    The clients are thread safe and keep their own connection pools, so every connector of every hooking session
+    writing to the same server shares the same sockets. A client released by its last connector stays open, so
+    the next hook/unhook cycle reuses it; clients are closed by close_idle/close_all (at exit at the latest).
+    """
+
+    def __init__(self):
+        self._clients: Dict[Hashable, object] = dict()
+        self._references: Dict[Hashable, int] = dict()
+        self._keys: Dict[int, Hashable] = dict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: Hashable, factory: Callable[[], object]) -> object:
+        """
+        Borrow the client of an endpoint, creating it on first use
+        :param key: endpoint (i.e. ("mongodb", host, port)), with any option changing the client
+        :param factory: creates the client
+        """
+        with self._lock:
+            client = self._clients.get(key, None)
+            if client is None:
+                client = self._clients[key] = factory()
+                self._references[key] = 0
+                self._keys[id(client)] = key
+            self._references[key] += 1
+            return client
+
+    def release(self, client) -> None:
+        """
+        Give a borrowed client back (the client is not closed)
+        """
+        with self._lock:
+            key = self._keys.get(id(client), None)
+            if key is not None and self._references[key] > 0:
+                self._references[key] -= 1
+
+    def _close(self, key: Hashable) -> None:
+        client = self._clients.pop(key)
+        del self._references[key]
+        del self._keys[id(client)]
+        try:
+            client.close()
+        except Exception as e:
+            logger.error(f"Error closing client {key}: {e}")
+
+    def close_idle(self) -> int:
+        """
+        Close the clients no connector is using
+        :return: number of closed clients
+        """
+        with self._lock:
+            idle = [key for key, references in self._references.items() if not references]
+            for key in idle:
+                self._close(key)
+            return len(idle)
+
+    def close_all(self) -> None:
+        with self._lock:
+            for key in list(self._clients.keys()):
+                self._close(key)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Endpoint -> connectors using its client
+        """
+        with self._lock:
+            return {":".join(str(part) for part in key) if isinstance(key, tuple) else str(key): references
+                    for key, references in self._references.items()}
+
+
+CLIENTS = ClientPool()
+atexit.register(CLIENTS.close_all)
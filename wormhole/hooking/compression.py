@@ -0,0 +1,94 @@
+import time
+import zlib
+
+from typing import Tuple, Union
+
+COMPRESSION_KEY = "compression"
+
+# Supported values of the "compression" flag inside the payload
+INFLATERS = {
+    "zlib": lambda data: zlib.decompress(data),
+    "deflate": lambda data: zlib.decompress(data, -zlib.MAX_WBITS),
+    "gzip": lambda data: zlib.decompress(data, zlib.MAX_WBITS | 16),
+}
+
+
+class PayloadInflater:
+    """
+    Inflate the raw bytes of messages flagged as compressed by the agent ("compression" key in the payload),
+    keeping track of the compression ratio and of the time spent inflating for each module.
+    """
+
+    def __init__(self):
+        self._stats: dict = dict()
+
+    def inflate(self, message: dict, data: Union[bytes, None]) -> Union[bytes, None]:
+        """
+        Return the uncompressed data of the message (data untouched if the message is not compressed)
+        :param message: dictionary containing message info
+        :param data: raw bytes from "send" function
+        """
+        payload = message.get('payload', {})
+        method = payload.get(COMPRESSION_KEY, None) if isinstance(payload, dict) else None
+        if not method or data is None:
+            return data
+
+        try:
+            inflater = INFLATERS[method]
+        except KeyError:
+            raise ValueError(f"Unsupported payload compression: {method}")
+
+        start = time.perf_counter()
+        inflated = inflater(data)
+        elapsed = time.perf_counter() - start
+
+        module = payload.get('type', '')
+        stats = self._stats.get(module, None)
+        if not stats:
+            stats = self._stats[module] = {"messages": 0, "compressed_bytes": 0, "inflated_bytes": 0,
+                                           "inflate_time": 0.0}
+        stats["messages"] += 1
+        stats["compressed_bytes"] += len(data)
+        stats["inflated_bytes"] += len(inflated)
+        stats["inflate_time"] += elapsed
+
+        return inflated
+
+    def stats(self) -> dict:
+        """
+        Per module compression statistics. Batches and binary frames are accounted under their own type.
+        :return: dict module -> {messages, compressed_bytes, inflated_bytes, ratio, inflate_time, avg_inflate_us}
+        """
+        result = dict()
+        for module, stats in list(self._stats.items()):
+            module_stats = dict(stats)
+            module_stats["ratio"] = stats["inflated_bytes"] / stats["compressed_bytes"] \
+                if stats["compressed_bytes"] else 0.0
+            module_stats["avg_inflate_us"] = stats["inflate_time"] / stats["messages"] * 1e6
+            result[module] = module_stats
+        return result
+
+
+def compress_payload(message: dict, data: bytes, method: str = "zlib", level: int = 6) -> Tuple[dict, bytes]:
+    """
+    Compress the raw bytes of a message and flag its payload, as the agent does. Useful for stand-in senders.
+    :param message: dictionary containing message info
+    :param data: raw bytes to compress
+    :param method: one of INFLATERS keys
+    :param level: compression level
+    :return: flagged message and compressed data
+    """
+    if method not in INFLATERS:
+        raise ValueError(f"Unsupported payload compression: {method}")
+
+    if method == "zlib":
+        compressed = zlib.compress(data, level)
+    else:
+        wbits = -zlib.MAX_WBITS if method == "deflate" else zlib.MAX_WBITS | 16
+        compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+        compressed = compressor.compress(data) + compressor.flush()
+
+    flagged = dict(message)
+    flagged['payload'] = dict(message.get('payload', {}))
+    flagged['payload'][COMPRESSION_KEY] = method
+    return flagged, compressed
@@ -1,9 +1,15 @@
+import time
+import threading
 import logging
 import importlib
 
-from typing import List
+from typing import Dict, List, Union
 from flask_socketio import Namespace
 
+from .breaker import CircuitBreaker
+from .fanout import ConnectorWorker, OverflowPolicy, DEFAULT_CONNECTOR_CAPACITY
+from .metrics import ComponentMetrics, PipelineMetrics, ThreadedHistogram
+
 BASE_MODULE = "wormhole.hooking.connectors"
 
 logger = logging.getLogger(__name__)
@@ -18,33 +24,162 @@ class ConnectorManager:
     """
     This is a singleton class that receives processed content from modules and forward it
     to all predefined output sources.
+    Every connector runs behind its own bounded queue and worker thread (except inline ones), with a configurable
+    overflow policy, so a slow output source never slows down the others.
     """
 
-    def __init__(self, connectors_list: List[str], ws: Namespace = None):
-        self._connectors: list = list()
+    def __init__(self,
+                 connectors_list: List[str],
+                 ws: Namespace = None,
+                 policies: Union[Dict[str, Union[OverflowPolicy, str]], None] = None,
+                 capacity: int = DEFAULT_CONNECTOR_CAPACITY,
+                 spill_dir: Union[str, None] = None,
+                 options: Union[Dict[str, dict], None] = None,
+                 data_dir: Union[str, None] = None,
+                 metrics: Union[PipelineMetrics, None] = None):
+        """
+        :param connectors_list: names of the connectors to initialize
+        :param ws: websocket connection with GUI
+        :param policies: connector name -> OverflowPolicy (or its value). Default: block
+        :param capacity: max number of events waiting in each connector queue
+        :param spill_dir: directory of the spill files (spill policy) and spool files (failing connectors)
+        :param options: connector name -> keyword arguments of the connector (i.e. {"redisdb": {"host": ...}})
+        :param data_dir: data directory of the analyzed target (default directory of the file connector)
+        :param metrics: pipeline metrics receiving per connector counters, forward times and end-to-end lags
+        """
+        self._metrics: Union[PipelineMetrics, None] = metrics
+        self._render: Union[ThreadedHistogram, None] = metrics.render if metrics is not None else None
+        self._policies: Dict[str, Union[OverflowPolicy, str]] = policies or {}
+        self._capacity: int = capacity
+        self._spill_dir: Union[str, None] = spill_dir
+        # (connector, its metrics or None)
+        self._inline: list = list()
+        self._workers: List[ConnectorWorker] = list()
+        options = options or {}
         for connector_name in connectors_list:
             try:
                 connector = getattr(
                     importlib.import_module(f".{connector_name}", package=BASE_MODULE),
                     connector_name.capitalize()
                 )
+                kwargs = dict(options.get(connector_name, {}))
+                if connector_name == "file" and data_dir:
+                    kwargs.setdefault("directory", data_dir)
                 if connector_name == "websocket" and ws:
-                    self._connectors.append(connector(ws))
+                    self.add_connector(connector(ws, **kwargs), name=connector_name)
                 else:
-                    self._connectors.append(connector())
+                    self.add_connector(connector(**kwargs), name=connector_name)
             except Exception as e:
                 logger.error(f"Error on connector '{connector_name}': {e}")
 
-    def clean_connectors(self):
+    def _unique_name(self, name: str) -> str:
+        names = {worker.name for worker in self._workers}
+        unique, count = name, 1
+        while unique in names:
+            count += 1
+            unique = f"{name}_{count}"
+        return unique
+
+    def add_connector(self,
+                      connector,
+                      name: Union[str, None] = None,
+                      policy: Union[OverflowPolicy, str, None] = None,
+                      capacity: Union[int, None] = None,
+                      breaker: Union[CircuitBreaker, None] = None) -> None:
+        """
+        Add an already initialized connector (i.e. not created from its name)
+        :param connector: BaseConnector instance
+        :param name: name of the connector in stats (default: lowercase class name)
+        :param policy: overflow policy of its queue (default: the one configured for its name, or block)
+        :param capacity: capacity of its queue (default: the manager one)
+        :param breaker: circuit breaker isolating the connector when it fails (default: CircuitBreaker())
+        """
+        name = name or connector.__class__.__name__.lower()
+
+        # Copy on write: forward may be iterating the lists on another thread
+        if getattr(connector, "inline", False):
+            self._inline = self._inline + [(connector, self._connector_metrics(name))]
+            return
+
+        unique_name = self._unique_name(name)
+        worker = ConnectorWorker(
+            connector,
+            unique_name,
+            policy or self._policies.get(name, OverflowPolicy.BLOCK),
+            capacity or self._capacity,
+            self._spill_dir,
+            breaker,
+            self._connector_metrics(unique_name)
+        )
+        self._workers = self._workers + [worker]
+
+    def remove_connector(self, connector) -> None:
+        """
+        Remove a connector previously added, after delivering its pending events
+        :param connector: BaseConnector instance
+        """
+        self._inline = [(c, metrics) for c, metrics in self._inline if c is not connector]
+        removed = [w for w in self._workers if w.connector is connector]
+        self._workers = [w for w in self._workers if w.connector is not connector]
+        for worker in removed:
+            worker.stop()
+
+    def clean_connectors(self, drain: bool = True, timeout: Union[float, None] = None):
         """
         Empty connectors list
+        :param drain: deliver pending events before stopping connector workers
+        :param timeout: seconds to wait for each connector worker
+        """
+        workers = self._workers
+        self._inline = list()
+        self._workers = list()
+        for worker in workers:
+            worker.stop(drain, timeout)
+
+    def _connector_metrics(self, name: str) -> Union[ComponentMetrics, None]:
+        return self._metrics.connector(name) if self._metrics is not None else None
+
+    def threads(self) -> List[threading.Thread]:
+        """
+        Threads delivering events to the connectors: connector workers and threads of the connectors themselves
         """
-        self._connectors = list()
+        threads = list()
+        for worker in self._workers:
+            threads.append(worker.thread)
+            threads.extend(worker.connector.threads() if hasattr(worker.connector, "threads") else [])
+        for connector, _ in self._inline:
+            threads.extend(connector.threads() if hasattr(connector, "threads") else [])
+        return threads
 
-    def forward(self, content, *args, **kwars) -> None:
+    def stats(self) -> Dict[str, dict]:
         """
-        Take the content from processing modules and forward it to all initialized output sources
-        :param content: processed message to forward
+        Per connector queue depth, lag, throughput and drop counters
         """
-        for connector in self._connectors:
-            connector.forward(content, *args, **kwars)
+        return {worker.name: worker.stats() for worker in self._workers}
+
+    def forward(self, event) -> None:
+        """
+        Take the event published by processing modules and forward it to all initialized output sources
+        :param event: HookEvent to forward
+        """
+        if self._render is not None:
+            event.render_histogram = self._render
+        for connector, metrics in self._inline:
+            if metrics is None:
+                connector.forward(event)
+                continue
+
+            start = time.perf_counter_ns()
+            try:
+                connector.forward(event)
+            except Exception:
+                metrics.errors += 1
+                raise
+            metrics.record(start, event.timestamp)
+
+        workers = self._workers
+        if workers:
+            # Delivered later, on other threads: take a snapshot of objects modules may still modify
+            event.detach()
+            for worker in workers:
+                worker.put(event)
@@ -1,7 +1,184 @@
+import time
+import logging
+import threading
+
+from typing import Dict, List, Union
+
+from ..event import HookEvent
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+
 class BaseConnector:
+    # Inline connectors are called on the publishing thread instead of behind their own queue and worker thread.
+    # Only for connectors whose forward never blocks (i.e. they just hand the event over to another queue).
+    inline: bool = False
 
     def __init__(self):
         pass
 
-    def forward(self, message, *metadata, **content_metadata):
+    def forward(self, event: HookEvent):
+        """
+        Receive an event published by a module. Connectors needing text use event.text() (rendered once per event
+        for all the connectors), the others event.to_dict()/event.metadata().
+        :param event: the published event
+        """
         raise NotImplementedError()
+
+    def forward_many(self, events: List[HookEvent]):
+        """
+        Receive many events at once (i.e. replaying events spooled while the output source was down).
+        Connectors supporting bulk writes override it. It must raise if the events could not be delivered.
+        :param events: published events, in order
+        """
+        for event in events:
+            self.forward(event)
+
+    def close(self):
+        """
+        Release resources (i.e. write buffered events, close files) once no more events will be forwarded
+        """
+        pass
+
+    def threads(self) -> List[threading.Thread]:
+        """
+        Threads of the connector itself (i.e. to profile them)
+        """
+        return list()
+
+
+class BufferedConnector(BaseConnector):
+    """
+    Connector writing events in batches. Encoded events are buffered by key (i.e. destination collection) and a
+    buffer is written when it reaches the batch size, when its oldest item is older than the flush interval, or
+    when the connector is closed.
+    If a write fails the buffer is kept (and written again on the next flush) and the error is raised to the caller,
+    so the circuit breaker of the connector can open. The event being forwarded is not buffered in that case:
+    the caller spools it, so it is never stored twice. Writes of the periodic flush fail on its own thread: until
+    a write succeeds again, forward raises their error, so it reaches the circuit breaker as well.
+    The flush thread starts with the first forwarded event, once subclasses acquired their resources.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float):
+        """
+        :param batch_size: max items written at once
+        :param flush_interval: max seconds an item waits inside a buffer
+        """
+        super(BufferedConnector, self).__init__()
+        if batch_size <= 0:
+            raise ValueError(f"Invalid batch size: {batch_size}")
+
+        self._batch_size: int = batch_size
+        self._flush_interval: float = flush_interval
+        self._buffers: Dict[object, list] = dict()
+        self._oldest: Dict[object, float] = dict()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher: Union[threading.Thread, None] = None
+        self._flush_error: Union[Exception, None] = None
+
+    def _start_flusher(self) -> None:
+        """
+        Start the periodic flush (called with the lock held)
+        """
+        if self._flusher is None and not self._closed.is_set():
+            self._flusher = threading.Thread(target=self._flush_periodically,
+                                             name=f"wormhole-{self.__class__.__name__.lower()}-flush", daemon=True)
+            self._flusher.start()
+
+    def _key(self, event: HookEvent):
+        """
+        Buffer of an event (default: a single buffer)
+        """
+        return None
+
+    def _encode(self, event: HookEvent):
+        """
+        Convert an event to the item written by _write
+        """
+        raise NotImplementedError()
+
+    def _write(self, key, items: list) -> None:
+        """
+        Write a batch of items of the same buffer. It must raise if they were not written.
+        """
+        raise NotImplementedError()
+
+    def forward(self, event: HookEvent):
+        key = self._key(event)
+        with self._lock:
+            if self._flush_error is not None:
+                raise self._flush_error.with_traceback(None)
+            self._start_flusher()
+            buffer = self._buffers.get(key, None)
+            if buffer is None:
+                buffer = self._buffers[key] = list()
+
+            # Flush before buffering: if the write fails the event is not taken
+            if len(buffer) >= self._batch_size:
+                self._flush(key)
+                buffer = self._buffers[key]
+
+            if not buffer:
+                self._oldest[key] = time.monotonic()
+            buffer.append(self._encode(event))
+
+    def forward_many(self, events: List[HookEvent]):
+        with self._lock:
+            items: Dict[object, list] = dict()
+            for event in events:
+                items.setdefault(self._key(event), list()).append(self._encode(event))
+
+            for key, key_items in items.items():
+                # Pending items first, to keep the order inside each buffer
+                self._flush(key)
+                for start in range(0, len(key_items), self._batch_size):
+                    self._write(key, key_items[start:start + self._batch_size])
+            self._flush_error = None
+
+    def _flush(self, key) -> None:
+        buffer = self._buffers.get(key)
+        if buffer:
+            self._write(key, buffer)
+            self._buffers[key] = list()
+            self._flush_error = None
+
+    def flush(self) -> None:
+        """
+        Write all buffers
+        """
+        with self._lock:
+            for key in list(self._buffers.keys()):
+                self._flush(key)
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self._flush_interval / 2):
+            now = time.monotonic()
+            with self._lock:
+                try:
+                    for key in list(self._buffers.keys()):
+                        if self._buffers[key] and now - self._oldest.get(key, now) >= self._flush_interval:
+                            self._flush(key)
+                except Exception as e:
+                    if self._flush_error is None:
+                        logger.error(f"Error flushing buffers of {self.__class__.__name__}: {e}")
+                    self._flush_error = e
+
+    def threads(self) -> List[threading.Thread]:
+        return [self._flusher] if self._flusher else []
+
+    def close(self):
+        """
+        Write pending items
+        """
+        self._closed.set()
+        try:
+            self.flush()
+        except Exception as e:
+            pending = sum(len(buffer) for buffer in self._buffers.values())
+            logger.error(f"Error flushing buffers of {self.__class__.__name__} on close, {pending} items lost: {e}")
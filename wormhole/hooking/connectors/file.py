@@ -1,4 +1,37 @@
-from .base import BaseConnector
+import os
+import re
+import gzip
+import time
+import queue
+import shutil
+import logging
+import tempfile
+import threading
+
+from typing import List, Union
+
+from .base import BufferedConnector
+from ..event import HookEvent
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+DEFAULT_FILENAME = 'hooks.log'
+DEFAULT_BUFFER_LINES = 4096
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+SEPARATOR = "-" * 60 + "\n"
+
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
 
 
 class BColors:
@@ -13,29 +46,154 @@ class BColors:
     UNDERLINE = '\033[4m'
 
     @staticmethod
-    def set_color(forward_function):
-        def wrapper(*args, **kwargs):
-            color = kwargs.get('color', None)
-            if color:
-                message = args[1]
-                final_message = f'{getattr(BColors, color)}{message}{BColors.ENDC}'
-                return forward_function(args[0], final_message, **kwargs)
-            else:
-                return forward_function(*args, **kwargs)
-
-        return wrapper
-
-
-class File(BaseConnector):
-
-    def __init__(self):
-        super(File, self).__init__()
-        self.file = open("/tmp/bo.txt", "a")
-
-    @BColors.set_color
-    def forward(self, message, **kwargs):
-        #with open("/tmp/bo.txt", "a") as file:
-        self.file.write(
-            f"{kwargs.get('timestamp')} [{kwargs.get('tid')}] {kwargs.get('module')}({kwargs.get('function')}): "
-            f"{message}\n"
-            + "-" * 60 + "\n")
+    def colored(event) -> str:
+        """
+        Text of the event, wrapped in its color hint (if any)
+        """
+        if event.color:
+            color = COLORS.get(event.color, None)
+            if color is None:
+                raise ValueError(f"Unknown color '{event.color}' of {event.module}({event.function}) event, "
+                                 f"expected one of {sorted(COLORS)}")
+            return f'{color}{event.text()}{BColors.ENDC}'
+        return event.text()
+
+    @staticmethod
+    def strip(text: str) -> str:
+        """
+        Text without ANSI color sequences
+        """
+        return ANSI_ESCAPE.sub('', text)
+
+
+# Color hints of the events: names of the BColors sequences
+COLORS = {name: value for name, value in vars(BColors).items() if name.isupper() and isinstance(value, str)}
+
+
+def _compress_gzip(path: str) -> str:
+    compressed = f"{path}.gz"
+    with open(path, "rb") as source, gzip.open(compressed, "wb") as destination:
+        shutil.copyfileobj(source, destination)
+    return compressed
+
+
+def _compress_zstd(path: str) -> str:
+    compressed = f"{path}.zst"
+    with open(path, "rb") as source, open(compressed, "wb") as destination:
+        zstandard.ZstdCompressor().copy_stream(source, destination)
+    return compressed
+
+
+COMPRESSORS = {
+    "gzip": _compress_gzip,
+    "zstd": _compress_zstd,
+}
+
+
+class File(BufferedConnector):
+    """
+    Write events as text lines to a file (by default inside the data directory of the analyzed target).
+    Lines are buffered and written with a single write every buffer_lines events or flush_interval seconds.
+    When the file grows over max_bytes (or is older than max_age seconds) it is rotated: it is renamed to
+    '<name>.<yyyymmdd-hhmmss>.<n>' and, if a compression is set, compressed by a background thread (the
+    uncompressed segment is removed once compressed).
+    """
+
+    def __init__(self,
+                 directory: Union[str, None] = None,
+                 filename: str = DEFAULT_FILENAME,
+                 colors: bool = True,
+                 buffer_lines: int = DEFAULT_BUFFER_LINES,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_bytes: Union[int, None] = DEFAULT_MAX_BYTES,
+                 max_age: Union[float, None] = None,
+                 compression: Union[str, None] = "gzip"):
+        """
+        :param directory: directory of the file (default: temporary directory)
+        :param filename: name of the file
+        :param colors: keep the ANSI color sequences of the events
+        :param buffer_lines: events written with a single write
+        :param flush_interval: max seconds an event waits before being written
+        :param max_bytes: size rotating the file (None to never rotate by size)
+        :param max_age: seconds rotating the file (None to never rotate by time)
+        :param compression: compression of rotated segments ("gzip", "zstd" or None)
+        """
+        if compression is not None and compression not in COMPRESSORS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the 'zstandard' package")
+
+        super(File, self).__init__(buffer_lines, flush_interval)
+        directory = directory or tempfile.gettempdir()
+        os.makedirs(directory, exist_ok=True)
+        self.path: str = os.path.join(directory, filename)
+        self._colors: bool = colors
+        self._max_bytes: Union[int, None] = max_bytes
+        self._max_age: Union[float, None] = max_age
+        self._compression: Union[str, None] = compression
+        self._segments: int = 0
+        self._file = None
+        self._size: int = 0
+        self._opened: float = 0.0
+        self._open()
+
+        self._compressions: queue.Queue = queue.Queue()
+        self._compressor: Union[threading.Thread, None] = None
+        if compression:
+            self._compressor = threading.Thread(target=self._compress_segments, name="wormhole-file-compress",
+                                                daemon=True)
+            self._compressor.start()
+
+    def _open(self) -> None:
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        self._opened = time.monotonic()
+
+    def _encode(self, event: HookEvent) -> str:
+        text = BColors.colored(event) if self._colors else BColors.strip(event.text())
+        return f"{event.formatted_timestamp()} [{event.tid}] {event.module}({event.function}): {text}\n{SEPARATOR}"
+
+    def _write(self, key, lines: List[str]) -> None:
+        self._file.write("".join(lines))
+        self._file.flush()
+        self._size = self._file.tell()
+
+        if (self._max_bytes and self._size >= self._max_bytes) or \
+                (self._max_age and time.monotonic() - self._opened >= self._max_age):
+            self._rotate()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._segments += 1
+        segment = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}.{self._segments}"
+        os.replace(self.path, segment)
+        self._open()
+        if self._compression:
+            self._compressions.put(segment)
+
+    def _compress_segments(self) -> None:
+        while True:
+            segment = self._compressions.get()
+            if segment is None:
+                return
+            try:
+                COMPRESSORS[self._compression](segment)
+                os.remove(segment)
+            except Exception as e:
+                logger.error(f"Error compressing '{segment}': {e}")
+
+    def threads(self) -> List[threading.Thread]:
+        threads = super(File, self).threads()
+        if self._compressor:
+            threads.append(self._compressor)
+        return threads
+
+    def close(self) -> None:
+        """
+        Write pending lines, close the file and wait for the compression of rotated segments
+        """
+        super(File, self).close()
+        self._file.close()
+        if self._compressor:
+            self._compressions.put(None)
+            self._compressor.join()
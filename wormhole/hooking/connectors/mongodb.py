@@ -1,35 +1,113 @@
+import logging
+
+from typing import List
+
+from bson import encode as bson_encode
+from bson.errors import InvalidDocument
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+
+from .base import BufferedConnector
+from ..clients import CLIENTS
+from ..event import HookEvent
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 27017
+DEFAULT_DATABASE = 'test_db'
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_SERVER_TIMEOUT_MS = 2000
+
+DUPLICATE_KEY_ERROR = 11000
 
-from .base import BaseConnector
 
+class Mongodb(BufferedConnector):
+    """
+    Store events inside one collection per module (created on demand by MongoDB).
+    Documents are buffered per collection and written with unordered insert_many (see BufferedConnector).
+    Their _id is assigned on the first attempt, so documents already stored by a partially failed write are
+    recognized as duplicates and not stored twice when the buffer is written again.
+    Documents BSON cannot encode are counted as rejected and dropped, the rest of their batch is written.
+    The MongoClient of an endpoint is shared by all the connectors of the process (see ClientPool).
+    """
 
-class Mongodb(BaseConnector):
+    def __init__(self,
+                 host: str = DEFAULT_HOST,
+                 port: int = DEFAULT_PORT,
+                 database: str = DEFAULT_DATABASE,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        """
+        :param host: MongoDB host
+        :param port: MongoDB port
+        :param database: database of the collections
+        :param batch_size: documents per collection written with a single insert_many
+        :param flush_interval: max seconds a document waits inside a buffer
+        """
+        super(Mongodb, self).__init__(batch_size, flush_interval)
+        self.mongo_client = CLIENTS.acquire(
+            ("mongodb", host, port),
+            lambda: MongoClient(host, port, serverSelectionTimeoutMS=DEFAULT_SERVER_TIMEOUT_MS)
+        )
+        self.db = self.mongo_client[database]
+        self._collections: dict = dict()
+        self.inserted: int = 0
+        self.rejected: int = 0
 
-    # TODO: create buffers of messages by plugin and load them when reached max capacity
-    #  (instead of insert 1 doc each request)
+    def _collection(self, name: str):
+        collection = self._collections.get(name, None)
+        if collection is None:
+            collection = self._collections[name] = self.db[name]
+        return collection
 
-    def __init__(self):
-        super(Mongodb, self).__init__()
-        self.mongo_client = MongoClient('127.0.0.1', 27017)
-        print(self.mongo_client)
-        self.db = self.mongo_client.test_db
-        print(self.db)
-        print(self.db.list_collection_names())
+    def _key(self, event: HookEvent) -> str:
+        return event.module
+
+    def _encode(self, event: HookEvent) -> dict:
+        return event.to_dict()
+
+    def _write(self, name: str, documents: List[dict]) -> None:
+        try:
+            self._insert(name, documents)
+        except (InvalidDocument, OverflowError) as e:
+            # Raised while encoding: kept, the batch would fail again on every write. Documents of it already
+            # sent are recognized as duplicates
+            valid = [document for document in documents if self._encodable(document)]
+            self.rejected += len(documents) - len(valid)
+            logger.error(f"{len(documents) - len(valid)} documents of collection '{name}' not encodable: {e}")
+            if valid:
+                self._insert(name, valid)
+
+    @staticmethod
+    def _encodable(document: dict) -> bool:
         try:
-            self.db.create_collection('network')
-            self.db.create_collection('xpc')
-            self.db.create_collection('io')
-            self.db.create_collection('sqlite')
-            self.db.create_collection('notifications')
-            print(self.db.list_collection_names())
-        except:
-            pass
-
-    def forward(self, message, **kwargs):
+            bson_encode(document)
+        except (InvalidDocument, OverflowError):
+            return False
+        return True
+
+    def _insert(self, name: str, documents: List[dict]) -> None:
         try:
-            document = message.to_dict()
-            # document.update(kwargs)
-            # del document['plugin']
-            self.db[kwargs.get('plugin')].insert_one(document)
-        except Exception as e:
-            print(e)
+            self.inserted += len(self._collection(name).insert_many(documents, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            # Server reachable but some documents refused: duplicates were already stored by a previous attempt
+            errors = e.details.get('writeErrors', [])
+            rejected = sum(1 for error in errors if error.get('code') != DUPLICATE_KEY_ERROR)
+            self.inserted += e.details.get('nInserted', 0)
+            self.rejected += rejected
+            if rejected:
+                logger.error(f"{rejected} documents refused by collection '{name}': {errors[0].get('errmsg')}")
+
+    def close(self) -> None:
+        """
+        Write pending documents and give the client back to the pool
+        """
+        super(Mongodb, self).close()
+        CLIENTS.release(self.mongo_client)
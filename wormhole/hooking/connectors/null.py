@@ -0,0 +1,24 @@
+from .base import BaseConnector
+
+
+class Null(BaseConnector):
+    """
+    Discard events, only counting them (i.e. to benchmark modules without any output cost).
+    With render, the text of every event is rendered as a text connector would do.
+    """
+
+    # Nothing can block: no need for a queue and a worker thread
+    inline: bool = True
+
+    def __init__(self, render: bool = False):
+        """
+        :param render: render the text of every event
+        """
+        super(Null, self).__init__()
+        self._render: bool = render
+        self.count: int = 0
+
+    def forward(self, event):
+        if self._render:
+            event.text()
+        self.count += 1
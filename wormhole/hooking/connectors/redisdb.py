@@ -1,20 +1,117 @@
+import json
+import logging
+
+from typing import List, Union
+
 from redis import Redis
+from redis.retry import Retry
+from redis.backoff import NoBackoff
+
+from .base import BufferedConnector
+from ..clients import CLIENTS
+from ..event import HookEvent
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 6379
+DEFAULT_DB = 0
+DEFAULT_STREAM_PREFIX = 'wormhole:'
+DEFAULT_MAXLEN = 100000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 0.2
+DEFAULT_SOCKET_TIMEOUT = 2.0
+
+
+class Redisdb(BufferedConnector):
+    """
+    Append events to one Redis Stream per module ('<prefix><module>') with XADD, capped to about maxlen entries
+    (approximate trimming, so Redis trims whole macro nodes cheaply).
+    Entries are buffered per stream (see BufferedConnector) and sent with a non transactional pipeline: one round
+    trip per batch. Every field is a separate stream field, binary data is stored as raw bytes:
+        - timestamp, tid, module, function, session (if any)
+        - text: the event rendered as text
+        - document: JSON of the structured event (without data)
+        - data: raw bytes attached to the event (if any)
+    Fields without a value (None, i.e. events without tid) are left out: Redis has no null value.
+    Delivery is at least once: if the connection drops in the middle of a pipeline, the entries already appended
+    are appended again when the buffer is written again.
+    The Redis client (and its connection pool) of an endpoint is shared by all the connectors of the process
+    (see ClientPool).
+    """
+
+    def __init__(self,
+                 host: str = DEFAULT_HOST,
+                 port: int = DEFAULT_PORT,
+                 db: int = DEFAULT_DB,
+                 stream_prefix: str = DEFAULT_STREAM_PREFIX,
+                 maxlen: Union[int, None] = DEFAULT_MAXLEN,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        """
+        :param host: Redis host
+        :param port: Redis port
+        :param db: Redis database
+        :param stream_prefix: prefix of the stream names
+        :param maxlen: approximate max entries per stream (None to never trim)
+        :param batch_size: entries per stream sent with a single pipeline
+        :param flush_interval: max seconds an entry waits inside a buffer
+        """
+        super(Redisdb, self).__init__(batch_size, flush_interval)
+        # No retries inside the client: failures are left to the connector circuit breaker.
+        # RESP2 is enough for XADD replies and spares the HELLO handshake.
+        self.redis = CLIENTS.acquire(
+            ("redis", host, port, db),
+            lambda: Redis(host=host,
+                          port=port,
+                          db=db,
+                          protocol=2,
+                          socket_timeout=DEFAULT_SOCKET_TIMEOUT,
+                          socket_connect_timeout=DEFAULT_SOCKET_TIMEOUT,
+                          retry=Retry(NoBackoff(), 0))
+        )
+        self._stream_prefix: str = stream_prefix
+        self._maxlen: Union[int, None] = maxlen
+        self.appended: int = 0
 
-from .base import BaseConnector
+    def _key(self, event: HookEvent) -> str:
+        return f"{self._stream_prefix}{event.module}"
 
+    def _encode(self, event: HookEvent) -> dict:
+        fields = {
+            "timestamp": event.timestamp,
+            "tid": event.tid,
+            "module": event.module,
+            "function": event.function,
+            "text": event.text(),
+        }
+        for name in [name for name, value in fields.items() if value is None]:
+            del fields[name]
+        if event.session:
+            fields["session"] = event.session
 
-class Redisdb(BaseConnector):
+        document = event.to_dict()
+        document.pop("data", None)
+        fields["document"] = json.dumps(document, default=str)
+        if event.data is not None:
+            fields["data"] = bytes(event.data)
+        return fields
 
-    def __init__(self):
-        super(Redisdb, self).__init__()
-        self.redis = Redis(host="127.0.0.1",
-                           port=6379,
-                           db=0,
-                           decode_responses=True)
+    def _write(self, stream: str, entries: List[dict]) -> None:
+        pipeline = self.redis.pipeline(transaction=False)
+        for fields in entries:
+            pipeline.xadd(stream, fields, maxlen=self._maxlen, approximate=True)
+        pipeline.execute()
+        self.appended += len(entries)
 
-    def forward(self, message, *metadata, **content_metadata):
-        final_message = ";~".join(list(metadata))
-        final_message += f";~{message}"
-        for _, v in content_metadata.items():
-            final_message += f";~{v}"
-        self.redis.publish("prova", final_message)
+    def close(self) -> None:
+        """
+        Write pending entries and give the client back to the pool
+        """
+        super(Redisdb, self).close()
+        CLIENTS.release(self.redis)
@@ -6,6 +6,6 @@ class Stdout(BaseConnector):
     def __init__(self):
         super(Stdout, self).__init__()
 
-    def forward(self, message, **kwargs):
-        print(f"{kwargs.get('timestamp')} [{kwargs.get('tid')}] "
-              f"{kwargs.get('module')}({kwargs.get('function')}): {message}\n" + "-" * 60 + "\n")
+    def forward(self, event):
+        print(f"{event.formatted_timestamp()} [{event.tid}] "
+              f"{event.module}({event.function}): {event.text()}\n" + "-" * 60 + "\n")
@@ -1,23 +1,268 @@
-from .base import BaseConnector
+import functools
+import threading
 
+from typing import Dict, Iterable, List, Union
 
-class Websocket(BaseConnector):
+from flask import request
+from flask_socketio import Namespace
 
-    def __init__(self, ws):
-        super(Websocket, self).__init__()
+from .base import BufferedConnector
+from ..event import HookEvent
+
+DEFAULT_FRAME_SIZE = 500
+DEFAULT_FRAME_INTERVAL = 0.05
+
+
+class Subscription:
+    """
+    Events a GUI client wants: an event matches if its module, its symbol and its tid are in the given sets
+    (a missing set matches anything)
+    """
+
+    __slots__ = ("modules", "symbols", "tids")
+
+    def __init__(self,
+                 modules: Union[Iterable[str], None] = None,
+                 symbols: Union[Iterable[str], None] = None,
+                 tids: Union[Iterable[int], None] = None):
+        """
+        :param modules: module names (i.e. 'network')
+        :param symbols: hooked functions
+        :param tids: thread ids
+        """
+        self.modules: Union[frozenset, None] = frozenset(modules) if modules is not None else None
+        self.symbols: Union[frozenset, None] = frozenset(symbols) if symbols is not None else None
+        self.tids: Union[frozenset, None] = frozenset(int(tid) for tid in tids) if tids is not None else None
+
+    @classmethod
+    def from_request(cls, request_data) -> 'Subscription':
+        """
+        :param request_data: {"modules": [...], "symbols": [...], "tids": [...]}, every key is optional
+        """
+        if not isinstance(request_data, dict):
+            raise ValueError(f"Invalid subscription: {request_data}")
+
+        sets = dict()
+        for name in cls.__slots__:
+            values = request_data.get(name, None)
+            if isinstance(values, (str, int)):
+                values = [values]
+            if values is not None and not isinstance(values, list):
+                raise ValueError(f"Invalid subscription {name}: {values}")
+            sets[name] = values
+        return cls(**sets)
+
+    def matches(self, message: dict) -> bool:
+        """
+        Symbol and tid check (modules are matched by the index)
+        """
+        return (self.symbols is None or message["function"] in self.symbols) and \
+            (self.tids is None or message["tid"] in self.tids)
+
+    def to_dict(self) -> dict:
+        return {name: sorted(getattr(self, name)) if getattr(self, name) is not None else None
+                for name in self.__slots__}
+
+
+class SubscriptionIndex:
+    """
+    Subscriptions of the GUI clients indexed by module, so routing an event only looks at the clients that may want
+    it. The index is rebuilt when a client (un)subscribes and swapped atomically: routing never takes a lock.
+    """
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Subscription] = dict()
+        self._lock = threading.Lock()
+        # module -> clients subscribed to it or to every module, and clients subscribed to every module
+        self._by_module: Dict[str, list] = dict()
+        self._any_module: list = list()
+        self._sids: list = list()
+
+    @property
+    def sids(self) -> list:
+        return self._sids
+
+    def subscribe(self, sid: str, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions[sid] = subscription
+            self._rebuild()
+
+    def unsubscribe(self, sid: str) -> bool:
+        """
+        :return: true if the client was subscribed
+        """
+        with self._lock:
+            if self._subscriptions.pop(sid, None) is None:
+                return False
+            self._rebuild()
+            return True
+
+    def _rebuild(self) -> None:
+        any_module = [(sid, subscription) for sid, subscription in self._subscriptions.items()
+                      if subscription.modules is None]
+        by_module: Dict[str, list] = dict()
+        for sid, subscription in self._subscriptions.items():
+            for module in subscription.modules or ():
+                by_module.setdefault(module, list()).append((sid, subscription))
+        for module in by_module:
+            by_module[module].extend(any_module)
+
+        self._by_module, self._any_module, self._sids = by_module, any_module, list(self._subscriptions)
+
+    def route(self, messages: List[dict]) -> Dict[str, list]:
+        """
+        :param messages: messages of a frame
+        :return: the messages to send to every subscribed client (clients without matching messages are left out)
+        """
+        by_module, any_module = self._by_module, self._any_module
+        frames: Dict[str, list] = dict()
+        for message in messages:
+            for sid, subscription in by_module.get(message["module"], any_module):
+                if subscription.matches(message):
+                    frame = frames.get(sid, None)
+                    if frame is None:
+                        frame = frames[sid] = list()
+                    frame.append(message)
+        return frames
+
+
+# Namespaces keep (their subscriptions, Websocket connectors using them, 'disconnect' handler set before) inside
+# their 'subscription_registration' attribute
+_namespaces_lock = threading.Lock()
+
+
+def _on_subscribe(subscriptions: SubscriptionIndex, request_data) -> dict:
+    try:
+        subscription = Subscription.from_request(request_data)
+    except (ValueError, TypeError) as e:
+        return {"error": str(e)}
+    subscriptions.subscribe(request.sid, subscription)
+    return subscription.to_dict()
+
+
+def _on_unsubscribe(subscriptions: SubscriptionIndex, *args) -> bool:
+    return subscriptions.unsubscribe(request.sid)
+
+
+def _on_disconnect(subscriptions: SubscriptionIndex, original_disconnect, *args):
+    subscriptions.unsubscribe(request.sid)
+    if original_disconnect:
+        return original_disconnect(*args)
+
+
+def register_subscriptions(ws: Namespace) -> SubscriptionIndex:
+    """
+    Subscriptions of the GUI clients of a namespace. Many Websocket connectors may share the same namespace
+    (i.e. many Cores with the same GUI): the first one adds the 'subscribe', 'unsubscribe' and 'disconnect' handlers
+    to the namespace, the last one released removes them.
+    :param ws: websocket namespace with GUI
+    :return: the subscriptions of the namespace
+    """
+    with _namespaces_lock:
+        registered = ws.__dict__.get("subscription_registration", None)
+        if registered is not None:
+            subscriptions, users, previous_disconnect = registered
+            ws.subscription_registration = (subscriptions, users + 1, previous_disconnect)
+            return subscriptions
+
+        subscriptions = SubscriptionIndex()
+        previous_disconnect = ws.__dict__.get("on_disconnect", None)
+        ws.on_subscribe = functools.partial(_on_subscribe, subscriptions)
+        ws.on_unsubscribe = functools.partial(_on_unsubscribe, subscriptions)
+        ws.on_disconnect = functools.partial(_on_disconnect, subscriptions, getattr(ws, "on_disconnect", None))
+        ws.subscription_registration = (subscriptions, 1, previous_disconnect)
+        return subscriptions
+
+
+def release_subscriptions(ws: Namespace) -> None:
+    """
+    Release the subscriptions of a namespace taken with register_subscriptions
+    """
+    with _namespaces_lock:
+        registered = ws.__dict__.get("subscription_registration", None)
+        if registered is None:
+            return
+        subscriptions, users, previous_disconnect = registered
+        if users > 1:
+            ws.subscription_registration = (subscriptions, users - 1, previous_disconnect)
+            return
+
+        del ws.subscription_registration
+        for name in ("on_subscribe", "on_unsubscribe", "on_disconnect"):
+            ws.__dict__.pop(name, None)
+        if previous_disconnect is not None:
+            ws.on_disconnect = previous_disconnect
+
+
+class Websocket(BufferedConnector):
+    """
+    Send events to the GUI coalesced into frames: a 'messages' event carrying {"data": [message, ...]} is emitted
+    when the frame reaches frame_size events or when its oldest event is older than frame_interval seconds.
+    GUI clients reading one 'message' event carrying {"data": message} per event are served with legacy=True
+    (options={"websocket": {"legacy": True}}), at the cost of one emit per event.
+    Either way emits happen on the connector worker and flush threads, never on the thread receiving Frida messages.
+    Every message is the event text plus its metadata; raw bytes attached to the event are sent as a binary
+    attachment in 'data' (a bytes/ArrayBuffer, not their repr).
+    Clients receive every event until they emit 'subscribe' with {"modules": [...], "symbols": [...], "tids": [...]}
+    (every key is optional); from then on they only receive matching events, until they emit 'unsubscribe' or
+    disconnect. Subscriptions belong to the namespace, shared by its Websocket connectors (see
+    register_subscriptions).
+    """
+
+    def __init__(self,
+                 ws: Namespace,
+                 frame_size: int = DEFAULT_FRAME_SIZE,
+                 frame_interval: float = DEFAULT_FRAME_INTERVAL,
+                 legacy: bool = False):
+        """
+        :param ws: websocket connection with GUI
+        :param frame_size: max events per frame
+        :param frame_interval: max seconds an event waits before its frame is emitted
+        :param legacy: emit one 'message' event per event instead of 'messages' frames
+        """
+        super(Websocket, self).__init__(frame_size, frame_interval)
         self.ws = ws
-        self.count = 0
+        self.legacy: bool = legacy
+        self.count: int = 0
+        self.frames: int = 0
+        self.subscriptions: SubscriptionIndex = register_subscriptions(ws)
+        self._registered: bool = True
+
+    def _encode(self, event: HookEvent) -> dict:
+        message = {"message": event.text()}
+        message.update(event.metadata())
+        if event.data is not None:
+            message["data"] = bytes(event.data)
+        return message
+
+    def _write(self, key, messages: List[dict]) -> None:
+        subscribed = self.subscriptions.sids
+        if not subscribed:
+            self._emit(messages)
+        else:
+            # Whole frame to the clients without a subscription, the matching messages to the others
+            self._emit(messages, skip_sid=subscribed)
+            for sid, frame in self.subscriptions.route(messages).items():
+                self._emit(frame, room=sid)
+        self.count += len(messages)
+        self.frames += 1
+
+    def _emit(self, messages: List[dict], room: Union[str, None] = None, skip_sid: Union[list, None] = None) -> None:
+        if skip_sid is not None:
+            emit = functools.partial(self.ws.socketio.emit, namespace=self.ws.namespace, skip_sid=skip_sid)
+        else:
+            emit = functools.partial(self.ws.emit, room=room)
+        if self.legacy:
+            for message in messages:
+                emit("message", {"data": message})
+        else:
+            emit("messages", {"data": messages})
 
-    def forward(self, message, *args, **kwargs):
+    def close(self) -> None:
         """
-        final_message = ";~".join(list(metadata))
-        final_message += f";~{message}"
-        for _, v in content_metadata.items():
-            final_message += f";~{v}"
+        Send pending frames and release the subscriptions of the namespace
         """
-        message_dict = {"message": str(message)}
-        message_dict.update(kwargs)
-        #del message_dict['function']
-        self.ws.emit("message", {"data": message_dict})
-        self.count = self.count + 1
-        print("WS:", self.count)
+        super(Websocket, self).close()
+        if self._registered:
+            self._registered = False
+            release_subscriptions(self.ws)
@@ -0,0 +1,64 @@
+import time
+
+from typing import Union
+
+from .batch import is_batch, iter_batch
+from .framing import FrameDecoder, FRAMES_TYPE, REGISTRY_TYPE
+from .compression import PayloadInflater
+from .metrics import PipelineMetrics
+
+
+class MessageDispatcher:
+    """
+    Hand the raw messages of the agent over to the modules: compressed data is inflated first, batches are fanned
+    out to the modules one event at a time, binary frames are decoded with the registry previously sent by the
+    agent (the JSON payload is the fallback).
+    Used by Core on the ingestion consumer thread and by Replay on recorded messages.
+    """
+
+    def __init__(self, modules_manager, metrics: Union[PipelineMetrics, None] = None):
+        """
+        :param modules_manager: receives the single messages (process_message) and decoded frames (process_decoded)
+        :param metrics: pipeline metrics receiving the decode time of compressed data, frames and batches
+                        (time spent inside the modules excluded)
+        """
+        self._modules_manager = modules_manager
+        self._metrics: Union[PipelineMetrics, None] = metrics
+        self.frame_decoder: FrameDecoder = FrameDecoder()
+        self.inflater: PayloadInflater = PayloadInflater()
+
+    def dispatch(self, message: dict, data: bytes) -> None:
+        """
+        :param message: dictionary containing message info
+        :param data: raw bytes from "send" function
+        """
+        metrics = self._metrics
+        if metrics is None:
+            self._dispatch(message, data)
+            return
+
+        start, processing = time.perf_counter_ns(), metrics.processing_ns
+        decoding = self._dispatch(message, data)
+        if decoding:
+            metrics.decode.record(time.perf_counter_ns() - start - (metrics.processing_ns - processing))
+
+    def _dispatch(self, message: dict, data: bytes) -> bool:
+        """
+        :return: true if the message needed decoding (compressed, frames or batch)
+        """
+        inflated = self.inflater.inflate(message, data)
+        decoding = inflated is not data
+        data = inflated
+        msg_type = message.get('payload', {}).get('type', '') if message.get('type', '') == 'send' else ''
+        if msg_type == FRAMES_TYPE:
+            for decoded in self.frame_decoder.decode(data):
+                self._modules_manager.process_decoded(decoded)
+        elif msg_type == REGISTRY_TYPE:
+            self.frame_decoder.load_registry(message['payload'])
+        elif is_batch(message):
+            for event, event_data in iter_batch(message, data):
+                self._modules_manager.process_message(event, event_data)
+        else:
+            self._modules_manager.process_message(message, data)
+            return decoding
+        return True
@@ -0,0 +1,227 @@
+import time
+import logging
+
+from datetime import datetime
+from typing import Callable, Union
+
+from .metrics import ThreadedHistogram
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+TIMESTAMP_CACHE_SIZE = 1024
+
+
+class TimestampFormatter:
+    """
+    Format agent timestamps (milliseconds) as strings, caching the recent ones: events come in bursts inside the
+    same millisecond, so most of them reuse a cached string.
+    A single formatter is shared by every thread rendering events (ingestion consumer, connector workers), each one
+    at its own point of the stream. The cache is a dict, whose single operations are atomic, holding the latest
+    timestamps and replaced when full: threads lagging behind each other do not evict each other's entry.
+    """
+    __slots__ = ("_cache", "_capacity")
+
+    def __init__(self, capacity: int = TIMESTAMP_CACHE_SIZE):
+        """
+        :param capacity: max cached timestamps
+        """
+        self._cache: dict = dict()
+        self._capacity: int = capacity
+
+    def format(self, timestamp) -> str:
+        formatted = self._cache.get(timestamp, None)
+        if formatted is None:
+            formatted = str(datetime.fromtimestamp((timestamp / 1000)))
+            if len(self._cache) >= self._capacity:
+                self._cache = {timestamp: formatted}
+            else:
+                self._cache[timestamp] = formatted
+        return formatted
+
+
+# Shared by every session and every rendering thread of the process
+_timestamps = TimestampFormatter()
+
+# Templates that already failed: logged once, they may fail for every event of a symbol
+_failed_templates: set = set()
+
+
+def _log_render_error(module: str, template, error: Exception) -> None:
+    key = (module, template if isinstance(template, str) else getattr(template, "__qualname__", repr(template)))
+    if key not in _failed_templates:
+        _failed_templates.add(key)
+        logger.warning(f"Error rendering an event of {module} ({key[1]}), rendered raw: {error!r}")
+
+
+class HookEvent:
+    """
+    Structured event published by a module: connectors receive it as it is and pick the representation they need.
+        - text(): human-readable line, rendered on first use and cached for all the connectors. A template that
+                  does not fit the event (i.e. fewer args than expected) falls back to a raw rendering, so a
+                  malformed agent message never fails the connectors
+        - metadata(): timestamp, thread, module, function, tid, color and session
+        - to_dict(): document with the structured fields, the binary data and the metadata
+
+    An event carries either a content object (i.e. a network Request, rendered with str) or a template, that is a
+    str.format string (or a function of the event) rendered with symbol, args, ret and the module fields.
+    The render time is recorded into the histogram of the event's pipeline, set by its ConnectorManager (not pickled:
+    it belongs to the pipeline of this process).
+    """
+    __slots__ = ("timestamp", "tid", "module", "function", "args", "ret", "fields", "content", "template", "data",
+                 "color", "session", "_text", "_document", "render_histogram")
+
+    def __init__(self,
+                 timestamp,
+                 tid,
+                 module: str,
+                 function: str,
+                 args: Union[list, None] = None,
+                 ret=None,
+                 fields: Union[dict, None] = None,
+                 content=None,
+                 template: Union[str, Callable[['HookEvent'], str], None] = None,
+                 data: Union[bytes, None] = None,
+                 color: Union[str, None] = None,
+                 session: Union[str, None] = None):
+        """
+        :param timestamp: agent timestamp (milliseconds)
+        :param tid: thread ID
+        :param module: module publishing the event
+        :param function: hooked symbol
+        :param args: input arguments of the hooked function
+        :param ret: return value of the hooked function
+        :param fields: other structured fields computed by the module
+        :param content: object published by the module, used when there is no template
+        :param template: str.format template or function(event) -> str
+        :param data: raw bytes attached to the event
+        :param color: color hint for text connectors (BColors attribute name)
+        :param session: session of the event, when many sessions share the same connectors
+        """
+        self.timestamp = timestamp
+        self.tid = tid
+        self.module: str = module
+        self.function: str = function
+        self.args = args
+        self.ret = ret
+        self.fields: dict = fields or {}
+        self.content = content
+        self.template = template
+        self.data: Union[bytes, None] = data
+        self.color: Union[str, None] = color
+        self.session: Union[str, None] = session
+        self._text: Union[str, None] = None
+        self._document: Union[dict, None] = None
+        self.render_histogram: Union[ThreadedHistogram, None] = None
+
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, name) for name in _PICKLED_SLOTS)
+
+    def __setstate__(self, state: tuple) -> None:
+        for name, value in zip(_PICKLED_SLOTS, state):
+            setattr(self, name, value)
+        self.render_histogram = None
+
+    def text(self) -> str:
+        """
+        Human-readable representation of the event, rendered once
+        """
+        if self._text is None:
+            start = time.perf_counter_ns()
+            try:
+                if self.template is None:
+                    self._text = self.content if isinstance(self.content, str) else str(self.content)
+                elif isinstance(self.template, str):
+                    self._text = self.template.format(symbol=self.function, args=self.args, ret=self.ret,
+                                                      **self.fields)
+                else:
+                    self._text = self.template(self)
+            except Exception as e:
+                self._text = self._raw_text()
+                _log_render_error(self.module, self.template, e)
+            if self.render_histogram is not None:
+                self.render_histogram.record(time.perf_counter_ns() - start)
+        return self._text
+
+    def _raw_text(self) -> str:
+        args = ", ".join(str(arg) for arg in self.args) if isinstance(self.args, (list, tuple)) else self.args
+        return f"{self.function}({args}) -> {self.ret}"
+
+    def formatted_timestamp(self) -> str:
+        return _timestamps.format(self.timestamp)
+
+    def metadata(self) -> dict:
+        """
+        Metadata of the event as flat strings/numbers, the way text connectors print them
+        """
+        metadata = {
+            "timestamp": self.formatted_timestamp(),
+            "thread": str(self.tid),
+            "module": self.module,
+            "function": self.function,
+            "tid": self.tid,
+        }
+        if self.color:
+            metadata["color"] = self.color
+        if self.session:
+            metadata["session"] = self.session
+        return metadata
+
+    def to_dict(self) -> dict:
+        """
+        Document representing the event: structured fields when the module provides them, otherwise the content
+        (its own to_dict if it has one, its text if not)
+        """
+        document = {
+            "timestamp": self.timestamp,
+            "tid": self.tid,
+            "module": self.module,
+            "function": self.function,
+        }
+        if self.session:
+            document["session"] = self.session
+
+        if self.template is not None:
+            document["args"] = self.args
+            document["ret"] = self.ret
+            document.update(self.fields)
+        else:
+            document.update(self._content_document())
+
+        if self.data is not None:
+            document["data"] = self.data
+        return document
+
+    def _content_document(self) -> dict:
+        if self._document is None:
+            if hasattr(self.content, "to_dict"):
+                self._document = self.content.to_dict()
+            elif isinstance(self.content, (str, int, float, bool, list, dict)) or self.content is None:
+                self._document = {"content": self.content}
+            else:
+                self._document = {"content": self.text()}
+        return self._document
+
+    def detach(self) -> 'HookEvent':
+        """
+        Make the event independent of the objects published by modules, that may still change afterwards
+        (i.e. a sqlite Query is reset and bound again): their text and document are taken now.
+        Templated events are left untouched, they keep rendering on demand.
+        Needed before handing the event over to another thread or process.
+        :return: the event itself
+        """
+        if self.template is None and self.content is not None and not isinstance(self.content, str):
+            self.text()
+            self._content_document()
+            self.content = None
+        return self
+
+    def __repr__(self):
+        return f"{self.formatted_timestamp()} [{self.tid}] {self.module}({self.function}): {self.text()}"
+
+
+_PICKLED_SLOTS = tuple(name for name in HookEvent.__slots__ if name != "render_histogram")
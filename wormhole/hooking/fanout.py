@@ -0,0 +1,497 @@
+import os
+import time
+import pickle
+import struct
+import logging
+import tempfile
+import threading
+
+from enum import Enum
+from collections import deque
+from typing import Union
+
+from .breaker import CircuitBreaker
+from .metrics import ComponentMetrics, RateMeter
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+DEFAULT_CONNECTOR_CAPACITY = 10000
+DEFAULT_BLOCK_TIMEOUT = 0.5
+BATCH_SIZE = 256
+REPLAY_BATCH_SIZE = 1000
+FAILED_RETRY_DELAY = 0.5
+
+_LENGTH = struct.Struct('<I')
+
+
+class OverflowPolicy(Enum):
+    """
+    What a connector queue does with a new event when it is full
+    """
+    BLOCK = "block"                 # wait for room: the publishing thread slows down to the connector's pace
+    DROP_OLDEST = "drop_oldest"     # discard the oldest waiting event
+    DROP_NEWEST = "drop_newest"     # discard the new event
+    SPILL = "spill"                 # append events to a file on disk, delivered in order once the queue catches up
+
+
+class SpillFile:
+    """
+    Append-only file of pickled events (length prefixed), read back in the same order.
+    The file is truncated every time all its events have been read.
+    """
+
+    def __init__(self, name: str, directory: Union[str, None] = None):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix=f"wormhole-spill-{name}-", suffix=".bin", dir=directory)
+        self._writer = os.fdopen(fd, "wb")
+        self._reader = open(self.path, "rb")
+        self.pending: int = 0
+
+    def write(self, item) -> None:
+        data = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+        self._writer.write(_LENGTH.pack(len(data)))
+        self._writer.write(data)
+        self.pending += 1
+
+    def read(self, count: int) -> list:
+        """
+        Read up to count items, in write order
+        """
+        self._writer.flush()
+        items = list()
+        while self.pending and len(items) < count:
+            length, = _LENGTH.unpack(self._reader.read(_LENGTH.size))
+            items.append(pickle.loads(self._reader.read(length)))
+            self.pending -= 1
+
+        if not self.pending:
+            self._writer.seek(0)
+            self._writer.truncate()
+            self._reader.seek(0)
+        return items
+
+    def close(self, remove: bool = True) -> None:
+        """
+        :param remove: delete the file (keep it to recover events not read yet)
+        """
+        self._writer.close()
+        self._reader.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class ConnectorWorker:
+    """
+    Run one connector on its own thread, behind a bounded queue, so a slow sink never delays the others nor the
+    publishing modules (unless its policy is BLOCK). Events are delivered in publishing order.
+
+    A circuit breaker isolates failing sinks (i.e. database down): after some consecutive failures the connector
+    is not called anymore and events are appended to a spool file. The sink is probed with exponential backoff
+    replaying the spool in bulk (forward_many): on success the circuit closes and delivery goes on in order.
+    Replay is at-least-once: a chunk partially delivered before a failure is sent again.
+    Events failing while the circuit stays closed (short glitch) are retried before any newer event. One failing
+    again while a newer event goes through is dropped (the connector refuses it). The ones still pending when the
+    worker stops are spooled.
+    """
+
+    def __init__(self,
+                 connector,
+                 name: str,
+                 policy: Union[OverflowPolicy, str] = OverflowPolicy.BLOCK,
+                 capacity: int = DEFAULT_CONNECTOR_CAPACITY,
+                 spill_dir: Union[str, None] = None,
+                 breaker: Union[CircuitBreaker, None] = None,
+                 metrics: Union[ComponentMetrics, None] = None):
+        """
+        :param connector: BaseConnector instance
+        :param name: name of the connector in metrics
+        :param policy: OverflowPolicy (or its value) applied when the queue is full
+        :param capacity: max number of events waiting to be delivered (spilled events excluded)
+        :param spill_dir: directory of the spill and spool files (default: system temporary directory)
+        :param breaker: circuit breaker of the connector (default: CircuitBreaker with default thresholds)
+        :param metrics: receives the forward time and the end-to-end lag of every event delivered live
+        """
+        if capacity <= 0:
+            raise ValueError(f"Invalid connector queue capacity: {capacity}")
+
+        self.connector = connector
+        self.name: str = name
+        self._policy: OverflowPolicy = OverflowPolicy(policy)
+        self._capacity: int = capacity
+        self._spill_dir: Union[str, None] = spill_dir
+        self._spill: Union[SpillFile, None] = None
+        self._buffer: deque = deque()
+        self._condition = threading.Condition()
+        self._stopping: bool = False
+        self._discard: bool = False
+
+        # Used by the worker thread only
+        self._breaker: CircuitBreaker = breaker or CircuitBreaker()
+        self._metrics: Union[ComponentMetrics, None] = metrics
+        self._spool: Union[SpillFile, None] = None
+        self._replay: list = list()
+        # ((enqueue time, event), attempts) that failed while the circuit stayed closed, oldest first
+        self._failed: list = list()
+
+        # Counters are updated holding the condition lock (producers) or by the worker thread only (delivery):
+        # events dropped on each side have their own counter
+        self._enqueued: int = 0
+        self._dropped_enqueue: int = 0
+        self._dropped_delivery: int = 0
+        self._spilled: int = 0
+        self._max_depth: int = 0
+        self._delivered: int = 0
+        self._errors: int = 0
+        self._spooled: int = 0
+        self._replayed: int = 0
+        self._last_lag: float = 0.0
+        self._rate: RateMeter = RateMeter()
+
+        self._thread = threading.Thread(target=self._run, name=f"wormhole-connector-{name}", daemon=True)
+        self._thread.start()
+
+    @property
+    def policy(self) -> OverflowPolicy:
+        return self._policy
+
+    def put(self, event) -> bool:
+        """
+        Enqueue an event for the connector, applying the overflow policy if the queue is full
+        :param event: HookEvent, already detached
+        :return: false if the event has been dropped
+        """
+        with self._condition:
+            if self._stopping:
+                self._dropped_enqueue += 1
+                return False
+
+            # Once spilling started, events keep going to disk until the spill is drained, to preserve order
+            if self._spill is not None and self._spill.pending:
+                return self._spill_event(event)
+
+            if len(self._buffer) >= self._capacity:
+                if self._policy is OverflowPolicy.DROP_NEWEST:
+                    self._dropped_enqueue += 1
+                    return False
+                elif self._policy is OverflowPolicy.DROP_OLDEST:
+                    self._buffer.popleft()
+                    self._dropped_enqueue += 1
+                elif self._policy is OverflowPolicy.SPILL:
+                    return self._spill_event(event)
+                else:
+                    while len(self._buffer) >= self._capacity and not self._stopping:
+                        self._condition.wait(DEFAULT_BLOCK_TIMEOUT)
+                    if self._stopping:
+                        self._dropped_enqueue += 1
+                        return False
+
+            self._buffer.append((time.monotonic(), event))
+            self._enqueued += 1
+            if len(self._buffer) > self._max_depth:
+                self._max_depth = len(self._buffer)
+            self._condition.notify_all()
+        return True
+
+    def _spill_event(self, event) -> bool:
+        try:
+            if self._spill is None:
+                self._spill = SpillFile(self.name, self._spill_dir)
+            self._spill.write((time.monotonic(), event))
+        except Exception as e:
+            self._dropped_enqueue += 1
+            logger.error(f"Error spilling event of connector '{self.name}': {e}")
+            return False
+
+        self._enqueued += 1
+        self._spilled += 1
+        self._condition.notify_all()
+        return True
+
+    def _next_batch(self, timeout: Union[float, None] = None) -> Union[list, None]:
+        """
+        Wait for events to deliver: queued events first, then spilled ones (that are always newer)
+        :param timeout: max seconds to wait for events
+        :return: list of (enqueue time, event) (empty on timeout), None when stopped and drained
+        """
+        with self._condition:
+            while not self._buffer and not (self._spill is not None and self._spill.pending):
+                if self._stopping:
+                    return None
+                if not self._condition.wait(timeout) and timeout is not None:
+                    return []
+
+            if self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(BATCH_SIZE, len(self._buffer)))]
+                self._condition.notify_all()
+                return batch
+
+            try:
+                return self._spill.read(BATCH_SIZE)
+            except Exception as e:
+                logger.error(f"Error reading spilled events of connector '{self.name}': {e}")
+                self._dropped_enqueue += self._spill.pending
+                self._spill.close()
+                self._spill = None
+                return []
+
+    def _run(self) -> None:
+        while True:
+            if not self._breaker.is_closed:
+                timeout = self._breaker.probe_delay()
+            else:
+                # Events that failed during a glitch are retried even if no newer event comes
+                timeout = FAILED_RETRY_DELAY if self._failed else None
+            batch = self._next_batch(timeout)
+            if batch is None:
+                break
+
+            if not self._breaker.is_closed:
+                self._spool_batch(batch)
+                if self._breaker.try_probe():
+                    self._replay_spool()
+                continue
+
+            self._deliver(batch)
+
+        if self._failed and self._breaker.is_closed and not self._discard:
+            self._retry_failed()
+        # Events still failing go through the spool: a last replay attempt, or kept on disk
+        self._spool_batch([item for item, _ in self._failed])
+        self._failed = list()
+        self._finish()
+
+        close = getattr(self.connector, "close", None)
+        if close:
+            try:
+                close()
+            except Exception as e:
+                logger.error(f"Error closing connector '{self.name}': {e}")
+
+    def _deliver(self, batch: list) -> None:
+        if not batch and self._failed:
+            self._retry_failed()
+        for index, item in enumerate(batch):
+            if self._failed:
+                # Events that failed go first, to keep the publishing order
+                self._failed.append((item, 0))
+                delivered = self._retry_failed()
+            else:
+                delivered = self._forward(*item)
+                if not delivered:
+                    self._failed.append((item, 1))
+
+            if not delivered and not self._breaker.is_closed:
+                # Events failing right before the circuit opens are spooled too, they are part of the outage
+                logger.warning(f"Connector '{self.name}' is failing, spooling its events until it recovers")
+                self._spool_batch([failed for failed, _ in self._failed] + batch[index + 1:])
+                self._failed = list()
+                return
+
+    def _forward(self, enqueued_at: float, event) -> bool:
+        """
+        Deliver an event live, accounting the result in the breaker and in the counters
+        :return: false if the connector failed
+        """
+        metrics = self._metrics
+        start = time.perf_counter_ns() if metrics is not None else 0
+        try:
+            self.connector.forward(event)
+        except Exception as e:
+            self._errors += 1
+            if metrics is not None:
+                metrics.errors += 1
+            if self._errors == 1 or self._errors % 1000 == 0:
+                logger.error(f"Error on connector '{self.name}' ({self._errors} so far): {e}")
+            self._breaker.record_failure()
+            return False
+
+        if metrics is not None:
+            metrics.record(start, event.timestamp)
+        self._breaker.record_success()
+        self._delivered += 1
+        now = time.monotonic()
+        self._last_lag = now - enqueued_at
+        self._rate.add(1, now)
+        return True
+
+    def _retry_failed(self) -> bool:
+        """
+        The circuit did not open (short glitch): deliver the events that failed, in order, before newer ones.
+        An event failing its retry is skipped to try the newer ones: if one of them goes through, the connector
+        refuses that event and it is dropped, otherwise the sink is still failing and they all stay pending.
+        :return: true if no failed event is left
+        """
+        failed = self._failed
+        index = 0
+        while index < len(failed):
+            item, attempts = failed[index]
+            if self._forward(*item):
+                self._dropped_delivery += index
+                del failed[:index + 1]
+                index = 0
+                continue
+
+            if not attempts:
+                failed[index] = (item, 1)
+                return False
+            if not self._breaker.is_closed:
+                return False
+            index += 1
+        return not failed
+
+    def _spool_batch(self, batch: list) -> None:
+        if not batch:
+            return
+        try:
+            if self._spool is None:
+                self._spool = SpillFile(f"{self.name}-spool", self._spill_dir)
+            for item in batch:
+                self._spool.write(item)
+            self._spooled += len(batch)
+        except Exception as e:
+            self._dropped_delivery += len(batch)
+            logger.error(f"Error spooling events of connector '{self.name}': {e}")
+
+    def _forward_many(self, events: list) -> None:
+        forward_many = getattr(self.connector, "forward_many", None)
+        if forward_many:
+            forward_many(events)
+        else:
+            for event in events:
+                self.connector.forward(event)
+
+    def _replay_spool(self) -> bool:
+        """
+        Probe the sink delivering the spooled events in chunks, in order
+        :return: true if the spool has been fully replayed (and the circuit closed)
+        """
+        while True:
+            if not self._replay:
+                if self._spool is None or not self._spool.pending:
+                    break
+                try:
+                    self._replay = self._spool.read(REPLAY_BATCH_SIZE)
+                except Exception as e:
+                    logger.error(f"Error reading spool of connector '{self.name}': {e}")
+                    self._dropped_delivery += self._spool.pending
+                    self._spool.close()
+                    self._spool = None
+                    break
+
+            try:
+                self._forward_many([event for _, event in self._replay])
+            except Exception as e:
+                self._errors += 1
+                self._breaker.record_failure()
+                logger.warning(f"Connector '{self.name}' still unavailable ({e}), "
+                               f"next probe in {self._breaker.probe_delay():.1f}s")
+                return False
+
+            self._delivered += len(self._replay)
+            self._replayed += len(self._replay)
+            now = time.monotonic()
+            self._last_lag = now - self._replay[-1][0]
+            self._rate.add(len(self._replay), now)
+            self._replay = list()
+
+        self._breaker.record_success()
+        logger.warning(f"Connector '{self.name}' recovered, {self._replayed} spooled events replayed so far")
+        return True
+
+    def _finish(self) -> None:
+        """
+        Last attempt to deliver spooled events before exiting. If the sink is still unavailable, the spool file
+        is kept on disk.
+        """
+        if self._spool is None:
+            return
+
+        pending = len(self._replay) + self._spool.pending
+        if pending and not self._discard and (self._breaker.is_closed or self._breaker.try_probe(force=True)):
+            if self._replay_spool():
+                pending = 0
+
+        if pending and self._discard:
+            self._dropped_delivery += pending
+            self._spool.close()
+        elif pending:
+            logger.warning(f"Connector '{self.name}' unavailable: {pending} events left in {self._spool.path}")
+            self._spool.close(remove=False)
+        else:
+            self._spool.close()
+        self._spool = None
+
+    def stop(self, drain: bool = True, timeout: Union[float, None] = None) -> None:
+        """
+        Stop the worker thread
+        :param drain: deliver events already enqueued (and spilled) before stopping, otherwise discard them
+        :param timeout: seconds to wait for the worker thread to exit
+        """
+        with self._condition:
+            if not drain:
+                self._discard = True
+                self._dropped_enqueue += len(self._buffer)
+                self._buffer.clear()
+                if self._spill is not None:
+                    self._dropped_enqueue += self._spill.pending
+                    self._spill.close()
+                    self._spill = None
+            self._stopping = True
+            self._condition.notify_all()
+
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Connector '{self.name}' did not deliver its pending events in time")
+            return
+
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def is_running(self) -> bool:
+        return self._thread.is_alive()
+
+    @property
+    def thread(self) -> threading.Thread:
+        return self._thread
+
+    def stats(self) -> dict:
+        """
+        Snapshot of the connector counters. The rate is computed over the last seconds (see RateMeter), the lag is
+        how long the oldest waiting event has been waiting (or the delay of the last delivered event, when nothing is waiting).
+        Delivered events are the ones the connector accepted without errors.
+        """
+        now = time.monotonic()
+        with self._condition:
+            depth = len(self._buffer)
+            oldest = self._buffer[0][0] if self._buffer else None
+            spilled_pending = self._spill.pending if self._spill is not None else 0
+
+        delivered = self._delivered
+        return {
+            "policy": self._policy.value,
+            "capacity": self._capacity,
+            "depth": depth,
+            "max_depth": self._max_depth,
+            "spill_depth": spilled_pending,
+            "enqueued": self._enqueued,
+            "delivered": delivered,
+            "dropped": self._dropped_enqueue + self._dropped_delivery,
+            "spilled": self._spilled,
+            "errors": self._errors,
+            "lag": now - oldest if oldest is not None else self._last_lag,
+            "events_per_sec": self._rate.rate(now),
+            "breaker": self._breaker.stats(),
+            "spool_depth": (self._spool.pending if self._spool is not None else 0) + len(self._replay),
+            "spooled": self._spooled,
+            "replayed": self._replayed,
+        }
@@ -0,0 +1,242 @@
+"""
+Compact binary framing of hooked calls, alternative to the JSON payload.
+
+At hook time the agent sends the registry of the hooked modules and symbols:
+
+    payload = {"type": "registry", "modules": ["io", "xpc", ...], "symbols": ["open", "read", ...]}
+
+Module and symbol ids are the indexes inside these lists. Then hooked calls are sent as
+payload = {"type": "frames"} and the binary data contains one or more concatenated frames:
+
+    header  <Q I H H B B I  timestamp (ms), tid, module id, symbol id, argc, flags, data length
+    args    argc typed values
+    ret     one typed value (only if flags & FLAG_RET)
+    data    raw bytes (only if flags & FLAG_DATA)
+
+A typed value is a one byte tag followed by its encoding (see TAG_* constants). Lists and dicts (i.e. decoded
+plists) are JSON encoded.
+"""
+
+import json
+import struct
+
+from typing import List, Tuple, Union
+
+from .modules.base import Message
+
+REGISTRY_TYPE = "registry"
+FRAMES_TYPE = "frames"
+
+HEADER = struct.Struct('<QIHHBBI')
+TAG = struct.Struct('<B')
+INT = struct.Struct('<q')
+FLOAT = struct.Struct('<d')
+LENGTH = struct.Struct('<I')
+
+FLAG_RET = 0x1
+FLAG_DATA = 0x2
+
+TAG_NONE = 0
+TAG_INT = 1
+TAG_FLOAT = 2
+TAG_STR = 3
+TAG_BYTES = 4
+TAG_TRUE = 5
+TAG_FALSE = 6
+TAG_JSON = 7
+
+
+class FramingError(Exception):
+    pass
+
+
+class SymbolRegistry:
+    """
+    Bidirectional mapping between modules/symbols names and the ids used inside binary frames
+    """
+
+    def __init__(self, modules: List[str] = None, symbols: List[str] = None):
+        self.modules: List[str] = list(modules or [])
+        self.symbols: List[str] = list(symbols or [])
+        self._module_ids: dict = {name: i for i, name in enumerate(self.modules)}
+        self._symbol_ids: dict = {name: i for i, name in enumerate(self.symbols)}
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> 'SymbolRegistry':
+        return cls(payload.get('modules', []), payload.get('symbols', []))
+
+    def to_payload(self) -> dict:
+        return {'type': REGISTRY_TYPE, 'modules': self.modules, 'symbols': self.symbols}
+
+    def module_id(self, module: str) -> int:
+        if module not in self._module_ids:
+            self._module_ids[module] = len(self.modules)
+            self.modules.append(module)
+        return self._module_ids[module]
+
+    def symbol_id(self, symbol: str) -> int:
+        if symbol not in self._symbol_ids:
+            self._symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return self._symbol_ids[symbol]
+
+
+def _encode_value(buffer: bytearray, value) -> None:
+    if value is None:
+        buffer += TAG.pack(TAG_NONE)
+    elif value is True:
+        buffer += TAG.pack(TAG_TRUE)
+    elif value is False:
+        buffer += TAG.pack(TAG_FALSE)
+    elif isinstance(value, int):
+        buffer += TAG.pack(TAG_INT)
+        buffer += INT.pack(value)
+    elif isinstance(value, float):
+        buffer += TAG.pack(TAG_FLOAT)
+        buffer += FLOAT.pack(value)
+    elif isinstance(value, (bytes, bytearray)):
+        buffer += TAG.pack(TAG_BYTES)
+        buffer += LENGTH.pack(len(value))
+        buffer += value
+    elif isinstance(value, str):
+        encoded = value.encode('utf-8')
+        buffer += TAG.pack(TAG_STR)
+        buffer += LENGTH.pack(len(encoded))
+        buffer += encoded
+    elif isinstance(value, (list, dict)):
+        encoded = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        buffer += TAG.pack(TAG_JSON)
+        buffer += LENGTH.pack(len(encoded))
+        buffer += encoded
+    else:
+        raise TypeError(f"Unsupported value type in frames: {type(value).__name__}")
+
+
+def encode_frame(registry: SymbolRegistry, payload: dict, data: Union[bytes, None] = None) -> bytes:
+    """
+    Encode a hooked call into a binary frame. This is the host-side mirror of the agent's encoder.
+    Args and ret must be None, bool, int, float, str, bytes or JSON-serializable lists/dicts (TypeError otherwise).
+    :param registry: registry used to assign module and symbol ids
+    :param payload: payload of the equivalent JSON message
+    :param data: raw bytes sent with the message
+    :return: the frame
+    """
+    func_data = payload.get('data', {})
+    args = func_data.get('args', [])
+    flags = 0
+    if 'ret' in func_data:
+        flags |= FLAG_RET
+    if data is not None:
+        flags |= FLAG_DATA
+
+    frame = bytearray(HEADER.pack(
+        int(payload.get('timestamp', 0)),
+        payload.get('tid', 0),
+        registry.module_id(payload.get('type', '')),
+        registry.symbol_id(payload.get('symbol', '')),
+        len(args),
+        flags,
+        len(data) if data is not None else 0
+    ))
+    for arg in args:
+        _encode_value(frame, arg)
+    if flags & FLAG_RET:
+        _encode_value(frame, func_data.get('ret'))
+    if data is not None:
+        frame += data
+
+    return bytes(frame)
+
+
+class FrameDecoder:
+    """
+    Decode binary frames into the same Message objects built from JSON payloads
+    """
+
+    def __init__(self, registry: SymbolRegistry = None):
+        self.registry: SymbolRegistry = registry or SymbolRegistry()
+
+    def load_registry(self, payload: dict) -> None:
+        """
+        Set the registry sent by the agent at hook time
+        :param payload: payload of the "registry" message
+        """
+        self.registry = SymbolRegistry.from_payload(payload)
+
+    @staticmethod
+    def _decode_value(data: bytes, offset: int) -> Tuple[object, int]:
+        tag = data[offset]
+        offset += 1
+        if tag == TAG_STR:
+            length, = LENGTH.unpack_from(data, offset)
+            offset += 4 + length
+            if offset > len(data):
+                raise IndexError("value past the end of the data")
+            return data[offset - length:offset].decode('utf-8'), offset
+        elif tag == TAG_INT:
+            return INT.unpack_from(data, offset)[0], offset + 8
+        elif tag == TAG_NONE:
+            return None, offset
+        elif tag == TAG_BYTES:
+            length, = LENGTH.unpack_from(data, offset)
+            offset += 4 + length
+            if offset > len(data):
+                raise IndexError("value past the end of the data")
+            return data[offset - length:offset], offset
+        elif tag == TAG_FLOAT:
+            return FLOAT.unpack_from(data, offset)[0], offset + 8
+        elif tag == TAG_TRUE:
+            return True, offset
+        elif tag == TAG_FALSE:
+            return False, offset
+        elif tag == TAG_JSON:
+            length, = LENGTH.unpack_from(data, offset)
+            offset += 4 + length
+            if offset > len(data):
+                raise IndexError("value past the end of the data")
+            return json.loads(data[offset - length:offset]), offset
+        raise FramingError(f"Unknown value tag {tag} at offset {offset - 1}")
+
+    def decode(self, data: bytes) -> List[Message]:
+        """
+        Decode all the frames contained in data. They are all decoded (and their module and symbol ids checked
+        against the registry) before any is returned: a malformed frame rejects the whole data, so the modules
+        never receive part of a message.
+        :param data: one or more concatenated frames
+        :return: the messages, in order
+        """
+        modules, symbols = self.registry.modules, self.registry.symbols
+        modules_count, symbols_count = len(modules), len(symbols)
+        decode_value = self._decode_value
+        header_size = HEADER.size
+        messages = list()
+        offset, end = 0, len(data)
+        try:
+            while offset < end:
+                timestamp, tid, module_id, symbol_id, argc, flags, data_len = HEADER.unpack_from(data, offset)
+                if module_id >= modules_count or symbol_id >= symbols_count:
+                    raise FramingError(f"Unknown module id {module_id} or symbol id {symbol_id} at offset {offset} "
+                                       f"({modules_count} modules, {symbols_count} symbols registered)")
+                offset += header_size
+
+                args = list()
+                for _ in range(argc):
+                    value, offset = decode_value(data, offset)
+                    args.append(value)
+
+                ret = ""
+                if flags & FLAG_RET:
+                    ret, offset = decode_value(data, offset)
+
+                raw = None
+                if flags & FLAG_DATA:
+                    raw = data[offset:offset + data_len]
+                    offset += data_len
+                    if offset > end:
+                        raise IndexError("data past the end of the frames")
+
+                messages.append(Message.from_fields(timestamp, tid, modules[module_id], symbols[symbol_id], args,
+                                                    ret, raw))
+        except (struct.error, IndexError, UnicodeDecodeError, ValueError) as e:
+            raise FramingError(f"Malformed frame at offset {offset}: {e}")
+        return messages
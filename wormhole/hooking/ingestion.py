@@ -0,0 +1,189 @@
+import time
+import queue
+import logging
+import threading
+
+from typing import Callable, Union
+
+from .metrics import PipelineMetrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+DEFAULT_CAPACITY = 10000
+DRAIN_POLL = 0.1
+
+_STOP = object()
+_CALL = object()
+
+
+class IngestionQueue:
+    """
+    Bounded stage between the Frida message thread and the processing of hooked calls.
+    Incoming messages are enqueued without blocking and consumed by a dedicated thread, so a slow module or
+    connector never stalls the agent's "send" path. When the queue is full the message is dropped and counted.
+    """
+
+    def __init__(self,
+                 consumer: Callable[[dict, bytes], None],
+                 capacity: int = DEFAULT_CAPACITY,
+                 metrics: Union[PipelineMetrics, None] = None):
+        """
+        :param consumer: function called on the consumer thread for every enqueued (message, data) couple
+        :param capacity: maximum number of messages waiting to be processed
+        :param metrics: pipeline metrics receiving the time messages wait before being consumed (receive stage)
+        """
+        if capacity <= 0:
+            raise ValueError(f"Invalid ingestion queue capacity: {capacity}")
+
+        self._consumer = consumer
+        self._capacity: int = capacity
+        self._queue: queue.Queue = queue.Queue(maxsize=capacity)
+        self._thread: Union[threading.Thread, None] = None
+        # Start and stop may come from different threads (i.e. detach requested while Frida reports it)
+        self._lock = threading.Lock()
+        self._metrics: Union[PipelineMetrics, None] = metrics
+
+        # Each counter is written by one thread only: the producer (Frida) or the consumer
+        self._received: int = 0
+        self._dropped: int = 0
+        self._max_depth: int = 0
+        self._processed: int = 0
+        self._errors: int = 0
+
+    def start(self) -> None:
+        """
+        Start the consumer thread (no-op if already running)
+        """
+        with self._lock:
+            if self.is_running():
+                return
+
+            self._thread = threading.Thread(target=self._run, name="wormhole-ingestion", daemon=True)
+            self._thread.start()
+
+    def stop(self, drain: bool = True, timeout: Union[float, None] = None) -> None:
+        """
+        Stop the consumer thread
+        :param drain: process messages already enqueued before stopping, otherwise discard them
+        :param timeout: seconds to wait for the consumer thread to exit
+        """
+        with self._lock:
+            if not self.is_running():
+                self._thread = None
+                return
+
+            if not drain:
+                try:
+                    while True:
+                        if self._queue.get_nowait()[1] is not _CALL:
+                            self._dropped += 1
+                except queue.Empty:
+                    pass
+
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def drain(self) -> bool:
+        """
+        Wait for the messages already enqueued to be consumed, leaving the consumer thread running
+        (i.e. before removing the modules and connectors they go through)
+        :return: false if the consumer thread stopped before consuming them
+        """
+        thread = self._thread
+        if thread is None or thread is threading.current_thread():
+            return False
+
+        consumed = threading.Event()
+        self.call(consumed.set)
+        while not consumed.wait(DRAIN_POLL):
+            if not self.is_running():
+                return False
+        return True
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def thread(self) -> Union[threading.Thread, None]:
+        """
+        Consumer thread, None if not started
+        """
+        return self._thread
+
+    def put(self, message: dict, data: bytes) -> bool:
+        """
+        Enqueue a message coming from the agent. Never blocks.
+        :param message: dictionary containing message info
+        :param data: raw bytes from "send" function
+        :return: false if the message has been dropped because the queue is full
+        """
+        self._received += 1
+        try:
+            self._queue.put_nowait((time.perf_counter_ns(), message, data))
+        except queue.Full:
+            self._dropped += 1
+            if self._dropped == 1 or self._dropped % self._capacity == 0:
+                logger.warning(f"Ingestion queue full ({self._capacity}): {self._dropped} messages dropped so far")
+            return False
+
+        depth = self._queue.qsize()
+        if depth > self._max_depth:
+            self._max_depth = depth
+        return True
+
+    def call(self, function: Callable[[], None]) -> None:
+        """
+        Run a function on the consumer thread, after the messages already enqueued (i.e. to enable a per-thread
+        profiler). Waits for room if the queue is full.
+        :param function: function without arguments
+        """
+        self._queue.put((0, _CALL, function))
+
+    def depth(self) -> int:
+        """
+        Number of messages waiting to be processed
+        """
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        """
+        Snapshot of the queue counters
+        """
+        return {
+            "capacity": self._capacity,
+            "depth": self._queue.qsize(),
+            "max_depth": self._max_depth,
+            "received": self._received,
+            "processed": self._processed,
+            "dropped": self._dropped,
+            "errors": self._errors,
+        }
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            enqueued, message, data = item
+            if message is _CALL:
+                try:
+                    data()
+                except Exception as e:
+                    logger.error(f"Error calling {data} on the consumer thread: {e}")
+                continue
+
+            if self._metrics is not None:
+                self._metrics.receive.record(time.perf_counter_ns() - enqueued)
+            try:
+                self._consumer(message, data)
+            except Exception as e:
+                self._errors += 1
+                logger.error(f"Error consuming message: {e}")
+            self._processed += 1
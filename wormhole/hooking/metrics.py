@@ -0,0 +1,363 @@
+"""
+Always-on instrumentation of the hooking pipeline:
+
+    agent timestamp -> receive (Frida thread -> ingestion consumer) -> decode (inflate, frames, batches)
+                    -> module processing -> render (event text) -> connector forward
+
+Durations go into HDR-style histograms: log-linear buckets (16 per power of two, ~6% relative error) holding
+nanoseconds, so recording is a bit_length, a shift and a list increment, and percentiles are read from the
+buckets at any time. Every module and connector has its counters plus two histograms: the time spent on one
+event and the end-to-end lag since the agent timestamp (host and device clocks are assumed in sync, negative
+lags count as 0).
+
+A histogram has a single writer thread (the ingestion consumer, a connector worker...): readers take a copy
+of the buckets, so a snapshot may miss the events recorded meanwhile but never blocks the pipeline.
+"""
+import time
+import logging
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Union
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+SUB_BUCKET_BITS = 4
+_LINEAR = 1 << (SUB_BUCKET_BITS + 1)
+_SHIFT_BASE = SUB_BUCKET_BITS + 1
+# Enough buckets for any 64 bits value
+BUCKETS = (64 - SUB_BUCKET_BITS + 1) << SUB_BUCKET_BITS
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# Seconds covered by the current event rates
+RATE_WINDOW = 5
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Wall clock = perf_counter_ns + offset: end-to-end lags cost one clock read less
+_WALL_CLOCK_OFFSET = time.time_ns() - time.perf_counter_ns()
+
+
+def _bucket(value: int) -> int:
+    if value < _LINEAR:
+        return value if value > 0 else 0
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+
+def _bucket_bounds(index: int) -> tuple:
+    """
+    :return: lowest and highest (excluded) values of a bucket
+    """
+    if index < _LINEAR:
+        return index, index + 1
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of durations in nanoseconds (single writer thread)
+    """
+    __slots__ = ("_counts", "count", "total", "max")
+
+    def __init__(self):
+        self._counts: List[int] = [0] * BUCKETS
+        self.count: int = 0
+        self.total: int = 0
+        self.max: int = 0
+
+    def record(self, value: int) -> None:
+        """
+        :param value: nanoseconds (< 2^64)
+        """
+        # _bucket, inlined: this runs several times per event
+        if value < _LINEAR:
+            self._counts[value if value > 0 else 0] += 1
+        else:
+            shift = value.bit_length() - _SHIFT_BASE
+            self._counts[(shift << SUB_BUCKET_BITS) + (value >> shift)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """
+        Add the values of another histogram to this one
+        :return: the histogram itself
+        """
+        self._counts = [a + b for a, b in zip(self._counts, list(other._counts))]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self) -> 'LatencyHistogram':
+        return LatencyHistogram().merge(self)
+
+    def quantiles(self, quantiles=QUANTILES) -> List[int]:
+        """
+        Values (nanoseconds, middle of their bucket) at the given quantiles, in one pass over the buckets
+        """
+        counts = list(self._counts)
+        count = sum(counts)
+        if not count:
+            return [0] * len(quantiles)
+
+        values, cumulative, wanted = list(), 0, iter(sorted(quantiles))
+        quantile = next(wanted)
+        for index, bucket_count in enumerate(counts):
+            cumulative += bucket_count
+            while quantile is not None and cumulative >= max(1, quantile * count):
+                low, high = _bucket_bounds(index)
+                values.append(min((low + high - 1) // 2, self.max))
+                quantile = next(wanted, None)
+            if quantile is None:
+                break
+        return values
+
+    def snapshot(self) -> dict:
+        """
+        Count, mean, max and quantiles of the recorded values, in microseconds
+        """
+        count = self.count
+        summary = {
+            "count": count,
+            "mean_us": self.total / count / 1e3 if count else 0.0,
+            "max_us": self.max / 1e3,
+        }
+        for quantile, value in zip(QUANTILES, self.quantiles()):
+            summary[f"p{quantile * 100:g}_us"] = value / 1e3
+        return summary
+
+
+class ThreadedHistogram:
+    """
+    Histogram recorded by many threads: each thread writes its own LatencyHistogram, merged when read
+    """
+
+    def __init__(self):
+        self._histograms: Dict[int, LatencyHistogram] = dict()
+
+    def record(self, value: int) -> None:
+        histogram = self._histograms.get(threading.get_ident(), None)
+        if histogram is None:
+            histogram = self._histograms[threading.get_ident()] = LatencyHistogram()
+        histogram.record(value)
+
+    def merged(self) -> LatencyHistogram:
+        merged = LatencyHistogram()
+        for histogram in list(self._histograms.values()):
+            merged.merge(histogram)
+        return merged
+
+
+class RateMeter:
+    """
+    Events per second over the last complete seconds (single writer thread). Counts are kept in one slot per
+    second, replaced as time goes by: reading the rate changes nothing, so any number of readers get the same value.
+    """
+    __slots__ = ("_slots", "_window")
+
+    def __init__(self, window: int = RATE_WINDOW):
+        """
+        :param window: seconds covered by the rate
+        """
+        self._window: int = window
+        # (second, events counted in that second)
+        self._slots: list = [(-1, 0)] * (window + 1)
+
+    def add(self, count: int = 1, now: Union[float, None] = None) -> None:
+        """
+        :param count: events handled
+        :param now: time.monotonic(), if the caller already has it
+        """
+        second = int(time.monotonic() if now is None else now)
+        index = second % len(self._slots)
+        slot_second, slot_count = self._slots[index]
+        self._slots[index] = (second, slot_count + count if slot_second == second else count)
+
+    def rate(self, now: Union[float, None] = None) -> float:
+        second = int(time.monotonic() if now is None else now)
+        # The current second is still being counted
+        return sum(count for slot_second, count in self._slots
+                   if second - self._window <= slot_second < second) / self._window
+
+
+class ComponentMetrics:
+    """
+    Counters and histograms of a module or a connector
+    """
+    __slots__ = ("events", "errors", "latency", "lag")
+
+    def __init__(self):
+        self.events: int = 0
+        self.errors: int = 0
+        self.latency: LatencyHistogram = LatencyHistogram()
+        self.lag: LatencyHistogram = LatencyHistogram()
+
+    def record(self, start: int, timestamp) -> int:
+        """
+        Account an event handled since start
+        :param start: time.perf_counter_ns() when the component started handling the event
+        :param timestamp: agent timestamp of the event (milliseconds)
+        :return: nanoseconds spent on the event
+        """
+        now = time.perf_counter_ns()
+        elapsed = now - start
+        self.latency.record(elapsed)
+        self.events += 1
+        # Agent timestamps are integers (JSON and binary frames alike)
+        if type(timestamp) is int:
+            lag = now + _WALL_CLOCK_OFFSET - timestamp * 1000000
+            self.lag.record(lag if lag > 0 else 0)
+        return elapsed
+
+    def snapshot(self) -> dict:
+        return {
+            "events": self.events,
+            "errors": self.errors,
+            "latency": self.latency.snapshot(),
+            "lag": self.lag.snapshot(),
+        }
+
+
+class PipelineMetrics:
+    """
+    Metrics of the pipeline of a hooking session, shared by its ingestion queue, dispatcher, modules manager and
+    connector manager
+    """
+
+    def __init__(self):
+        self.receive: LatencyHistogram = LatencyHistogram()
+        self.decode: LatencyHistogram = LatencyHistogram()
+        # Rendering happens on whatever thread needs the text of an event first: events carry the histogram of
+        # their pipeline (see ConnectorManager.forward)
+        self.render: ThreadedHistogram = ThreadedHistogram()
+        # Written by the modules manager, read by the dispatcher to leave module time out of decode time
+        self.processing_ns: int = 0
+        self._modules: Dict[str, ComponentMetrics] = dict()
+        self._connectors: Dict[str, ComponentMetrics] = dict()
+
+    def module(self, name: str) -> ComponentMetrics:
+        metrics = self._modules.get(name, None)
+        if metrics is None:
+            metrics = self._modules.setdefault(name, ComponentMetrics())
+        return metrics
+
+    def connector(self, name: str) -> ComponentMetrics:
+        metrics = self._connectors.get(name, None)
+        if metrics is None:
+            metrics = self._connectors.setdefault(name, ComponentMetrics())
+        return metrics
+
+    def _stages(self) -> Dict[str, LatencyHistogram]:
+        return {"receive": self.receive.copy(), "decode": self.decode.copy(), "render": self.render.merged()}
+
+    def snapshot(self) -> dict:
+        """
+        Stage histograms, per module and per connector counters and histograms (durations in microseconds)
+        """
+        return {
+            "stages": {stage: histogram.snapshot() for stage, histogram in self._stages().items()},
+            "modules": {name: metrics.snapshot() for name, metrics in sorted(list(self._modules.items()))},
+            "connectors": {name: metrics.snapshot() for name, metrics in sorted(list(self._connectors.items()))},
+        }
+
+    def to_prometheus(self, gauges: Union[Dict[str, float], None] = None) -> str:
+        """
+        Metrics in the Prometheus text exposition format: histograms as summaries (seconds)
+        :param gauges: other values to export as they are (metric name -> value)
+        """
+        lines = list()
+        _summary(lines, "wormhole_stage_latency_seconds", "Time spent in each pipeline stage",
+                 [({"stage": stage}, histogram) for stage, histogram in self._stages().items()])
+        for kind, components in (("module", self._modules), ("connector", self._connectors)):
+            components = sorted(list(components.items()))
+            _summary(lines, f"wormhole_{kind}_latency_seconds", f"Time spent by each {kind} on an event",
+                     [({kind: name}, metrics.latency.copy()) for name, metrics in components])
+            _summary(lines, f"wormhole_{kind}_lag_seconds", f"Time from the agent timestamp to the {kind} done",
+                     [({kind: name}, metrics.lag.copy()) for name, metrics in components])
+            for counter, help_text in (("events", "Events handled"), ("errors", "Events failed")):
+                lines.append(f"# HELP wormhole_{kind}_{counter}_total {help_text} by each {kind}")
+                lines.append(f"# TYPE wormhole_{kind}_{counter}_total counter")
+                for name, metrics in components:
+                    lines.append(f"wormhole_{kind}_{counter}_total{_labels({kind: name})} "
+                                 f"{getattr(metrics, counter)}")
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in labels.items()) + "}"
+
+
+def _summary(lines: list, name: str, help_text: str, series: list) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} summary")
+    for labels, histogram in series:
+        for quantile, value in zip(QUANTILES, histogram.quantiles()):
+            lines.append(f"{name}{_labels(dict(labels, quantile=f'{quantile:g}'))} {value / 1e9:.9f}")
+        lines.append(f"{name}_sum{_labels(labels)} {histogram.total / 1e9:.9f}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+
+class MetricsServer:
+    """
+    Local HTTP endpoint serving metrics in the Prometheus text format on GET /metrics
+    """
+
+    def __init__(self, render: Callable[[], str], host: str = "127.0.0.1", port: int = 0):
+        """
+        :param render: returns the current metrics text
+        :param host: listening address (local only by default)
+        :param port: listening port (0: any free port, see port)
+        """
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = render().encode()
+                except Exception as e:
+                    logger.error(f"Error rendering metrics: {e}")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="wormhole-metrics", daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
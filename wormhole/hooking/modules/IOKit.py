@@ -1,6 +1,6 @@
 import base64
 
-from .base import BaseModule
+from .base import BaseModule, on_symbol
 
 
 class KextConnection:
@@ -28,47 +28,55 @@ class Iokit(BaseModule):
         super().__init__(data_dir, connector_manager)
         self.kexts = dict()
 
-    def _process(self):
-        if self.message.symbol == 'IOServiceMatching' or self.message.symbol == 'IOServiceNameMatching':
-            self.publish(f"Driver Name:\t{self.message.args[0]} -> {self.message.ret}")
-
-        elif self.message.symbol == 'IOServiceGetMatchingService':
-            self.publish(f"{self.message.args[0]} -> {self.message.ret}")
-        elif self.message.symbol == 'IOServiceGetMatchingServices':
-            self.publish(f"{self.message.args[0]} -> {self.message.ret}")
-        elif self.message.symbol == 'IOServiceOpen':
-            self.publish(
-                f"Service: {self.message.args[0]} -> Connection: {self.message.args[1]}\tRET:{self.message.ret}")
-        # elif self.message.symbol == 'IOIteratorNext':
-        #    self.publish(f"{self.message.ret}")
-        elif self.message.symbol == 'IOConnectCallScalarMethod':
-            self.publish(f"Port:{self.message.args[0]} -> "
-                         f"{self.message.args[1]}({self.message.args[2]}) = {self.message.args[3]}\tRET:{self.message.ret}")
-        elif self.message.symbol == 'IOConnectCallMethod':
-            if self.message.data:
-                message = f"Port:{self.message.args[0]} -> "
-                message += f"{self.message.args[1]}({self.message.args[2]}, {self.message.args[3]}, "
-
-                if self.message.args[5] > 0:
-                    message += f"{base64.b64encode(self.message.data[:self.message.args[5]]).decode()}, {self.message.args[5]})"
-                else:
-                    message += "0, 0)"
-
-                message += f" = ({self.message.args[6]}, {self.message.args[7]}, "
-
-                if self.message.args[9] > 0:
-                    message += f"{base64.b64encode(self.message.data[self.message.args[5]:]).decode()}, {self.message.args[9]})"
-                else:
-                    message += "0, 0)"
-                message += f"\tRET:{self.message.ret}"
-
-                self.publish(message)
-            else:
-                self.publish(f"Port:{self.message.args[0]} -> "
-                             f"{self.message.args[1]}({self.message.args[2]}, {self.message.args[3]}, "
-                             f"{self.message.args[4]}, {self.message.args[5]})"
-                             f" = ({self.message.args[6]}, {self.message.args[7]}, "
-                             f"{self.message.args[8]}, {self.message.args[9]})"
-                             f"\tRET:{self.message.ret}")
+    @on_symbol('IOServiceMatching', 'IOServiceNameMatching')
+    def _on_service_matching(self):
+        self.publish_event("Driver Name:\t{args[0]} -> {ret}")
+
+    @on_symbol('IOServiceGetMatchingService', 'IOServiceGetMatchingServices')
+    def _on_get_matching_services(self):
+        self.publish_event("{args[0]} -> {ret}")
+
+    @on_symbol('IOServiceOpen')
+    def _on_service_open(self):
+        self.publish_event("Service: {args[0]} -> Connection: {args[1]}\tRET:{ret}")
+
+    # @on_symbol('IOIteratorNext')
+    # def _on_iterator_next(self):
+    #    self.publish(f"{self.message.ret}")
+
+    @on_symbol('IOConnectCallScalarMethod')
+    def _on_call_scalar_method(self):
+        self.publish_event("Port:{args[0]} -> {args[1]}({args[2]}) = {args[3]}\tRET:{ret}")
+
+    @staticmethod
+    def _render_call_method(event) -> str:
+        """
+        Render IOConnectCallMethod with its input/output structures (attached binary data) in base64
+        """
+        args = event.args
+        message = f"Port:{args[0]} -> {args[1]}({args[2]}, {args[3]}, "
+
+        if args[5] > 0:
+            message += f"{base64.b64encode(event.data[:args[5]]).decode()}, {args[5]})"
         else:
-            self.publish(f"{self.message.args}")
+            message += "0, 0)"
+
+        message += f" = ({args[6]}, {args[7]}, "
+
+        if args[9] > 0:
+            message += f"{base64.b64encode(event.data[args[5]:]).decode()}, {args[9]})"
+        else:
+            message += "0, 0)"
+        message += f"\tRET:{event.ret}"
+        return message
+
+    @on_symbol('IOConnectCallMethod')
+    def _on_call_method(self):
+        if self.message.data:
+            self.publish_event(self._render_call_method, data=self.message.data)
+        else:
+            self.publish_event("Port:{args[0]} -> {args[1]}({args[2]}, {args[3]}, {args[4]}, {args[5]})"
+                               " = ({args[6]}, {args[7]}, {args[8]}, {args[9]})\tRET:{ret}")
+
+    def _process_unhandled(self):
+        self.publish_event("{args}")
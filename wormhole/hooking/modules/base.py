@@ -1,14 +1,40 @@
 import os
+import sys
 
 from datetime import datetime
+from typing import Tuple, Union
 
+from ..event import HookEvent
 from ..connector_manager import ConnectorManager
 
+_UNRESOLVED = object()
+
+_intern = sys.intern
+
+
+def on_symbol(*symbols: str, contains: Union[str, Tuple[str, ...]] = ()):
+    """
+    Declare a module method as the handler of some hooked symbols.
+    Exact symbols are matched first, then substring patterns in the order methods are defined inside the class.
+    The handler of each distinct symbol is resolved once and cached, so dispatching an event costs a dict lookup.
+    :param symbols: exact symbols handled by the method
+    :param contains: substring(s) matched against symbols
+    """
+    patterns = (contains,) if isinstance(contains, str) else tuple(contains)
+
+    def decorator(func):
+        func._symbol_rules = getattr(func, '_symbol_rules', ()) + ((symbols, patterns),)
+        return func
+
+    return decorator
+
 
 class Message:
     """
     Class representing a message coming from the agent (with the 'send' function) when the hook functionality is on.
+    Module and symbol names are interned: they come from a small set, so every event shares the same strings.
     """
+    __slots__ = ("timestamp", "tid", "module", "symbol", "args", "ret", "data")
 
     def __init__(self, message: dict, data: bytes):
         """
@@ -22,21 +48,67 @@ class Message:
                         - ret: the return value of the function
         :param data: Raw bytes (for example when hooking read/write function).
         """
-        self.timestamp = message['payload'].get('timestamp', '')
-        self.tid = message['payload'].get('tid', '')
-        self.module = message['payload'].get('type', '')
-        self.symbol = message['payload'].get('symbol', '')
+        self.load(message, data)
 
-        func_data = message['payload'].get('data', {})
+    def load(self, message: dict, data: bytes) -> None:
+        """
+        (Re)initialize the message in place, so the same object can be reused for the next event
+        """
+        payload = message['payload']
+        self.timestamp = payload.get('timestamp', '')
+        self.tid = payload.get('tid', '')
+        self.module = _intern(payload.get('type', ''))
+        self.symbol = _intern(payload.get('symbol', ''))
+
+        func_data = payload.get('data', {})
         self.args = func_data.get("args", [])
         self.ret = func_data.get("ret", "")
         self.data = data
 
+    @classmethod
+    def from_fields(cls, timestamp, tid, module: str, symbol: str, args: list, ret, data: bytes) -> 'Message':
+        """
+        Build a message from already decoded fields (i.e. binary framing) instead of the JSON payload
+        """
+        message = cls.__new__(cls)
+        message.timestamp = timestamp
+        message.tid = tid
+        message.module = module
+        message.symbol = symbol
+        message.args = args
+        message.ret = ret
+        message.data = data
+        return message
+
     def __repr__(self):
         return f"{datetime.fromtimestamp((self.timestamp / 1000))} [{self.tid}] {self.module}:\t__MSG_TO_BE_PARSED__"
 
 
 class BaseModule:
+    # The same Message object is reloaded for every event. Modules keeping references to self.message
+    # across events must disable it.
+    _reuse_message: bool = True
+    _exact_handlers: dict = dict()
+    _pattern_handlers: tuple = ()
+    _resolved_handlers: dict = dict()
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Build the symbol dispatch table of the module from the methods decorated with on_symbol
+        """
+        super().__init_subclass__(**kwargs)
+        exact = dict(cls._exact_handlers)
+        patterns = list()
+        for attribute in cls.__dict__.values():
+            for symbols, contains in getattr(attribute, '_symbol_rules', ()):
+                for symbol in symbols:
+                    exact[symbol] = attribute
+                for pattern in contains:
+                    patterns.append((pattern, attribute))
+
+        cls._exact_handlers = exact
+        cls._pattern_handlers = tuple(patterns) + cls._pattern_handlers
+        cls._resolved_handlers = dict()
 
     def __init__(self, data_dir: str, connector_manager: ConnectorManager):
         """
@@ -62,11 +134,44 @@ class BaseModule:
             os.makedirs(module_dir)
         return module_dir
 
+    @classmethod
+    def _resolve_handler(cls, symbol: str):
+        """
+        Find the handler of a symbol in the dispatch table and cache it
+        :param symbol: hooked symbol
+        :return: the handler function, None if the symbol is not handled
+        """
+        handler = cls._exact_handlers.get(symbol, None)
+        if handler is None:
+            for pattern, pattern_handler in cls._pattern_handlers:
+                if pattern in symbol:
+                    handler = pattern_handler
+                    break
+
+        cls._resolved_handlers[symbol] = handler
+        return handler
+
     def _process(self):
         """
-        Implemented by each module class
+        Implemented by each module class, either overriding it or declaring symbol handlers with on_symbol
         """
-        raise NotImplementedError()
+        if not self._exact_handlers and not self._pattern_handlers:
+            raise NotImplementedError()
+
+        handler = self._resolved_handlers.get(self.message.symbol, _UNRESOLVED)
+        if handler is _UNRESOLVED:
+            handler = self._resolve_handler(self.message.symbol)
+
+        if handler is None:
+            self._process_unhandled()
+        else:
+            handler(self)
+
+    def _process_unhandled(self):
+        """
+        Called for symbols without a handler in the dispatch table
+        """
+        pass
 
     def process(self, message: dict, data: bytes) -> None:
         """
@@ -74,24 +179,43 @@ class BaseModule:
         :param message: the JSON of the message
         :param data: bytearray incoming with the message
         """
-        self.message = Message(message, data)
+        if self._reuse_message and self.message is not None:
+            self.message.load(message, data)
+        else:
+            self.message = Message(message, data)
         self._process()
 
-    def publish(self, content: str, color=None) -> None:
+    def process_message(self, message: Message) -> None:
         """
-        Forward the processed message to the output destination(s)
-        :param content: message processed by modules
-        :param color: color of message printed to file
+        Process an already decoded message
+        :param message: the message object
         """
-        metadata = {
-            "timestamp": str(datetime.fromtimestamp((self.message.timestamp / 1000))),
-            "thread": str(self.message.tid),
-            "module": self.message.module,
-            "function": self.message.symbol,
-            "tid": self.message.tid,
-        }
+        self.message = message
+        self._process()
 
-        if color:
-            metadata["color"] = color
+    def publish(self, content, color=None) -> None:
+        """
+        Forward an object (or an already rendered string) to the output destination(s).
+        Connectors needing text render it with str, once per event.
+        :param content: object processed by modules
+        :param color: color hint for text connectors
+        """
+        self._connector_manager.forward(HookEvent(
+            self.message.timestamp, self.message.tid, self.message.module, self.message.symbol,
+            content=content, color=color
+        ))
 
-        self._connector_manager.forward(content, **metadata)
+    def publish_event(self, template, color=None, data: bytes = None, **fields) -> None:
+        """
+        Forward the structured fields of the current message to the output destination(s). Nothing is rendered here:
+        text connectors render the template on demand.
+        :param template: str.format template of the event text (symbol, args, ret and fields are available),
+                        or function(event) -> str
+        :param color: color hint for text connectors
+        :param data: raw bytes attached to the event
+        :param fields: other structured fields computed by the module
+        """
+        self._connector_manager.forward(HookEvent(
+            self.message.timestamp, self.message.tid, self.message.module, self.message.symbol,
+            args=self.message.args, ret=self.message.ret, fields=fields, template=template, data=data, color=color
+        ))
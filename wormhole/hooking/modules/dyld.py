@@ -19,13 +19,13 @@ class Dyld(BaseModule):
         if self.message.symbol == "dlopen":
             if self.message.ret != "NULL":
                 self._dylibs[self.message.ret] = self.message.args[0]
-                self.publish(self.message.args[0])
+                self.publish_event("{args[0]}")
             else:
-                self.publish(f"ERROR OPENING {self.message.args[0]}")
+                self.publish_event("ERROR OPENING {args[0]}")
         elif self.message.symbol == "dlopen_from":
-            self.publish(f"{self.message.args[0]}")
+            self.publish_event("{args[0]}")
         elif self.message.symbol == 'dlsym':
-            self.publish(f"{self._dylibs.get(self.message.args[0])} - {self.message.args[1]}")
+            self.publish_event("{library} - {args[1]}", library=self._dylibs.get(self.message.args[0]))
         else:
-            self.publish(f"CLOSED {self._dylibs.get(self.message.args[0])}")
+            self.publish_event("CLOSED {library}", library=self._dylibs.get(self.message.args[0]))
             del self._dylibs[self.message.args[0]]
@@ -136,5 +136,5 @@ class Encryption(BaseModule):
                 with open(os.path.join(self._module_dir, f"{time.time()}"), "wb") as outfile:
                     outfile.write(session.plaintext)
 
-                self.publish(str(session))
+                self.publish(session)
                 del self.encryption_sessions[self.message.tid]
@@ -12,4 +12,4 @@ class Gestalt(BaseModule):
         super().__init__(data_dir, connector_manager)
 
     def _process(self):
-        self.publish(f"{self.message.args[0]} -> {self.message.ret}")
+        self.publish_event("{args[0]} -> {ret}")
@@ -16,10 +16,10 @@ class Icloud(BaseModule):
 
     def _process(self):
         if "startDownloading" in self.message.symbol:
-            self.publish(f"Downloading {self.message.args[0]}...")
+            self.publish_event("Downloading {args[0]}...")
         elif 'ubiquityIdentityToken' in self.message.symbol:
-            self.publish(f"Token: {self.message.args[0]}")
+            self.publish_event("Token: {args[0]}")
         elif 'ContainerIdentifier' in self.message.symbol:
-            self.publish(f"Container ID: {self.message.args[0]}")
+            self.publish_event("Container ID: {args[0]}")
         else:
             self.publish(self.message.args)
@@ -1,7 +1,7 @@
 import os
 import time
 
-from .base import BaseModule
+from .base import BaseModule, on_symbol
 
 MODE = {
     "0x0": "O_RDONLY",
@@ -66,52 +66,58 @@ class Io(BaseModule):
                 flags_list.append(MODE.get(str(hex(res)), ''))
         return " | ".join(flags_list) if flags_list else MODE.get(flags)
 
-    def _process(self):
-        if 'open' in self.message.symbol:
-            res = 'KO'
+    @on_symbol(contains="open")
+    def _on_open(self):
+        res = 'KO'
 
-            if self.message.ret != FILE_NOT_OPENED and self.message.ret != STREAM_NOT_OPENED:
-                res = 'OK'
-                self._files[self.message.ret] = self.message.args[0]
+        if self.message.ret != FILE_NOT_OPENED and self.message.ret != STREAM_NOT_OPENED:
+            res = 'OK'
+            self._files[self.message.ret] = self.message.args[0]
 
-            mode = self.parse_mode_flags(self.message.args[1]) if not self.message.symbol.startswith(
-                "f") else self.message.args[1]
-            self.publish(f"{self.message.args[0]} -> {mode} ({res})")
-        elif 'read' in self.message.symbol:
-            file_path = self._files.get(self.message.args[0], None)
-            if file_path:
-                if not file_path.startswith("/System/Library/") or not file_path.endswith('Info.plist'):
-                    try:
-                        with open(os.path.join(self._module_dir,
-                                               "read",
-                                               "_".join(file_path.split("/")[-2:]) + f"_{time.time()}"),
-                                  "ab") as f:
-                            f.write(self.message.data)
-                    except Exception:
-                        pass
-            else:
-                with open(os.path.join(self._module_dir,
-                                       "read",
-                                       "NOTFOUND" + f"_{time.time()}"),
-                          "ab") as io_file:
-                    io_file.write(self.message.data)
-        elif "write" in self.message.symbol:
-            file_path = self._files.get(self.message.args[0], None)
-            if file_path:
-                if not file_path.endswith('.log'):
+        mode = self.parse_mode_flags(self.message.args[1]) if not self.message.symbol.startswith(
+            "f") else self.message.args[1]
+        self.publish_event("{args[0]} -> {mode} ({result})", mode=mode, result=res)
+
+    @on_symbol(contains="read")
+    def _on_read(self):
+        file_path = self._files.get(self.message.args[0], None)
+        if file_path:
+            if not file_path.startswith("/System/Library/") or not file_path.endswith('Info.plist'):
+                try:
                     with open(os.path.join(self._module_dir,
-                                           "write",
+                                           "read",
                                            "_".join(file_path.split("/")[-2:]) + f"_{time.time()}"),
-                              "ab") as io_file:
-                        io_file.write(self.message.data)
-            else:
+                              "ab") as f:
+                        f.write(self.message.data)
+                except Exception:
+                    pass
+        else:
+            with open(os.path.join(self._module_dir,
+                                   "read",
+                                   "NOTFOUND" + f"_{time.time()}"),
+                      "ab") as io_file:
+                io_file.write(self.message.data)
+
+    @on_symbol(contains="write")
+    def _on_write(self):
+        file_path = self._files.get(self.message.args[0], None)
+        if file_path:
+            if not file_path.endswith('.log'):
                 with open(os.path.join(self._module_dir,
                                        "write",
-                                       "NOTFOUND" + f"_{time.time()}"),
+                                       "_".join(file_path.split("/")[-2:]) + f"_{time.time()}"),
                           "ab") as io_file:
                     io_file.write(self.message.data)
-        elif "close" in self.message.symbol:
-            try:
-                del self._files[self.message.args[0]]
-            except KeyError:
-                pass
+        else:
+            with open(os.path.join(self._module_dir,
+                                   "write",
+                                   "NOTFOUND" + f"_{time.time()}"),
+                      "ab") as io_file:
+                io_file.write(self.message.data)
+
+    @on_symbol(contains="close")
+    def _on_close(self):
+        try:
+            del self._files[self.message.args[0]]
+        except KeyError:
+            pass
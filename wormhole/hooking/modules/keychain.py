@@ -20,11 +20,11 @@ class Keychain(BaseModule):
     def _process(self):
         if self.message.data:
             filename = os.path.join(self._module_dir, f"{time.time()}")
-            self.publish(f'{self.message.args[0]} -> {filename}')
+            self.publish_event("{args[0]} -> {filename}", filename=filename)
             with open(filename, "wb") as binary_file:
                 binary_file.write(self.message.data)
         else:
             if len(self.message.args) == 2:
-                self.publish(f'{self.message.args[0]} -> {self.message.args[1]}')
+                self.publish_event("{args[0]} -> {args[1]}")
             else:
-                self.publish(f'{self.message.args[0]}')
+                self.publish_event("{args[0]}")
@@ -4,7 +4,7 @@ import os.path
 from time import time
 from urllib.parse import urlparse
 
-from .base import BaseModule
+from .base import BaseModule, on_symbol
 
 
 class Response:
@@ -41,6 +41,14 @@ class Response:
         response += "\n"
         return response
 
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'status_code': self.status_code,
+            'headers': self.headers,
+            'body': self.body
+        }
+
 
 class Request:
     banner = "\n=============== REQUEST ===============\n"
@@ -109,11 +117,13 @@ class Request:
         request_as_dict = {'request': {}}
         request_as_dict['request']['url'] = self.url
         request_as_dict['request']['method'] = self.method
-        request_as_dict['request']['headers'] = json.loads(self.headers) if self.headers else ""
+        request_as_dict['request']['headers'] = self.headers
         if self.cookies:
             request_as_dict['request']['cookies'] = self.cookies
 
         request_as_dict['request']['body'] = self.body
+        if self.response:
+            request_as_dict['response'] = self.response.to_dict()
 
         return request_as_dict
 
@@ -159,37 +169,46 @@ class Network(BaseModule):
             count = count + len(requests)
         return count
 
-    def _process(self):
-        #print(self.message.symbol, self.message.args)
+    @on_symbol(contains="callback")
+    def _on_callback(self):
+        request = self.requests.get(self.message.args[0], None)
+        if request:
+            request.response.set_body(self.message.data, self._module_dir)
+            self.publish(request)
+            del self.requests[self.message.args[0]]
+            self.count = self.count + 1
+
+    @on_symbol(contains="Response")
+    def _on_response(self):
+        request = self.requests.get(self.message.args[0], None)
+        if request:
+            request.response = Response(*self.message.args)
+            self.publish(request)
+            # del self.requests[self.message.args[0]]
+            # self.count = self.count + 1
+
+    @on_symbol(contains="uploadTaskWithStreamedRequest")
+    def _on_streamed_request(self):
+        request = self.init_request()
+        if request:
+            self.requests[self.message.args[0]] = request
+
+    @on_symbol(contains="forHTTPHeaderField")
+    def _on_header_field(self):
+        request = self.requests.get(self.message.args[0], None)
+        if request:
+            request.set_header(self.message.args[1], self.message.args[2])
+            #self.publish(request)
+
+    def _process_unhandled(self):
         request = self.requests.get(self.message.args[0], None)
-        if "callback" in self.message.symbol:
-            if request:
-                request.response.set_body(self.message.data, self._module_dir)
-                self.publish(request)
-                del self.requests[self.message.args[0]]
-                self.count = self.count + 1
-        elif "Response" in self.message.symbol:
-            if request:
-                request.response = Response(*self.message.args)
-                self.publish(request)
-                # del self.requests[self.message.args[0]]
-                # self.count = self.count + 1
-        elif 'uploadTaskWithStreamedRequest' in self.message.symbol:
-            request = self.init_request()
-            if request:
-                self.requests[self.message.args[0]] = request
-        elif 'forHTTPHeaderField' in self.message.symbol:
-            if request:
-                request.set_header(self.message.args[1], self.message.args[2])
-                #self.publish(request)
+        if not request:
+            self.requests[self.message.args[0]] = self.init_request()
+            #self.publish(self.requests[self.message.args[0]])
         else:
-            if not request:
-                self.requests[self.message.args[0]] = self.init_request()
-                #self.publish(self.requests[self.message.args[0]])
+            if self.message.symbol == "CFURLRequestSetHTTPRequestBody":
+                request.set_body(self.message.data, self._module_dir)
             else:
-                if self.message.symbol == "CFURLRequestSetHTTPRequestBody":
-                    request.set_body(self.message.data, self._module_dir)
-                else:
-                    request.update_headers(self.message.args[2])
+                request.update_headers(self.message.args[2])
 
-            # self.publish(request)
+        # self.publish(request)
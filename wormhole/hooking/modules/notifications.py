@@ -1,5 +1,7 @@
 from .base import BaseModule
 
+POST_TEMPLATE = "{args[0]} ({args[1]} -- {args[2]}) >> {observers}"
+
 
 class Observer:
     def __init__(self, name, sel):
@@ -24,19 +26,26 @@ class Notifications(BaseModule):
         self.registered_nots = {}
         self.not_observer = {}
 
+    def _observers_of(self, name):
+        """
+        Snapshot of the observers of a notification: the event is rendered later, when they may have changed
+        """
+        observers = self.not_observer.get(name, '')
+        return sorted(observers) if observers else observers
+
     def _process(self):
         if self.message.symbol == "notify_register_dispatch":
             self.registered_nots[self.message.args[1]] = self.message.args[0]
-            self.publish(f"{self.message.args[1]} - {self.message.args[0]}")
+            self.publish_event("{args[1]} - {args[0]}")
         elif self.message.symbol == "notify_cancel":
             try:
-                self.publish(
-                    f"{int(self.message.args[0], 16)} - {self.registered_nots[int(self.message.args[0], 16)]} >> X")
-                del self.registered_nots[int(self.message.args[0], 16)]
+                token = int(self.message.args[0], 16)
+                self.publish_event("{token} - {name} >> X", token=token, name=self.registered_nots[token])
+                del self.registered_nots[token]
             except KeyError:
                 pass
         elif self.message.symbol == "notify_post":
-            self.publish(f">> {self.message.args[0]}")
+            self.publish_event(">> {args[0]}")
         elif "addObserver:selector:name:object:" in self.message.symbol:
             if not self.message.args[0].startswith("UI") and not self.message.args[0].startswith("_UI") and \
                     not self.message.args[0].startswith("NS") and not self.message.args[0].startswith("_NS"):
@@ -51,15 +60,13 @@ class Notifications(BaseModule):
         elif "postNotificationName:object:userInfo:" in self.message.symbol:
             if not self.message.args[0].startswith("UI") and not self.message.args[0].startswith("_UI") and \
                     not self.message.args[0].startswith("NS") and not self.message.args[0].startswith("_NS"):
-                self.publish(f"{self.message.args[0]} ({self.message.args[1]} -- {self.message.args[2]}) >>"
-                             f" {self.not_observer.get(self.message.args[0], '')}")
+                self.publish_event(POST_TEMPLATE, observers=self._observers_of(self.message.args[0]))
         elif "removeObserver:name:object:" in self.message.symbol:
             observers = self.not_observer.get(self.message.args[0], set())
             if observers:
                 observers.remove(self.message.args[1])
         elif "CFNotificationCenterPostNotification" in self.message.symbol:
-            self.publish(f"{self.message.args[0]} ({self.message.args[1]} -- {self.message.args[2]}) >>"
-                         f" {self.not_observer.get(self.message.args[0], '')}")
+            self.publish_event(POST_TEMPLATE, observers=self._observers_of(self.message.args[0]))
         else:
             print(self.message.args)
             self.publish(self.message.args)
@@ -16,4 +16,4 @@ class Spwan(BaseModule):
 
     def _process(self):
         if self.message.symbol == "popen":
-            self.publish(f"> {self.message.args[0]} -> {self.message.ret}")
\ No newline at end of file
+            self.publish_event("> {args[0]} -> {ret}")
\ No newline at end of file
@@ -83,6 +83,13 @@ class Query:
         else:
             return f"{self.query_string}\t->\t{self.result_code}"
 
+    def to_dict(self):
+        return {
+            'query': self.query_string,
+            'substitutions': {str(param): value for param, value in sorted(self.substitutions.items())},
+            'result_code': self.result_code
+        }
+
     def append_str_to_query(self, data):
         self.query_string = f"{self.query_string} {data}"
 
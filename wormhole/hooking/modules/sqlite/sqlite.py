@@ -3,7 +3,19 @@ from sqlparse.tokens import DML, Whitespace, Wildcard, Name, Keyword, Literal
 from sqlparse.sql import Identifier, IdentifierList, Function
 
 from .query import Query, SelectQuery
-from ..base import BaseModule
+from ..base import BaseModule, on_symbol
+
+
+def pending_query(handler):
+    """
+    Pass the statement currently prepared by the thread to the handler, skipping the event if there is none
+    """
+    def wrapper(self):
+        query = self._pending_queries.get(self.message.tid, None)
+        if query:
+            handler(self, query)
+
+    return wrapper
 
 
 class Sqlite(BaseModule):
@@ -50,83 +62,107 @@ class Sqlite(BaseModule):
         self._pending_queries = dict()
         self._parse_result_set = True
 
-    def _process(self):
-        if "open" in self.message.symbol:
-            self.publish(f"DB\t->\t{self.message.args[0]}")
-
-        elif "exec" in self.message.symbol:
-            self.publish(self.message.args[0], color='OKCYAN')
-            # query_string, _ = self._parse_query(self.message.args[0])
-            # if query_string:
-            #    query = Query(query_string, self.message.tid).set_result_code(self.message.ret)
-            #    self.publish(query)
-        else:
-            query = self._pending_queries.get(self.message.tid, None)
-
-            # PREPARE
-            if "prepare" in self.message.symbol:
-                query_string, select_columns = self._parse_query(self.message.args[0])
-                if query_string:
-                    if select_columns:
-                        query = SelectQuery(query_string, self.message.tid, select_columns)
-                    else:
-                        query = Query(query_string, self.message.tid)
-                    self._pending_queries[self.message.tid] = query
-                else:
-                    print(self.message.args[0])
-
+    @on_symbol(contains="open")
+    def _on_open(self):
+        self.publish_event("DB\t->\t{args[0]}")
+
+    @on_symbol(contains="exec")
+    def _on_exec(self):
+        self.publish(self.message.args[0], color='OKCYAN')
+        # query_string, _ = self._parse_query(self.message.args[0])
+        # if query_string:
+        #    query = Query(query_string, self.message.tid).set_result_code(self.message.ret)
+        #    self.publish(query)
+
+    # PREPARE
+    @on_symbol(contains="prepare")
+    def _on_prepare(self):
+        query_string, select_columns = self._parse_query(self.message.args[0])
+        if query_string:
+            if select_columns:
+                query = SelectQuery(query_string, self.message.tid, select_columns)
             else:
-                if query:
-                    if "bind_text" in self.message.symbol:
-                        query.bind_text(self.message.args[0], self.message.args[1])
-                    elif "bind_int" in self.message.symbol:
-                        query.bind_numeric(self.message.args[0], self.message.args[1])
-                    elif "bind_double" in self.message.symbol:
-                        query.bind_numeric(self.message.args[0], self.message.args[1])
-                    elif "bind_null" in self.message.symbol:
-                        query.bind_text(self.message.args[0], "NULL")
-                    elif "bind_blob" in self.message.symbol:
-                        # TODO: PARSE BPLISTxx
-                        query.bind_blob(self.message.args[0], self.message.data, self._module_dir)
-
-                    # EXECUTE QUERY
-                    elif "step" in self.message.symbol:
-                        # Publish previous row if result_set is populated
-                        if isinstance(query, SelectQuery) and query.result_set:
-                            self.publish(query.result_set, color='WARNING')
-                        query.set_result_code(self.message.ret)
-                        self.publish(query, color='OKCYAN')
-
-                    # CLOSE STMT
-                    elif "finalize" in self.message.symbol:
-                        # and query.result_code == "SQLITE_ROW" and query.result_set:
-                        # if isinstance(query, SelectQuery) and query.row:
-                        #    self.publish(query.result_set)
-                        del self._pending_queries[self.message.tid]
-
-                    # RESET STMT PARAMS
-                    elif "reset" in self.message.symbol:
-                        if isinstance(query, SelectQuery):
-                            self.publish(query.result_set, color='OKCYAN')
-                            query.reset_bindings()
-
-                    # PARSE RESULT SET
-                    elif "column_count" in self.message.symbol:
-                        if self._parse_result_set:
-                            query.set_resultset_column(self.message.ret)
-                    elif "column_int" in self.message.symbol or "column_dobule" in self.message.symbol:
-                        if self._parse_result_set:
-                            query.column_int(self.message.args[0], self.message.ret)
-                    elif "column_text" in self.message.symbol:
-                        if self._parse_result_set:
-                            query.column_text(self.message.args[0], self.message.ret)
-                    elif "column_blob" in self.message.symbol:
-                        if self._parse_result_set:
-                            query.column_blob(self.message.args[0], self.message.data, self._module_dir)
-
-        """elif "append" in symbol:
-             if query:
-                 query.append_str_to_query(data)"""
+                query = Query(query_string, self.message.tid)
+            self._pending_queries[self.message.tid] = query
+        else:
+            print(self.message.args[0])
+
+    @on_symbol(contains="bind_text")
+    @pending_query
+    def _on_bind_text(self, query):
+        query.bind_text(self.message.args[0], self.message.args[1])
+
+    @on_symbol(contains=("bind_int", "bind_double"))
+    @pending_query
+    def _on_bind_numeric(self, query):
+        query.bind_numeric(self.message.args[0], self.message.args[1])
+
+    @on_symbol(contains="bind_null")
+    @pending_query
+    def _on_bind_null(self, query):
+        query.bind_text(self.message.args[0], "NULL")
+
+    @on_symbol(contains="bind_blob")
+    @pending_query
+    def _on_bind_blob(self, query):
+        # TODO: PARSE BPLISTxx
+        query.bind_blob(self.message.args[0], self.message.data, self._module_dir)
+
+    # EXECUTE QUERY
+    @on_symbol(contains="step")
+    @pending_query
+    def _on_step(self, query):
+        # Publish previous row if result_set is populated
+        if isinstance(query, SelectQuery) and query.result_set:
+            self.publish(query.result_set, color='WARNING')
+        query.set_result_code(self.message.ret)
+        self.publish(query, color='OKCYAN')
+
+    # CLOSE STMT
+    @on_symbol(contains="finalize")
+    @pending_query
+    def _on_finalize(self, query):
+        # and query.result_code == "SQLITE_ROW" and query.result_set:
+        # if isinstance(query, SelectQuery) and query.row:
+        #    self.publish(query.result_set)
+        del self._pending_queries[self.message.tid]
+
+    # RESET STMT PARAMS
+    @on_symbol(contains="reset")
+    @pending_query
+    def _on_reset(self, query):
+        if isinstance(query, SelectQuery):
+            self.publish(query.result_set, color='OKCYAN')
+            query.reset_bindings()
+
+    # PARSE RESULT SET
+    @on_symbol(contains="column_count")
+    @pending_query
+    def _on_column_count(self, query):
+        if self._parse_result_set:
+            query.set_resultset_column(self.message.ret)
+
+    @on_symbol(contains="column_int")
+    @pending_query
+    def _on_column_int(self, query):
+        if self._parse_result_set:
+            query.column_int(self.message.args[0], self.message.ret)
+
+    @on_symbol(contains="column_text")
+    @pending_query
+    def _on_column_text(self, query):
+        if self._parse_result_set:
+            query.column_text(self.message.args[0], self.message.ret)
+
+    @on_symbol(contains="column_blob")
+    @pending_query
+    def _on_column_blob(self, query):
+        if self._parse_result_set:
+            query.column_blob(self.message.args[0], self.message.data, self._module_dir)
+
+    """elif "append" in symbol:
+         if query:
+             query.append_str_to_query(data)"""
 
     def _parse_query(self, query):
         final_query = ""
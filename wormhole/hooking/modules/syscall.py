@@ -1,6 +1,6 @@
 import base64
 
-from .base import BaseModule
+from .base import BaseModule, on_symbol
 
 
 class Syscall(BaseModule):
@@ -14,25 +14,26 @@ class Syscall(BaseModule):
     def __init__(self, data_dir, connector_manager):
         super().__init__(data_dir, connector_manager)
 
-    def _process(self):
-        if self.message.symbol == "__mac_syscall" or self.message.symbol == "sysctlbyname":
-            self.publish(f"{self.message.symbol}({self.message.args[0]}, "
-                         f"{self.message.args[1]}, "
-                         f"{self.message.args[2]}) "
-                         f"-> {self.message.ret}")
-        elif self.message.symbol == "sysctl":
-            self.publish(f"{self.message.symbol}({self.message.args[0]}, "
-                         f"{self.message.args[1]}, "
-                         f"{self.message.args[2]}, "
-                         f"{self.message.args[3]}) "
-                         f"-> {self.message.ret}")
-        elif self.message.symbol == "renameat":
-            self.publish(f"{self.message.symbol}({self.message.args[0]}, "
-                         f"{self.message.args[1]}) "
-                         f"-> {self.message.ret}")
-        elif "execve" in self.message.symbol:
-            self.publish(f"{self.message.symbol}({self.message.args[0]}) -> {self.message.ret}")
-        elif "setxattr" in self.message.symbol:
-            self.publish(f"{self.message.symbol}({self.message.args[0]}, {self.message.args[1]}, {self.message.args[2]})")
-        elif "getxattr" in self.message.symbol:
-            self.publish(f"{self.message.symbol}({self.message.args[0]}, {self.message.args[1]}) -> {self.message.args[2]}")
+    @on_symbol("__mac_syscall", "sysctlbyname")
+    def _on_three_args(self):
+        self.publish_event("{symbol}({args[0]}, {args[1]}, {args[2]}) -> {ret}")
+
+    @on_symbol("sysctl")
+    def _on_sysctl(self):
+        self.publish_event("{symbol}({args[0]}, {args[1]}, {args[2]}, {args[3]}) -> {ret}")
+
+    @on_symbol("renameat")
+    def _on_renameat(self):
+        self.publish_event("{symbol}({args[0]}, {args[1]}) -> {ret}")
+
+    @on_symbol(contains="execve")
+    def _on_execve(self):
+        self.publish_event("{symbol}({args[0]}) -> {ret}")
+
+    @on_symbol(contains="setxattr")
+    def _on_setxattr(self):
+        self.publish_event("{symbol}({args[0]}, {args[1]}, {args[2]})")
+
+    @on_symbol(contains="getxattr")
+    def _on_getxattr(self):
+        self.publish_event("{symbol}({args[0]}, {args[1]}) -> {args[2]}")
@@ -57,6 +57,14 @@ class XpcMessage:
 
         return msg
 
+    def to_dict(self):
+        return {
+            'service': self.xpc_service,
+            'input': self.is_input_message,
+            'message': self.message,
+            'response': self.response
+        }
+
     """
     TODO: if you want a message as dict, you should implement this __iter__ method
     def __iter__(self):
@@ -1,9 +1,13 @@
+import time
 import importlib
 import logging
 
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
 from .connector_manager import ConnectorManager
+from .metrics import PipelineMetrics
+from .modules.base import Message
+from .sharding import ShardedExecutor, DEFAULT_WORKERS
 
 BASE_MODULE = "wormhole.hooking.modules"
 
@@ -20,11 +24,29 @@ class ModulesManager:
     Singleton object handling all incoming messages from the agent running inside the app
     """
 
-    def __init__(self, target_app: str, data_dir: str):
+    def __init__(self,
+                 target_app: str,
+                 data_dir: str,
+                 sharded_modules: List[str] = None,
+                 shard_workers: int = DEFAULT_WORKERS,
+                 metrics: Union[PipelineMetrics, None] = None):
+        """
+        :param target_app: name of the analyzed app/process
+        :param data_dir: base data directory
+        :param sharded_modules: modules to run inside worker processes (sharded by module and tid)
+        :param shard_workers: number of worker processes used by sharded modules
+        :param metrics: pipeline metrics receiving per module counters and processing times
+                        (sharded modules only count the events submitted to workers)
+        """
         self._app_name = target_app
         self._data_dir: str = data_dir
         self._available_custom_modules: List[str] = self._discover_custom_modules()
         self._modules: dict = dict()
+        self._sharded_modules: List[str] = list(sharded_modules or [])
+        self._shard_workers: int = shard_workers
+        self._executor: Union[ShardedExecutor, None] = None
+        self._sharded: set = set()
+        self._metrics: Union[PipelineMetrics, None] = metrics
 
     def get_available_standard_modules(self) -> List[str]:
         """
@@ -108,16 +130,57 @@ class ModulesManager:
         :param connector_manager: manager of output connectors
         :return: list of correctly initialized modules, list of correctly initialized custom modules
         """
+        sharded = [m for m in modules if m in self._sharded_modules and m not in self._sharded]
+        sharded_custom = [m for m in custom_modules if m in self._sharded_modules and m not in self._sharded
+                          and m in self._available_custom_modules]
+        if sharded or sharded_custom:
+            self._start_sharded_modules(sharded, sharded_custom, connector_manager)
+
+        local_modules = self._import_modules([m for m in modules if m not in self._sharded], connector_manager)
+        local_custom_modules = self._import_custom_modules([m for m in custom_modules if m not in self._sharded],
+                                                           connector_manager)
+
+        return (local_modules + [m for m in sharded if m in self._sharded],
+                local_custom_modules + [m for m in sharded_custom if m in self._sharded])
+
+    def _start_sharded_modules(self,
+                               modules: List[str],
+                               custom_modules: List[str],
+                               connector_manager: ConnectorManager) -> None:
+        """
+        Start the worker processes running sharded modules
+        :param modules: list of standard modules to shard
+        :param custom_modules: list of custom modules to shard
+        :param connector_manager: manager of output connectors receiving the results published by workers
+        """
+        if self._executor:
+            logger.error(f"Sharded modules already running: {self._sharded}")
+            return
 
-        return self._import_modules(modules, connector_manager), self._import_custom_modules(custom_modules,
-                                                                                             connector_manager)
+        try:
+            self._executor = ShardedExecutor(self._app_name, self._data_dir, connector_manager, self._shard_workers)
+            self._sharded = set(self._executor.start(modules, custom_modules))
+        except Exception as e:
+            logger.error(f"Error starting sharded modules {modules + custom_modules}: {e}")
+            self._executor = None
+            self._sharded = set()
 
     def clear_modules(self) -> None:
         """
-        Empty modules dict
+        Empty modules dict and stop worker processes of sharded modules
         """
 
         self._modules = dict()
+        if self._executor:
+            self._executor.stop()
+            self._executor = None
+            self._sharded = set()
+
+    def sharding_stats(self) -> Union[dict, None]:
+        """
+        Counters of the sharded execution, None if no module runs in worker processes
+        """
+        return self._executor.stats() if self._executor else None
 
     def add_modules(self, modules: List[str], connector_manager: ConnectorManager) -> List[str]:
         """
@@ -152,6 +215,45 @@ class ModulesManager:
         else:
             module_name = message.get('payload', {}).get('type', '')
             try:
-                self._modules[module_name].process(message, data)
+                if module_name in self._sharded:
+                    self._executor.submit(Message(message, data))
+                    self._count_submitted(module_name)
+                elif self._metrics is None:
+                    self._modules[module_name].process(message, data)
+                else:
+                    start = time.perf_counter_ns()
+                    self._modules[module_name].process(message, data)
+                    self._account(module_name, start, message['payload'].get('timestamp', None))
             except Exception as e:
+                self._count_error(module_name)
                 logger.error(f"Error processing message: {e}.\n{message}")
+
+    def process_decoded(self, message: Message) -> None:
+        """
+        Process a message already decoded by the host (i.e. coming from the binary framing)
+        :param message: the decoded message
+        """
+        try:
+            if message.module in self._sharded:
+                self._executor.submit(message)
+                self._count_submitted(message.module)
+            elif self._metrics is None:
+                self._modules[message.module].process_message(message)
+            else:
+                start = time.perf_counter_ns()
+                self._modules[message.module].process_message(message)
+                self._account(message.module, start, message.timestamp)
+        except Exception as e:
+            self._count_error(message.module)
+            logger.error(f"Error processing message: {e}.\n{message}")
+
+    def _account(self, module_name: str, start: int, timestamp) -> None:
+        self._metrics.processing_ns += self._metrics.module(module_name).record(start, timestamp)
+
+    def _count_error(self, module_name: str) -> None:
+        if self._metrics is not None:
+            self._metrics.module(module_name).errors += 1
+
+    def _count_submitted(self, module_name: str) -> None:
+        if self._metrics is not None:
+            self._metrics.module(module_name).events += 1
@@ -0,0 +1,319 @@
+"""
+On-demand profiling of the hooking pipeline of a running session, for a limited time:
+    - cprofile: deterministic profile of the ingestion consumer thread, where the modules process the messages.
+      Saved as pstats (python -m pstats, snakeviz...) plus the top functions as text.
+    - sampling: stacks of the pipeline threads of the session (ingestion consumer, connector workers and flushers)
+      sampled periodically from another thread. Saved as collapsed stacks (flamegraph.pl, speedscope) plus the top
+      functions as text. Samples of threads waiting for work are counted as idle and left out of the stacks.
+Nothing runs while no profile is requested.
+"""
+import os
+import sys
+import time
+import pstats
+import functools
+import cProfile
+import logging
+import threading
+
+from enum import Enum
+from collections import Counter
+from typing import Callable, Dict, Iterable, Union
+
+from .ingestion import IngestionQueue
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+THREAD_PREFIX = "wormhole-"
+DEFAULT_INTERVAL = 0.005
+TOP_FUNCTIONS = 40
+
+
+class ProfilerMode(Enum):
+    CPROFILE = "cprofile"   # every call of the ingestion consumer thread
+    SAMPLING = "sampling"   # periodic stacks of every pipeline thread
+
+
+def _is_waiting(frame) -> bool:
+    """
+    True if the innermost Python frame of a thread is waiting on a threading primitive (queue.get, Event.wait...)
+    """
+    return frame.f_code.co_name == "wait" and frame.f_code.co_filename == threading.__file__
+
+
+class SamplingProfiler:
+    """
+    Sample the stacks of some threads from a background thread: the ones given by a function (i.e. the threads of a
+    session, while other sessions run in the same process), or every thread whose name starts with a prefix
+    """
+
+    def __init__(self,
+                 thread_prefix: str = THREAD_PREFIX,
+                 interval: float = DEFAULT_INTERVAL,
+                 threads: Union[Callable[[], Iterable[threading.Thread]], None] = None):
+        """
+        :param thread_prefix: name prefix of the sampled threads, when threads is missing
+        :param interval: seconds between samples
+        :param threads: function returning the threads to sample (called for every sample: they may change)
+        """
+        if interval <= 0:
+            raise ValueError(f"Invalid sampling interval: {interval}")
+
+        self._thread_prefix: str = thread_prefix
+        self._interval: float = interval
+        self._threads = threads
+        self._labels: dict = dict()
+        self._stop = threading.Event()
+        self._thread: Union[threading.Thread, None] = None
+        self.stacks: Counter = Counter()
+        self.busy: Counter = Counter()
+        self.idle: Counter = Counter()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code, None)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:" \
+                                         f"{code.co_firstlineno})".replace(";", ":")
+        return label
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            frames = sys._current_frames()
+            for thread in self._sampled_threads():
+                frame = frames.get(thread.ident, None)
+                if frame is None:
+                    continue
+                if _is_waiting(frame):
+                    self.idle[thread.name] += 1
+                    continue
+
+                stack = list()
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(thread.name)
+                stack.reverse()
+                self.stacks[";".join(stack)] += 1
+                self.busy[thread.name] += 1
+
+    def _sampled_threads(self) -> Iterable[threading.Thread]:
+        if self._threads is not None:
+            return [thread for thread in self._threads() if thread is not None]
+        return [thread for thread in threading.enumerate() if thread.name.startswith(self._thread_prefix)]
+
+    def write_collapsed(self, path: str) -> None:
+        """
+        One line per distinct stack: "thread;outermost;...;innermost samples"
+        """
+        with open(path, "w", encoding="utf-8") as output:
+            for stack, samples in sorted(self.stacks.items()):
+                output.write(f"{stack} {samples}\n")
+
+    def write_summary(self, path: str) -> None:
+        """
+        Busy/idle samples of every thread and the functions with most samples (own and inclusive)
+        """
+        own, inclusive = Counter(), Counter()
+        for stack, samples in self.stacks.items():
+            frames = stack.split(";")[1:]
+            own[frames[-1]] += samples
+            for frame in set(frames):
+                inclusive[frame] += samples
+
+        busy, idle = sum(self.busy.values()), sum(self.idle.values())
+        with open(path, "w", encoding="utf-8") as output:
+            output.write(f"{busy + idle} samples every {self._interval * 1000:g} ms\n\n")
+            output.write(f"{'THREAD':<50}{'BUSY':>10}{'IDLE':>10}\n")
+            for thread in sorted(set(self.busy) | set(self.idle)):
+                output.write(f"{thread:<50}{self.busy[thread]:>10}{self.idle[thread]:>10}\n")
+            for title, counter in (("OWN", own), ("INCLUSIVE", inclusive)):
+                output.write(f"\n{title:>10}{'%':>8}  FUNCTION\n")
+                for function, samples in counter.most_common(TOP_FUNCTIONS):
+                    output.write(f"{samples:>10}{samples / busy * 100:>7.1f}%  {function}\n")
+
+
+def register_profile_handler(ws, session: str, handler: Callable[[dict], dict]) -> None:
+    """
+    Route the GUI 'profile' requests of a session to its handler. Many sessions (i.e. SessionPool) share the same
+    websocket namespace: requests name their session ({"session": "<name>_<pid>"} or {"pid": <pid>}) and may omit
+    it while a single session is registered.
+    :param ws: websocket namespace with GUI
+    :param session: session name ("<name>_<pid>")
+    :param handler: called with the request data, returns the reply
+    """
+    handlers = getattr(ws, "profile_handlers", None)
+    if handlers is None:
+        handlers = ws.profile_handlers = dict()
+        ws.on_profile = functools.partial(_dispatch_profile_request, handlers)
+    handlers[session] = handler
+
+
+def unregister_profile_handler(ws, session: str) -> None:
+    getattr(ws, "profile_handlers", {}).pop(session, None)
+
+
+def _dispatch_profile_request(handlers: Dict[str, Callable[[dict], dict]], request_data) -> dict:
+    request_data = request_data or {}
+    sessions = list(handlers.keys())
+    session = request_data.get("session", None)
+    if session is None and "pid" in request_data:
+        session = next((name for name in sessions if name.rsplit("_", 1)[-1] == str(request_data["pid"])), None)
+    elif session is None and len(sessions) == 1:
+        session = sessions[0]
+
+    handler = handlers.get(session, None) if session is not None else None
+    if handler is None:
+        return {"error": f"Unknown session, one of {sessions} expected"}
+    return handler(request_data)
+
+
+class PipelineProfiler:
+    """
+    Profile the pipeline of a session for some seconds, then turn off by itself and write the results inside a
+    directory. One profile at a time.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 ingestion: IngestionQueue,
+                 on_done: Union[Callable[[Dict[str, str]], None], None] = None,
+                 threads: Union[Callable[[], Iterable[threading.Thread]], None] = None):
+        """
+        :param directory: directory of the results (created on first profile)
+        :param ingestion: ingestion queue of the session, whose consumer thread cprofile runs on
+        :param on_done: called with the paths of the results once they are written
+        :param threads: function returning the threads of the session, sampled in sampling mode
+                        (default: every thread whose name starts with THREAD_PREFIX)
+        """
+        self._directory: str = directory
+        self._ingestion: IngestionQueue = ingestion
+        self._on_done = on_done
+        self._threads = threads
+        self._lock = threading.Lock()
+        self._mode: Union[ProfilerMode, None] = None
+        self._outputs: Dict[str, str] = dict()
+        self._timer: Union[threading.Timer, None] = None
+        self._sampler: Union[SamplingProfiler, None] = None
+        self._profile: Union[cProfile.Profile, None] = None
+
+    def is_running(self) -> bool:
+        return self._mode is not None
+
+    def start(self,
+              seconds: float,
+              mode: Union[ProfilerMode, str] = ProfilerMode.SAMPLING,
+              interval: float = DEFAULT_INTERVAL) -> Union[Dict[str, str], None]:
+        """
+        Start profiling
+        :param seconds: duration of the profile
+        :param mode: ProfilerMode (or its value)
+        :param interval: seconds between samples (sampling mode)
+        :return: paths of the results that will be written, None if a profile is already running
+        """
+        mode = ProfilerMode(mode)
+        if seconds <= 0:
+            raise ValueError(f"Invalid profile duration: {seconds}")
+        if mode is ProfilerMode.CPROFILE and not self._ingestion.is_running():
+            raise RuntimeError("Ingestion thread not running")
+
+        with self._lock:
+            if self._mode is not None:
+                logger.warning(f"Already profiling ({self._mode.value})")
+                return None
+
+            os.makedirs(self._directory, exist_ok=True)
+            base = os.path.join(self._directory, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{mode.value}")
+            self._outputs = {
+                "stats": base + (".pstats" if mode is ProfilerMode.CPROFILE else ".collapsed"),
+                "summary": base + ".txt",
+            }
+            if mode is ProfilerMode.CPROFILE:
+                self._ingestion.call(self._enable_cprofile)
+            else:
+                self._sampler = SamplingProfiler(interval=interval, threads=self._threads)
+                self._sampler.start()
+
+            self._mode = mode
+            self._timer = threading.Timer(seconds, self.stop)
+            self._timer.daemon = True
+            self._timer.start()
+
+        logger.info(f"Profiling the pipeline for {seconds}s ({mode.value})")
+        return dict(self._outputs)
+
+    def stop(self) -> None:
+        """
+        Stop profiling (before the end of the requested duration) and write the results. No-op if not profiling.
+        """
+        with self._lock:
+            mode, self._mode = self._mode, None
+            if mode is None:
+                return
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+            outputs = dict(self._outputs)
+            if mode is ProfilerMode.CPROFILE:
+                finish = functools.partial(self._finish_cprofile, outputs)
+                if self._ingestion.is_running():
+                    self._ingestion.call(finish)
+                else:
+                    # Consumer thread already stopped (i.e. session detached): nothing would run the call
+                    finish()
+            else:
+                sampler, self._sampler = self._sampler, None
+                sampler.stop()
+                self._write(outputs, sampler.write_collapsed, sampler.write_summary)
+
+    def _enable_cprofile(self) -> None:
+        # Runs on the ingestion consumer thread: cProfile only sees the thread enabling it
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def _finish_cprofile(self, outputs: Dict[str, str]) -> None:
+        profile, self._profile = self._profile, None
+        if profile is None:
+            return
+        profile.disable()
+        self._write(outputs, profile.dump_stats, lambda path: self._write_cprofile_summary(profile, path))
+
+    @staticmethod
+    def _write_cprofile_summary(profile: cProfile.Profile, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as output:
+            stats = pstats.Stats(profile, stream=output)
+            for key in ("cumulative", "tottime"):
+                stats.sort_stats(key).print_stats(TOP_FUNCTIONS)
+
+    def _write(self,
+               outputs: Dict[str, str],
+               write_stats: Callable[[str], None],
+               write_summary: Callable[[str], None]) -> None:
+        try:
+            write_stats(outputs["stats"])
+            write_summary(outputs["summary"])
+        except Exception as e:
+            logger.error(f"Error writing profile: {e}")
+            return
+
+        logger.info(f"Profile written to {outputs['stats']}")
+        if self._on_done:
+            try:
+                self._on_done(outputs)
+            except Exception as e:
+                logger.error(f"Error notifying profile: {e}")
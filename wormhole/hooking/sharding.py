@@ -0,0 +1,254 @@
+import time
+import queue
+import pickle
+import logging
+import threading
+import multiprocessing
+
+from multiprocessing import shared_memory
+from typing import List, Union
+
+from .connector_manager import ConnectorManager
+from .modules.base import Message
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+DEFAULT_WORKERS = 2
+DEFAULT_ARENA_SIZE = 16 * 1024 * 1024
+
+_INLINE = -1
+
+
+class _ResultForwarder:
+    """
+    Stand-in of the ConnectorManager inside worker processes: published results are sent back to the parent.
+    Results are pickled right away because modules may keep modifying published objects afterwards.
+    """
+
+    def __init__(self, result_queue):
+        self._result_queue = result_queue
+
+    def forward(self, event) -> None:
+        self._result_queue.put(pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _worker_main(index: int,
+                 target_app: str,
+                 data_dir: str,
+                 modules: List[str],
+                 custom_modules: List[str],
+                 task_queue,
+                 result_queue,
+                 ready_queue,
+                 arena_name: str,
+                 consumed) -> None:
+    """
+    Entry point of a worker process: initialize its own instances of the sharded modules and process the messages
+    of its shard in arrival order.
+    """
+    from .modules_manager import ModulesManager
+
+    arena = shared_memory.SharedMemory(name=arena_name)
+    try:
+        manager = ModulesManager(target_app, data_dir)
+        initialized, initialized_custom = manager.init_modules(modules, custom_modules,
+                                                               _ResultForwarder(result_queue))
+        ready_queue.put((index, initialized + initialized_custom))
+
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+
+            fields, position, length, inline_data = task
+            if position == _INLINE:
+                data = inline_data
+            else:
+                offset = position % arena.size
+                data = bytes(arena.buf[offset:offset + length])
+                consumed.value = position + length
+
+            manager.process_decoded(Message.from_fields(*fields, data))
+    finally:
+        arena.close()
+        result_queue.put(None)
+
+
+class _Shard:
+
+    def __init__(self, ctx, index: int, arena_size: int):
+        self.index: int = index
+        self.task_queue = ctx.Queue()
+        self.arena = shared_memory.SharedMemory(create=True, size=arena_size)
+        self.consumed = ctx.Value('Q', 0, lock=False)
+        self.written: int = 0
+        self.process = None
+
+    def reserve(self, length: int) -> int:
+        """
+        Reserve a contiguous slice of the ring arena, waiting for the worker to consume older payloads if needed
+        :return: absolute position of the slice
+        """
+        size = self.arena.size
+        position = self.written
+        if position % size + length > size:
+            # Do not split payloads across the end of the ring: skip to its beginning
+            position += size - position % size
+
+        while position + length - self.consumed.value > size:
+            if not self.process.is_alive():
+                raise RuntimeError(f"Shard worker {self.index} is dead")
+            time.sleep(0.0005)
+
+        self.written = position + length
+        return position
+
+    def release(self) -> None:
+        self.arena.close()
+        try:
+            self.arena.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class ShardedExecutor:
+    """
+    Run selected modules inside worker processes, outside the GIL of the main process.
+    Messages are sharded by (module, tid): every module instance sees all the messages of a thread, so per-tid
+    correlation state (encryption sessions, pending xpc replies, prepared sqlite statements) stays consistent.
+    Raw bytes are handed over through a shared memory ring arena per worker instead of being pickled.
+    Published results are forwarded by a collector thread to the ConnectorManager of the parent, in order per tid.
+    """
+
+    def __init__(self,
+                 target_app: str,
+                 data_dir: str,
+                 connector_manager: ConnectorManager,
+                 workers: int = DEFAULT_WORKERS,
+                 arena_size: int = DEFAULT_ARENA_SIZE):
+        """
+        :param target_app: name of the analyzed app/process
+        :param data_dir: base data directory
+        :param connector_manager: manager of output connectors receiving the published results
+        :param workers: number of worker processes
+        :param arena_size: size in bytes of the shared memory arena of each worker
+        """
+        self._target_app: str = target_app
+        self._data_dir: str = data_dir
+        self._connector_manager: ConnectorManager = connector_manager
+        self._workers: int = max(1, workers)
+        self._arena_size: int = arena_size
+        self._ctx = multiprocessing.get_context("spawn")
+        self._result_queue = None
+        self._shards: List[_Shard] = list()
+        self._collector: Union[threading.Thread, None] = None
+        self._submitted: int = 0
+        self._published: int = 0
+
+    def start(self, modules: List[str], custom_modules: List[str] = None) -> List[str]:
+        """
+        Spawn the worker processes. Workers are started one at a time, so they never race creating module dirs.
+        :param modules: list of standard modules to run in workers
+        :param custom_modules: list of custom modules to run in workers
+        :return: list of modules correctly initialized by the workers
+        """
+        custom_modules = custom_modules or []
+        self._result_queue = self._ctx.Queue()
+        ready_queue = self._ctx.Queue()
+        initialized = list()
+
+        for index in range(self._workers):
+            shard = _Shard(self._ctx, index, self._arena_size)
+            shard.process = self._ctx.Process(
+                target=_worker_main,
+                args=(index, self._target_app, self._data_dir, modules, custom_modules,
+                      shard.task_queue, self._result_queue, ready_queue, shard.arena.name, shard.consumed),
+                name=f"wormhole-shard-{index}",
+                daemon=True
+            )
+            shard.process.start()
+            self._shards.append(shard)
+            while True:
+                try:
+                    _, initialized = ready_queue.get(timeout=1)
+                    break
+                except queue.Empty:
+                    if not shard.process.is_alive():
+                        self.stop()
+                        raise RuntimeError(f"Shard worker {index} died during initialization")
+
+        self._collector = threading.Thread(target=self._collect, name="wormhole-shard-collector", daemon=True)
+        self._collector.start()
+        logger.info(f"Running {initialized} in {self._workers} worker processes")
+        return initialized
+
+    def submit(self, message: Message) -> None:
+        """
+        Send a message to the worker owning its (module, tid) shard
+        :param message: message to process
+        """
+        shard = self._shards[hash((message.module, message.tid)) % len(self._shards)]
+        fields = (message.timestamp, message.tid, message.module, message.symbol, message.args, message.ret)
+        data = message.data
+
+        if data is None or len(data) > self._arena_size:
+            shard.task_queue.put((fields, _INLINE, 0, data))
+        else:
+            length = len(data)
+            position = shard.reserve(length)
+            offset = position % self._arena_size
+            shard.arena.buf[offset:offset + length] = data
+            shard.task_queue.put((fields, position, length, None))
+
+        self._submitted += 1
+
+    def _collect(self) -> None:
+        running = len(self._shards)
+        while running:
+            result = self._result_queue.get()
+            if result is None:
+                running -= 1
+                continue
+
+            try:
+                self._connector_manager.forward(pickle.loads(result))
+                self._published += 1
+            except Exception as e:
+                logger.error(f"Error forwarding sharded result: {e}")
+
+    def stop(self, timeout: float = 10) -> None:
+        """
+        Let workers process pending messages, then stop them and release shared memory
+        :param timeout: seconds to wait for each worker to exit
+        """
+        for shard in self._shards:
+            shard.task_queue.put(None)
+
+        if self._collector:
+            self._collector.join(timeout * max(1, len(self._shards)))
+            self._collector = None
+
+        for shard in self._shards:
+            shard.process.join(timeout)
+            if shard.process.is_alive():
+                logger.warning(f"Shard worker {shard.index} did not exit, terminating it")
+                shard.process.terminate()
+            shard.release()
+
+        self._shards = list()
+
+    def stats(self) -> dict:
+        """
+        Counters of submitted messages, forwarded results and bytes still waiting in each shared memory arena
+        """
+        return {
+            "workers": len(self._shards),
+            "submitted": self._submitted,
+            "published": self._published,
+            "arena_in_use": [shard.written - shard.consumed.value for shard in self._shards],
+        }
@@ -0,0 +1,214 @@
+"""
+Offline replay of a capture (see wormhole.hooking.capture): the recorded raw agent messages are fed to the modules
+through the same dispatch path as a live session (inflating, batches, binary frames) and their output to a chosen
+ConnectorManager, without any device.
+
+Usage:
+    python -m wormhole.replay <capture dir> [--modules io sqlite] [--connectors stdout] [--pacing realtime --speed 2]
+"""
+import time
+import logging
+import argparse
+import tempfile
+
+from enum import Enum
+from typing import Dict, List, Union
+
+from flask_socketio import Namespace
+
+from .hooking.capture import CaptureReader
+from .hooking.dispatch import MessageDispatcher
+from .hooking.modules.base import Message
+from .hooking.modules_manager import ModulesManager
+from .hooking.connector_manager import ConnectorManager
+from .hooking.sharding import DEFAULT_WORKERS
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+
+class Pacing(Enum):
+    ASAP = "asap"           # as fast as possible
+    REALTIME = "realtime"   # keep the time between messages of the recording (scaled by the speed)
+
+
+class _TimedModulesManager(ModulesManager):
+    """
+    ModulesManager counting the events processed by every module and the time spent processing them
+    (connectors run on their own threads and are not included). Events of modules not replayed are skipped.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_TimedModulesManager, self).__init__(*args, **kwargs)
+        self.events: Dict[str, int] = dict()
+        self.seconds: Dict[str, float] = dict()
+        self.skipped: int = 0
+
+    def _replayed(self, module: str) -> bool:
+        if module in self._modules or module in self._sharded:
+            return True
+        self.skipped += 1
+        return False
+
+    def _time_module(self, module: str, started: float) -> None:
+        self.seconds[module] = self.seconds.get(module, 0.0) + time.perf_counter() - started
+        self.events[module] = self.events.get(module, 0) + 1
+
+    def process_message(self, message: dict, data: bytes) -> None:
+        module = message.get('payload', {}).get('type', '') if message.get('type', '') == 'send' else ''
+        if module and not self._replayed(module):
+            return
+        started = time.perf_counter()
+        super(_TimedModulesManager, self).process_message(message, data)
+        self._time_module(module or message.get('type', ''), started)
+
+    def process_decoded(self, message: Message) -> None:
+        if not self._replayed(message.module):
+            return
+        started = time.perf_counter()
+        super(_TimedModulesManager, self).process_decoded(message)
+        self._time_module(message.module, started)
+
+
+class Replay:
+    """
+    Re-drive the modules with the messages recorded by a capture.
+    Doubles as a reproducible performance harness: run() reports events/sec for every module.
+    """
+
+    def __init__(self,
+                 capture_dir: str,
+                 target_app: str = "replay",
+                 data_dir: Union[str, None] = None,
+                 connectors: Union[List[str], None] = None,
+                 connector_manager: Union[ConnectorManager, None] = None,
+                 ws: Union[Namespace, None] = None,
+                 sharded_modules: List[str] = None,
+                 shard_workers: int = DEFAULT_WORKERS):
+        """
+        :param capture_dir: directory of the capture
+        :param target_app: name of the recorded app/process (custom modules are looked up by it)
+        :param data_dir: data directory of the modules (default: new temporary directory)
+        :param connectors: names of the connectors receiving the output of the modules
+        :param connector_manager: already initialized manager to use instead of creating one from connectors names
+        :param ws: websocket connection with GUI
+        :param sharded_modules: modules to run inside worker processes
+        :param shard_workers: number of worker processes for sharded modules
+        """
+        self._reader: CaptureReader = CaptureReader(capture_dir)
+        self._target_app: str = target_app
+        self._data_dir: str = data_dir or tempfile.mkdtemp(prefix="wormhole-replay-")
+        self._connectors: List[str] = connectors or []
+        self._connector_manager: Union[ConnectorManager, None] = connector_manager
+        self._ws = ws
+        self._sharded_modules: List[str] = sharded_modules
+        self._shard_workers: int = shard_workers
+
+    def run(self,
+            modules: Union[List[str], None] = None,
+            custom_modules: Union[List[str], None] = None,
+            pacing: Union[Pacing, str] = Pacing.ASAP,
+            speed: float = 1.0,
+            start_ns: Union[int, None] = None,
+            end_ns: Union[int, None] = None) -> dict:
+        """
+        Replay the capture once
+        :param modules: modules to run (default: the standard modules found inside the capture)
+        :param custom_modules: custom modules of the target to run
+        :param pacing: Pacing (or its value)
+        :param speed: speed factor of the realtime pacing (2: twice as fast as recorded)
+        :param start_ns: skip messages received before (ns since the epoch)
+        :param end_ns: skip messages received after (ns since the epoch)
+        :return: counters of the replay (messages, events, elapsed seconds, events/sec overall and per module)
+        """
+        pacing = Pacing(pacing)
+        if speed <= 0:
+            raise ValueError(f"Invalid replay speed: {speed}")
+
+        modules_manager = _TimedModulesManager(self._target_app, self._data_dir,
+                                               self._sharded_modules, self._shard_workers)
+        if modules is None:
+            available = set(modules_manager.get_available_standard_modules())
+            modules = sorted(module for module in self._reader.modules() if module in available)
+
+        connector_manager = self._connector_manager or ConnectorManager(self._connectors, self._ws)
+        modules, custom_modules = modules_manager.init_modules(modules, custom_modules or [], connector_manager)
+        logger.info(f"Replaying {self._reader.directory} through {modules} and {custom_modules} ({pacing.value})")
+
+        dispatcher = MessageDispatcher(modules_manager)
+        messages, errors = 0, 0
+        first_ns = None
+        started = time.perf_counter()
+        for captured in self._reader.messages(start_ns, end_ns):
+            if pacing is Pacing.REALTIME:
+                if first_ns is None:
+                    first_ns = captured.time_ns
+                delay = (captured.time_ns - first_ns) / 1e9 / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+
+            try:
+                dispatcher.dispatch(captured.message, captured.data)
+            except Exception as e:
+                errors += 1
+                if errors == 1 or errors % 1000 == 0:
+                    logger.error(f"Error replaying message ({errors} so far): {e}")
+            messages += 1
+        elapsed = time.perf_counter() - started
+
+        modules_manager.clear_modules()
+        connector_stats = connector_manager.stats()
+        if not self._connector_manager:
+            connector_manager.clean_connectors()
+        drained = time.perf_counter() - started
+
+        events = sum(modules_manager.events.values())
+        return {
+            "messages": messages,
+            "errors": errors,
+            "events": events,
+            "skipped": modules_manager.skipped,
+            "elapsed": elapsed,
+            "drained": drained,
+            "events_per_sec": events / elapsed if elapsed else 0.0,
+            "modules": {
+                module: {
+                    "events": count,
+                    "seconds": modules_manager.seconds[module],
+                    "events_per_sec": count / modules_manager.seconds[module] if modules_manager.seconds[module]
+                    else 0.0,
+                } for module, count in sorted(modules_manager.events.items())
+            },
+            "connectors": connector_stats,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a wormhole capture through the modules")
+    parser.add_argument("capture")
+    parser.add_argument("--modules", nargs="+", default=None)
+    parser.add_argument("--custom-modules", nargs="+", default=[])
+    parser.add_argument("--connectors", nargs="+", default=[])
+    parser.add_argument("--target", default="replay")
+    parser.add_argument("--data-dir", default=None)
+    parser.add_argument("--pacing", choices=[pacing.value for pacing in Pacing], default=Pacing.ASAP.value)
+    parser.add_argument("--speed", type=float, default=1.0)
+    args = parser.parse_args()
+
+    replay = Replay(args.capture, args.target, args.data_dir, args.connectors)
+    stats = replay.run(args.modules, args.custom_modules, args.pacing, args.speed)
+
+    print(f"{'MODULE':<20}{'EVENTS':>10}{'EV/S':>14}")
+    for module, module_stats in stats["modules"].items():
+        print(f"{module:<20}{module_stats['events']:>10}{module_stats['events_per_sec']:>14,.0f}")
+    print(f"{'TOTAL':<20}{stats['events']:>10}{stats['events_per_sec']:>14,.0f}"
+          f"   ({stats['messages']} messages, {stats['skipped']} skipped events, {stats['errors']} errors, "
+          f"{stats['elapsed']:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+import re
+import time
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Union
+
+import frida
+from flask_socketio import Namespace
+
+from .core import Core
+from .hooking.connector_manager import ConnectorManager
+from .hooking.metrics import PipelineMetrics, RateMeter
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+ch = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+DEFAULT_ATTACH_WORKERS = 8
+
+
+class SessionConnectorManager(ConnectorManager):
+    """
+    Per-session view of a ConnectorManager shared by many sessions: events are tagged with the session name
+    and counted before being forwarded. Cleaning it (i.e. on unhook) never touches the shared connectors.
+    Connectors added to the session (i.e. Core.add_connector) only receive its events.
+    """
+
+    def __init__(self, session: str, shared: ConnectorManager, metrics: Union[PipelineMetrics, None] = None):
+        """
+        :param session: name of the session
+        :param shared: manager of the connectors shared by all sessions
+        :param metrics: pipeline metrics of the session (render times, own connectors)
+        """
+        super(SessionConnectorManager, self).__init__([], metrics=metrics)
+        self._session: str = session
+        self._shared: ConnectorManager = shared
+        self._events: int = 0
+        self._started: float = time.monotonic()
+        self._rate: RateMeter = RateMeter()
+
+    def forward(self, event) -> None:
+        self._events += 1
+        self._rate.add()
+        event.session = self._session
+        if self._render is not None:
+            event.render_histogram = self._render
+        self._shared.forward(event)
+        super(SessionConnectorManager, self).forward(event)
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Per connector counters (see ConnectorManager.stats): the shared connectors, then the session ones
+        """
+        stats = self._shared.stats()
+        stats.update(super(SessionConnectorManager, self).stats())
+        return stats
+
+    def session_stats(self) -> dict:
+        """
+        Event counters of the session. The current rate is computed over the last seconds (see RateMeter).
+        """
+        now = time.monotonic()
+        events = self._events
+        return {
+            "events": events,
+            "events_per_sec": self._rate.rate(now),
+            "avg_events_per_sec": events / (now - self._started) if now > self._started else 0.0,
+        }
+
+
+class SessionPool:
+    """
+    Instrument many processes of the same device at once. All the sessions inject the same compiled agent
+    source and publish to a single ConnectorManager; every event is tagged with its session ("<name>_<pid>").
+    """
+
+    def __init__(self,
+                 device: frida.core.Device,
+                 connectors: List[str],
+                 ws: Union[Namespace, None] = None,
+                 attach_workers: int = DEFAULT_ATTACH_WORKERS,
+                 **core_kwargs):
+        """
+        :param device: device to attach
+        :param connectors: list of connectors shared by all sessions
+        :param ws: websocket connection with GUI
+        :param attach_workers: number of sessions attached in parallel
+        :param core_kwargs: other Core parameters, used for every session
+        """
+        self._device: frida.core.Device = device
+        self._ws = ws
+        self._connector_manager: ConnectorManager = ConnectorManager(connectors, ws)
+        self._attach_workers: int = attach_workers
+        self._core_kwargs: dict = core_kwargs
+        self._sessions: Dict[str, Core] = dict()
+        self._session_managers: Dict[str, SessionConnectorManager] = dict()
+        self._agent_sources: Dict[str, str] = dict()
+        self._lock = threading.Lock()
+
+    @property
+    def sessions(self) -> List[str]:
+        return list(self._sessions.keys())
+
+    def get_session(self, session: str) -> Union[Core, None]:
+        return self._sessions.get(session, None)
+
+    def _agent_source(self, core: Core) -> str:
+        """
+        Read (and compile, if needed) each agent only once for all the sessions
+        """
+        script_path = core.get_agent_path()
+        with self._lock:
+            if script_path not in self._agent_sources:
+                with open(script_path, "r") as js_file:
+                    self._agent_sources[script_path] = js_file.read()
+            return self._agent_sources[script_path]
+
+    def _attach_one(self, target: Union[int, str]) -> Union[str, None]:
+        try:
+            core = Core(self._device, target, self._ws, **self._core_kwargs)
+            if not core.run(self._agent_source(core)):
+                logger.error(f"Impossible to attach to {target}")
+                return None
+        except Exception as e:
+            logger.error(f"Error attaching to {target}: {e}")
+            return None
+
+        session = core.session_name
+        with self._lock:
+            self._sessions[session] = core
+            self._session_managers[session] = SessionConnectorManager(session, self._connector_manager,
+                                                                     core.pipeline_metrics)
+        return session
+
+    def attach(self, targets: List[Union[int, str]]) -> List[str]:
+        """
+        Attach to many processes (pids) or spawn many apps (bundle IDs) in parallel
+        :param targets: list of pids/bundle IDs
+        :return: list of sessions correctly attached
+        """
+        with ThreadPoolExecutor(max_workers=self._attach_workers, thread_name_prefix="wormhole-attach") as executor:
+            sessions = list(executor.map(self._attach_one, targets))
+
+        attached = [session for session in sessions if session]
+        logger.info(f"Attached to {len(attached)}/{len(targets)} targets")
+        return attached
+
+    def attach_matching(self, pattern: str) -> List[str]:
+        """
+        Attach to all running processes whose name matches the pattern
+        :param pattern: regular expression matched against process names
+        :return: list of sessions correctly attached
+        """
+        regex = re.compile(pattern)
+        attached_pids = {core.target_pid for core in self._sessions.values()}
+        pids = [process.pid for process in self._device.enumerate_processes()
+                if regex.search(process.name) and process.pid not in attached_pids]
+        return self.attach(pids)
+
+    def operations(self,
+                   modules: List[str],
+                   custom_modules: Union[List[str], None] = None,
+                   sessions: Union[List[str], None] = None) -> Dict[str, bool]:
+        """
+        Start hooking the same modules inside many sessions
+        :param modules: list of modules to hook
+        :param custom_modules: list of custom modules
+        :param sessions: sessions to hook (all if missing)
+        :return: dict session -> result of Core.operations
+        """
+        results = dict()
+        for session in sessions or self.sessions:
+            results[session] = self._sessions[session].operations(
+                modules,
+                custom_modules or [],
+                [],
+                connector_manager=self._session_managers[session]
+            )
+        return results
+
+    def unhook(self, sessions: Union[List[str], None] = None) -> None:
+        for session in sessions or self.sessions:
+            self._sessions[session].unhook()
+
+    def detach(self, sessions: Union[List[str], None] = None) -> None:
+        """
+        Detach from sessions (all if missing). Shared connectors are released when the last session is detached.
+        """
+        for session in sessions or self.sessions:
+            try:
+                self._sessions[session].detach_session()
+            except Exception as e:
+                logger.error(f"Error detaching {session}: {e}")
+            with self._lock:
+                del self._sessions[session]
+                del self._session_managers[session]
+
+        if not self._sessions:
+            self._connector_manager.clean_connectors()
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Per session event counters and rates, plus the ingestion queue counters, sorted by current rate
+        so the process flooding the pipeline comes first.
+        """
+        stats = dict()
+        for session, manager in list(self._session_managers.items()):
+            session_stats = manager.session_stats()
+            session_stats["ingestion"] = self._sessions[session].ingestion_stats()
+            stats[session] = session_stats
+        return dict(sorted(stats.items(), key=lambda item: item[1]["events_per_sec"], reverse=True))